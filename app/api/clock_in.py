@@ -5,17 +5,192 @@ clock-in records in the database.
 
 """
 
-from fastapi import APIRouter, HTTPException
-from app.schemas.clock_in import ClockInCreate, ClockInInDB, ClockInUpdate
+import asyncio
+from datetime import datetime
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from app.config import settings
+from app.profiling import ProfiledRoute
+from app.schemas.clock_in import (
+    ClockInBatchResult,
+    ClockInCreate,
+    ClockInInDB,
+    ClockInUpdate,
+)
+from app.schemas.common import BatchGetRequest, CountResult
+from app.rate_limit import rate_limit
+from app.services.clock_in_feed import Subscription, clock_in_feed
 from app.services.clock_in_service import ClockInService
+from app.services.idempotency_service import IdempotencyService
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.post(
+    "/",
+    response_model=ClockInInDB,
+    dependencies=[Depends(rate_limit("create_clock_in"))],
+)
+async def create_clock_in(
+    new_clock_in: ClockInCreate,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+) -> ClockInInDB | Response:
+    """Create a new clock-in record, once per `Idempotency-Key` if given"""
+    if idempotency_key is None:
+        return await ClockInService.create_clock_in(new_clock_in)
+    return await IdempotencyService.run(
+        "create_clock_in",
+        idempotency_key,
+        new_clock_in,
+        lambda: ClockInService.create_clock_in(new_clock_in),
+    )
+
+
+@router.post("/batch-get", response_model=ClockInBatchResult)
+async def get_clock_ins_by_ids(request: BatchGetRequest) -> ClockInBatchResult:
+    """Get several clock-in records by ID, in request order, with explicit misses"""
+    found = await ClockInService.get_clock_ins(request.ids)
+    keys = request.canonical_ids()
+    return ClockInBatchResult(
+        clock_ins=[found.get(key) for key in keys],
+        missing=[
+            clock_in_id
+            for clock_in_id, key in zip(request.ids, keys)
+            if key not in found
+        ],
+    )
+
 
-router = APIRouter()
+@router.get("/", response_model=list[ClockInInDB])
+async def read_clock_ins(
+    email_filter: str | None = None,
+    location_filter: str | None = None,
+    insert_datetime_filter: str | None = None,
+) -> list[ClockInInDB]:
+    """
+    Retrieve a list of clock-in records from the database based on optional filters.
+    """
+    clock_ins = await ClockInService.filter_clock_in(
+        email=email_filter,
+        location=location_filter,
+        insert_datetime=insert_datetime_filter,
+    )
+    return clock_ins
 
 
-@router.post("/", response_model=ClockInInDB)
-async def create_clock_in(new_clock_in: ClockInCreate) -> ClockInInDB:
-    """Create a new clock-in record"""
-    return await ClockInService.create_clock_in(new_clock_in)
+@router.head("/")
+async def count_clock_ins_head(
+    email_filter: str | None = None,
+    location_filter: str | None = None,
+    insert_datetime_filter: str | None = None,
+) -> Response:
+    """Return the number of matching clock-in records in the X-Total-Count header"""
+    total = await ClockInService.count_clock_in(
+        email=email_filter,
+        location=location_filter,
+        insert_datetime=insert_datetime_filter,
+    )
+    return Response(headers={"X-Total-Count": str(total)})
+
+
+@router.get("/count", response_model=CountResult)
+async def count_clock_ins(
+    email_filter: str | None = None,
+    location_filter: str | None = None,
+    insert_datetime_filter: str | None = None,
+) -> CountResult:
+    """Count the clock-in records matching the optional filters"""
+    total = await ClockInService.count_clock_in(
+        email=email_filter,
+        location=location_filter,
+        insert_datetime=insert_datetime_filter,
+    )
+    return CountResult(count=total)
+
+
+async def _watch_disconnect(websocket: WebSocket, subscription: Subscription) -> None:
+    """Stop a feed subscription once its client disconnects."""
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        clock_in_feed.close(subscription)
+
+
+@router.websocket("/feed")
+async def clock_in_feed_socket(
+    websocket: WebSocket,
+    email: str | None = None,
+    location: str | None = None,
+    since: str | None = None,
+) -> None:
+    """
+    Push new clock-in records as they are created, optionally filtered by
+    email and location. With `since` ("YYYY-MM-DD HH:MM:SS", UTC), the
+    records created since then are sent first.
+    """
+    try:
+        since_datetime = (
+            datetime.strptime(since, "%Y-%m-%d %H:%M:%S") if since else None
+        )
+    except ValueError:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="since must be formatted as YYYY-MM-DD HH:MM:SS",
+        )
+        return
+
+    # Subscribe before reading the backlog so nothing created meanwhile
+    # is missed; records present in both are sent once.
+    subscription = clock_in_feed.subscribe(email, location)
+    if subscription is None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    watcher = None
+    try:
+        await websocket.accept()
+        replayed = set()
+        page_size = settings.CLOCK_IN_FEED_RESUME_PAGE_SIZE
+        after, after_id = since_datetime, None
+        # Page through the backlog until a short page shows it has caught
+        # up; records created meanwhile are read by the later pages.
+        while after is not None:
+            page = await ClockInService.clock_ins_since(
+                after, email, location, page_size, after_id=after_id
+            )
+            for clock_in in page:
+                replayed.add(clock_in.id)
+                await websocket.send_text(clock_in.model_dump_json(by_alias=True))
+            if len(page) < page_size:
+                break
+            after, after_id = page[-1].insert_datetime, page[-1].id
+
+        watcher = asyncio.create_task(_watch_disconnect(websocket, subscription))
+        while (event := await subscription.get()) is not None:
+            clock_in_id, payload = event
+            if clock_in_id not in replayed:
+                await websocket.send_text(payload)
+
+        if subscription.overflowed:
+            await websocket.close(
+                code=status.WS_1013_TRY_AGAIN_LATER, reason="Consumer too slow"
+            )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        clock_in_feed.unsubscribe(subscription)
 
 
 @router.get("/{clock_in_id}", response_model=ClockInInDB)
@@ -30,23 +205,11 @@ async def get_clock_in_by_id(clock_in_id: str) -> ClockInInDB:
     return clock_in
 
 
-@router.get("/", response_model=list[ClockInInDB])
-async def read_clock_ins(
-    email_filter: str | None = None,
-    location_filter: str | None = None,
-    insert_datetime_filter: str | None = None,
-) -> list[ClockInInDB]:
-    """
-    Retrieve a list of clock-in records from the database based on optional filters.
-    """
-    return await ClockInService.filter_clock_ins(
-        email_filter=email_filter,
-        location_filter=location_filter,
-        insert_datetime_filter=insert_datetime_filter,
-    )
-
-
-@router.delete("/{clock_in_id}", response_model=dict[str, str])
+@router.delete(
+    "/{clock_in_id}",
+    response_model=dict[str, str],
+    dependencies=[Depends(rate_limit("delete_clock_in"))],
+)
 async def delete_clock_in(clock_in_id: str) -> dict[str, str]:
     """
     Delete a clock-in record by its ID
@@ -57,7 +220,11 @@ async def delete_clock_in(clock_in_id: str) -> dict[str, str]:
     return {"message": "Clock-in record deleted successfully"}
 
 
-@router.put("/{clock_in_id}", response_model=ClockInInDB)
+@router.put(
+    "/{clock_in_id}",
+    response_model=ClockInInDB,
+    dependencies=[Depends(rate_limit("update_clock_in"))],
+)
 async def update_clock_in_by_id(
     clock_in_id: str, updated_clock_in_data: ClockInUpdate
 ) -> ClockInInDB:
@@ -0,0 +1,42 @@
+"""Endpoints for health probes and metrics.
+
+This module contains the liveness and readiness endpoints used by the
+orchestrator, and the Prometheus metrics endpoint. Liveness never touches
+the database; readiness reports database connectivity and index
+reconciliation.
+
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.database import readiness_status
+from app.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/healthz", response_model=dict[str, str])
+async def liveness() -> dict[str, str]:
+    """Reports that the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readiness() -> JSONResponse:
+    """Reports whether the application can serve database-backed requests.
+
+    Only the check results are returned. Driver errors name hosts and
+    replica set members, so they are logged server-side instead.
+    """
+    checks = await readiness_status()
+    ready = all(checks.values())
+    content = {"status": "ready" if ready else "not ready", "checks": checks}
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics() -> PlainTextResponse:
+    """Exposes application metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,92 @@
+"""Internal endpoints for request profiles.
+
+This module contains the endpoints that list and download the profiles
+written by the profiling middleware. They are left out of the OpenAPI
+schema and require the `X-Profile` header to carry the profiling secret;
+without a configured secret they do not exist as far as clients can tell.
+
+"""
+
+import asyncio
+import hmac
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from app.config import settings
+from app.profiling import profile_store
+
+
+async def require_profile_secret(
+    x_profile: Optional[str] = Header(default=None),
+) -> None:
+    """
+    Reject requests that do not carry the profiling secret.
+
+    Args:
+        x_profile (str): The `X-Profile` header.
+
+    Raises:
+        HTTPException: 404 if the secret is missing, wrong or unset.
+    """
+    if (
+        not settings.PROFILE_SECRET
+        or x_profile is None
+        or not hmac.compare_digest(x_profile.encode(), settings.PROFILE_SECRET.encode())
+    ):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+router = APIRouter(dependencies=[Depends(require_profile_secret)])
+
+
+@router.get("/profiles")
+async def list_profiles() -> list[dict[str, Any]]:
+    """
+    Lists the stored profiles, newest first.
+
+    Returns:
+        list[dict]: The request summaries and phase timings.
+    """
+    return await asyncio.to_thread(profile_store.list)
+
+
+@router.get("/profiles/{profile_id}")
+async def read_profile(profile_id: str) -> FileResponse:
+    """
+    Downloads a profile summary, including the slowest functions.
+
+    Args:
+        profile_id (str): The profile ID, from `X-Profile-Id` or the list.
+
+    Returns:
+        FileResponse: The JSON summary.
+    """
+    path = await asyncio.to_thread(profile_store.path, profile_id, "json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+
+@router.get("/profiles/{profile_id}/pstats")
+async def download_profile_stats(profile_id: str) -> FileResponse:
+    """
+    Downloads the raw cProfile stats of a profile.
+
+    The file can be loaded with `pstats.Stats` or a viewer such as snakeviz.
+
+    Args:
+        profile_id (str): The profile ID.
+
+    Returns:
+        FileResponse: The stats file.
+    """
+    path = await asyncio.to_thread(profile_store.path, profile_id, "prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile stats not found")
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"{profile_id}.prof",
+    )
@@ -5,17 +5,74 @@ and retrieving individual items in the database.
 
 """
 
-from fastapi import APIRouter, HTTPException
-from app.schemas.item import ItemCreate, ItemInDB, ItemUpdate, AggregationResult
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from app.schemas.common import BatchGetRequest, CountResult
+from app.schemas.item import (
+    ItemCreate,
+    ItemInDB,
+    ItemUpdate,
+    AggregationResult,
+    ItemBatchResult,
+    ItemSearchHit,
+)
+from app.cache import CachedPayload, TTLCache
+from app.compression import payload_response
+from app.config import settings
+from app.profiling import ProfiledRoute
+from app.rate_limit import rate_limit
+from app.repositories.base import QueryTimeoutError, StorageUnavailableError
+from app.services.idempotency_service import IdempotencyService
 from app.services.item_service import ItemService
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+_aggregate_cache = TTLCache(settings.AGGREGATE_CACHE_TTL_SECONDS, maxsize=1)
+
+
+@router.post(
+    "/",
+    response_model=ItemInDB,
+    dependencies=[Depends(rate_limit("create_item"))],
+)
+async def create_item(
+    new_item: ItemCreate,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+) -> ItemInDB | Response:
+    """
+    Creates a new item in the database.
+
+    With an `Idempotency-Key` header, a retry of the same request returns
+    the originally created item instead of creating another one.
+    """
+    if idempotency_key is None:
+        return await ItemService.create_item(new_item)
+    return await IdempotencyService.run(
+        "create_item",
+        idempotency_key,
+        new_item,
+        lambda: ItemService.create_item(new_item),
+    )
 
 
-@router.post("/", response_model=ItemInDB)
-async def create_item(new_item: ItemCreate) -> ItemInDB:
-    """Creates a new item in the database."""
-    return await ItemService.create_item(new_item)
+@router.post("/batch-get", response_model=ItemBatchResult)
+async def read_items_by_ids(request: BatchGetRequest) -> ItemBatchResult:
+    """Retrieves several items by ID, in request order, with explicit misses."""
+    found = await ItemService.get_items(request.ids)
+    keys = request.canonical_ids()
+    return ItemBatchResult(
+        items=[found.get(key) for key in keys],
+        missing=[
+            item_id for item_id, key in zip(request.ids, keys) if key not in found
+        ],
+    )
 
 
 @router.get("/", response_model=list[ItemInDB])
@@ -26,22 +83,102 @@ async def read_items(
     quantity: int | None = None,
 ) -> list[ItemInDB]:
     """Retrieves a list of items from the database based on the provided filters."""
-    return await ItemService.filter_items(
+    items = await ItemService.filter_items(
+        email=email,
+        expiry_date=expiry_date,
+        insert_date=insert_date,
+        quantity=quantity,
+    )
+    return items
+
+
+@router.head("/")
+async def count_items_head(
+    email: str | None = None,
+    expiry_date: str | None = None,
+    insert_date: str | None = None,
+    quantity: int | None = None,
+) -> Response:
+    """Returns the number of matching items in the X-Total-Count header."""
+    total = await ItemService.count_items(
+        email=email,
+        expiry_date=expiry_date,
+        insert_date=insert_date,
+        quantity=quantity,
+    )
+    return Response(headers={"X-Total-Count": str(total)})
+
+
+@router.get("/count", response_model=CountResult)
+async def count_items(
+    email: str | None = None,
+    expiry_date: str | None = None,
+    insert_date: str | None = None,
+    quantity: int | None = None,
+) -> CountResult:
+    """Returns the number of items matching the provided filters."""
+    total = await ItemService.count_items(
         email=email,
         expiry_date=expiry_date,
         insert_date=insert_date,
         quantity=quantity,
     )
+    return CountResult(count=total)
+
+
+@router.get("/search", response_model=list[ItemSearchHit])
+async def search_items(
+    q: str = Query(min_length=1),
+    email: str | None = None,
+    limit: int = Query(default=10, ge=1, le=settings.SEARCH_MAX_RESULTS),
+) -> list[ItemSearchHit]:
+    """Returns items whose name or item name starts with `q`, case-insensitively."""
+    hits = ItemService.search_items(q, email=email, limit=limit)
+    if hits is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Search index is not available yet",
+            headers={"Retry-After": "5"},
+        )
+    return hits
+
+
+@router.get("/expiring", response_model=list[ItemInDB])
+async def read_expiring_items(
+    within_days: int = Query(default=7, ge=0, le=3650),
+    email: str | None = None,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=settings.EXPIRING_MAX_LIMIT),
+) -> list[ItemInDB]:
+    """Returns the items expiring within the next `within_days` days, soonest first."""
+    return await ItemService.expiring_items(
+        within_days, email=email, skip=skip, limit=limit
+    )
 
 
 @router.get("/aggregate", response_model=AggregationResult)
-async def read_aggregated_items() -> AggregationResult:
-    """Returns the aggregated items from the database."""
-    try:
-        aggregated_items = await ItemService.aggregate_items()
-        return AggregationResult(root=aggregated_items)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Error aggregating items") from e
+async def read_aggregated_items(request: Request) -> Response:
+    """
+    Returns the aggregated items from the database.
+
+    The serialized result is cached with its compressed variants for
+    AGGREGATE_CACHE_TTL_SECONDS, and carries an ETag for conditional GETs.
+    """
+    payload = _aggregate_cache.get("aggregate")
+    if payload is None:
+        try:
+            aggregated_items = await ItemService.aggregate_items()
+            result = AggregationResult(root=aggregated_items)
+        except (QueryTimeoutError, StorageUnavailableError):
+            # Mapped to 504/503 by the application's exception handlers
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail="Error aggregating items"
+            ) from e
+        payload = CachedPayload(result.model_dump_json(by_alias=True).encode())
+        _aggregate_cache.set("aggregate", payload)
+    return await payload_response(request, payload)
 
 
 @router.get("/{item_id}", response_model=ItemInDB)
@@ -53,7 +190,11 @@ async def read_item_by_id(item_id: str) -> ItemInDB:
     return item
 
 
-@router.delete("/{item_id}", response_model=dict[str, str])
+@router.delete(
+    "/{item_id}",
+    response_model=dict[str, str],
+    dependencies=[Depends(rate_limit("delete_item"))],
+)
 async def delete_item_by_id(item_id: str) -> dict[str, str]:
     """Deletes an item from the database by its ID."""
     deleted = await ItemService.delete_item(item_id)
@@ -62,7 +203,11 @@ async def delete_item_by_id(item_id: str) -> dict[str, str]:
     return {"message": "Item deleted successfully"}
 
 
-@router.put("/{item_id}", response_model=ItemInDB)
+@router.put(
+    "/{item_id}",
+    response_model=ItemInDB,
+    dependencies=[Depends(rate_limit("update_item"))],
+)
 async def update_item_by_id(item_id: str, updated_item_data: ItemUpdate) -> ItemInDB:
     """Updates an item in the database by its ID."""
 
@@ -0,0 +1,102 @@
+"""In-process caches.
+
+This module contains a small TTL cache (`TTLCache`) used to absorb hot,
+repeated read queries for a few seconds. Entries are evicted when they
+expire or, once the cache is full, in insertion order.
+
+`CachedPayload` is the value cached for whole responses: the serialized
+body, its ETag, and the compressed variants built from it so far.
+
+"""
+
+import hashlib
+import time
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache(object):
+    """
+    A bounded mapping whose entries expire after `ttl` seconds.
+
+    A `ttl` of 0 disables the cache: `get` always misses and `set` does
+    nothing, so callers do not need to special-case it.
+
+    Attributes:
+        ttl: Seconds an entry stays valid.
+        maxsize: Maximum number of entries.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get the value for `key`, or None if it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value` under `key` for `ttl` seconds, by default the cache's.
+
+        A shorter `ttl` suits values that are already partly expired at
+        their source; a `ttl` of 0 or less stores nothing.
+        """
+        if self.ttl <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        self._entries.pop(key, None)
+        if ttl <= 0:
+            return
+        while len(self._entries) >= self.maxsize:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        self._entries.clear()
+
+
+class CachedPayload(object):
+    """
+    A serialized response body with its ETag and compressed variants.
+
+    Attributes:
+        body: The uncompressed body.
+        media_type: The media type of the body.
+        etag: A weak ETag derived from the body.
+    """
+
+    __slots__ = ("body", "media_type", "etag", "_encoded")
+
+    def __init__(self, body: bytes, media_type: str = "application/json") -> None:
+        self.body = body
+        self.media_type = media_type
+        self.etag = 'W/"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._encoded: dict[str, bytes] = {}
+
+    def is_encoded(self, encoding: str) -> bool:
+        """Check whether the body has already been compressed to a coding."""
+        return encoding in self._encoded
+
+    def encoded(self, encoding: str, compress: Callable[[bytes, str], bytes]) -> bytes:
+        """
+        Get the body in a content coding, compressing it on first use only.
+
+        Args:
+            encoding (str): The content coding, e.g. "gzip".
+            compress: Compresses a body to a coding.
+
+        Returns:
+            bytes: The encoded body.
+        """
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = compress(self.body, encoding)
+        return encoded
@@ -0,0 +1,142 @@
+"""Response body compression.
+
+This module negotiates a content coding from a request's
+`Accept-Encoding` header and compresses bodies with it. gzip is always
+available; brotli is preferred when the `brotli` package is installed and
+the client accepts it.
+
+It also serves `CachedPayload` bodies: the payload keeps each encoding
+it has been compressed to, so a cached response is compressed once per
+encoding rather than once per request, and answers conditional GETs on
+its ETag with a 304.
+
+Bodies of at least THREAD_THRESHOLD bytes are compressed in a worker
+thread, so that large responses do not stall the event loop.
+
+"""
+
+import asyncio
+import gzip
+import zlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+from app.cache import CachedPayload
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+THREAD_THRESHOLD = 256 * 1024
+
+
+def available_encodings() -> tuple[str, ...]:
+    """Get the supported content codings, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Choose a content coding for an `Accept-Encoding` header.
+
+    Args:
+        accept_encoding: The header value, e.g. "gzip, deflate, br;q=0.5".
+
+    Returns:
+        The coding to use ("br" or "gzip"), or None to send the body as is.
+    """
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for coding in available_encodings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body at the configured level.
+
+    Args:
+        body: The uncompressed body.
+        encoding: "br" or "gzip".
+
+    Returns:
+        The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor(object):
+    """Incrementally compresses a streamed body."""
+
+    def __init__(self, encoding: str) -> None:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+            self._compress, self._finish = compressor.process, compressor.finish
+        else:
+            # wbits=31 writes a gzip header and trailer.
+            compressor = zlib.compressobj(settings.GZIP_LEVEL, wbits=31)
+            self._compress, self._finish = compressor.compress, compressor.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk; the output may be buffered until `finish`."""
+        return self._compress(chunk)
+
+    def finish(self) -> bytes:
+        """Flush the remaining compressed output."""
+        return self._finish()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weakly compare an `If-None-Match` header against an ETag."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+async def payload_response(request: Request, payload: CachedPayload) -> Response:
+    """Serve a cached payload, compressed and conditional.
+
+    Args:
+        request: The incoming request.
+        payload: The serialized response body.
+
+    Returns:
+        A 304 if the client already has this version, otherwise the body in
+        the best encoding the client accepts.
+    """
+    headers = {"ETag": payload.etag, "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, payload.etag):
+        return Response(status_code=304, headers=headers)
+
+    body = payload.body
+    encoding = None
+    if settings.COMPRESSION_ENABLED and len(body) >= settings.COMPRESSION_MINIMUM_SIZE:
+        encoding = negotiate(request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        if len(body) >= THREAD_THRESHOLD and not payload.is_encoded(encoding):
+            await asyncio.to_thread(payload.encoded, encoding, compress)
+        body = payload.encoded(encoding, compress)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=payload.media_type, headers=headers)
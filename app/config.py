@@ -10,8 +10,24 @@ The settings themselves are documented in the `Settings` class.
 
 """
 
+from typing import Literal, Optional
+
+from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings
 
+ReadPreferenceMode = Literal[
+    "primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"
+]
+ReadConcernLevel = Literal["local", "available", "majority", "linearizable"]
+
+# Read preferences applied unless READ_PREFERENCES overrides them.
+DEFAULT_READ_PREFERENCES: dict[str, ReadPreferenceMode] = {
+    "filter_items": "secondaryPreferred",
+    "aggregate_items": "secondaryPreferred",
+    "filter_clock_in": "secondaryPreferred",
+    "build_search_index": "secondaryPreferred",
+}
+
 
 class Settings(BaseSettings):
     """
@@ -22,12 +38,198 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str = "FastAPI CRUD App"
     PROJECT_VERSION: str = "1.0.0"
-    MONGODB_URI: str
+    # Storage behind the services: "mongo", or "memory" for an in-process
+    # engine used by tests and benchmarks (data is lost on restart).
+    STORAGE_BACKEND: Literal["mongo", "memory"] = "mongo"
+    # Required with the "mongo" backend.
+    MONGODB_URI: str = ""
     DATABASE_NAME: str = "fastapi-crud"
     ITEMS_COLLECTION: str = "items"
     CLOCK_IN_COLLECTION: str = "clock_in"
+    IDEMPOTENCY_COLLECTION: str = "idempotency_keys"
     DEBUG: bool = False
 
+    # Connection establishment runs in the background after startup and
+    # retries with exponential backoff until MongoDB answers a ping.
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_CONNECT_RETRY_INITIAL_DELAY: float = 0.5
+    MONGO_CONNECT_RETRY_MAX_DELAY: float = 30.0
+    READINESS_PING_TIMEOUT: float = 1.0
+
+    # Read routing per service operation (e.g. "filter_items"). Operations
+    # not listed read from the primary with the server default read
+    # concern, which keeps reads right after writes consistent. Entries
+    # are merged over DEFAULT_READ_PREFERENCES; set an operation to
+    # "primary" to take it off the secondaries.
+    READ_PREFERENCES: dict[str, ReadPreferenceMode] = DEFAULT_READ_PREFERENCES
+    READ_CONCERNS: dict[str, ReadConcernLevel] = {}
+    # Bound on secondary lag for non-primary reads; the driver requires at
+    # least 90 seconds.
+    READ_MAX_STALENESS_SECONDS: Optional[int] = 90
+
+    # Server-side time budget (maxTimeMS) per service operation. A query
+    # that runs out of budget is aborted and answered with a 504.
+    QUERY_DEFAULT_MAX_TIME_MS: int = 2000
+    QUERY_MAX_TIME_MS: dict[str, int] = {
+        "aggregate_items": 10000,
+        "build_search_index": 300000,
+    }
+    SLOW_QUERY_THRESHOLD_MS: int = 200
+    # Fraction of slow queries to `explain` (0 disables), at most once per
+    # shape per interval, to flag collection scans. Documents examined are
+    # only logged for explained queries, and need "executionStats".
+    QUERY_EXPLAIN_SAMPLE_RATE: float = 0.0
+    QUERY_EXPLAIN_INTERVAL_SECONDS: float = 300.0
+    QUERY_EXPLAIN_VERBOSITY: Literal["queryPlanner", "executionStats"] = (
+        "executionStats"
+    )
+
+    # Admission control: maximum concurrent requests per route group
+    # ("reads", "writes", "aggregate"); 0 means unlimited. Requests over
+    # the limit get an immediate 503 with Retry-After.
+    ADMISSION_LIMITS: dict[str, int] = {"reads": 256, "writes": 128, "aggregate": 8}
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    LOOP_LAG_SAMPLE_INTERVAL: float = 0.1
+    # Shed the listed groups while event loop lag exceeds this (0 disables).
+    LOOP_LAG_SHED_THRESHOLD_MS: float = 0.0
+    LOOP_LAG_SHED_GROUPS: list[str] = ["reads", "aggregate"]
+
+    # Token bucket per client ("<count>/<second|minute|hour>") for each
+    # write route; clients are keyed by IP.
+    RATE_LIMITS: dict[str, str] = {
+        "create_item": "60/minute",
+        "update_item": "60/minute",
+        "delete_item": "60/minute",
+        "create_clock_in": "10/minute",
+        "update_clock_in": "60/minute",
+        "delete_clock_in": "60/minute",
+    }
+    RATE_LIMIT_MAX_KEYS: int = 1_000_000
+    # Only enable behind proxies that append to X-Forwarded-For. Clients
+    # can prepend any addresses, so the key is the address appended by the
+    # outermost of RATE_LIMIT_TRUSTED_PROXIES proxies, counted from the
+    # right (1: the proxy in front of the app is the only one).
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    RATE_LIMIT_TRUSTED_PROXIES: int = 1
+
+    # Maximum number of IDs accepted by the batch-get endpoints.
+    BATCH_GET_MAX_IDS: int = 100
+
+    # Seconds to cache count results per filter (0 disables). Writes clear
+    # the cache of the process that made them; counts served by other
+    # processes may be stale for up to this long.
+    COUNT_CACHE_TTL_SECONDS: float = 0.0
+    # Seconds to cache the serialized (and compressed) GET /items/aggregate
+    # response (0 disables).
+    AGGREGATE_CACHE_TTL_SECONDS: float = 0.0
+
+    # Response compression: gzip, or brotli when the package is installed.
+    # Bodies under COMPRESSION_MINIMUM_SIZE bytes are sent uncompressed.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    # gzip levels range from 1 to 9, brotli qualities from 0 to 11.
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+
+    # In-memory prefix index behind GET /items/search, built at startup.
+    SEARCH_INDEX_ENABLED: bool = True
+    SEARCH_MAX_RESULTS: int = 50
+
+    # Expiry notifications: upcoming expiries are loaded in windows into
+    # a min-heap and emitted to EXPIRY_SINK ("log" or "webhook") when due.
+    EXPIRY_SCHEDULER_ENABLED: bool = False
+    EXPIRY_SCHEDULER_WINDOW_HOURS: float = 24.0
+    EXPIRY_SCHEDULER_BATCH_SIZE: int = 1000
+    EXPIRY_NOTIFY_LEAD_HOURS: float = 0.0
+    EXPIRY_SINK: Literal["log", "webhook"] = "log"
+    EXPIRY_WEBHOOK_URL: str = ""
+    EXPIRING_MAX_LIMIT: int = 500
+
+    # Live clock-in feed (WebSocket /clock-in/feed). A subscriber whose
+    # queue is full either loses its oldest events ("drop") or is
+    # disconnected ("disconnect"). A resume replays every record since the
+    # requested time, reading CLOCK_IN_FEED_RESUME_PAGE_SIZE at a time.
+    CLOCK_IN_FEED_QUEUE_SIZE: int = 256
+    CLOCK_IN_FEED_SLOW_POLICY: Literal["drop", "disconnect"] = "drop"
+    CLOCK_IN_FEED_MAX_SUBSCRIBERS: int = 10000
+    CLOCK_IN_FEED_RESUME_PAGE_SIZE: int = 1000
+
+    # Request profiling. A request with an `X-Profile: <PROFILE_SECRET>`
+    # header is profiled, as is one in every PROFILE_SAMPLE_EVERY requests
+    # (0 disables sampling). Profiles are kept in a ring of
+    # PROFILE_MAX_FILES in PROFILE_DIR, served under /internal/profiles.
+    # With no secret and no sampling the profiler is not installed.
+    PROFILE_SECRET: str = ""
+    PROFILE_SAMPLE_EVERY: int = 0
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 100
+
+    # Idempotency-Key support on the create endpoints. Keys (and the
+    # responses replayed for them) are kept for IDEMPOTENCY_TTL_SECONDS; the
+    # most recent IDEMPOTENCY_CACHE_SIZE responses are also cached in
+    # process. Retries of an attempt still pending after
+    # IDEMPOTENCY_PENDING_TIMEOUT_SECONDS are told its outcome is unknown
+    # instead of to retry later; the key is only reusable once it expires.
+    # A changed TTL is applied to the existing TTL index at startup.
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: float = 60.0
+
+    @field_validator("READ_PREFERENCES")
+    @classmethod
+    def merge_read_preferences(
+        cls, value: dict[str, ReadPreferenceMode]
+    ) -> dict[str, ReadPreferenceMode]:
+        """Apply the configured read preferences over the defaults."""
+        return {**DEFAULT_READ_PREFERENCES, **value}
+
+    @field_validator("READ_MAX_STALENESS_SECONDS")
+    @classmethod
+    def check_max_staleness(cls, value: Optional[int]) -> Optional[int]:
+        """Reject staleness bounds the driver would refuse at query time."""
+        if value is not None and value < 90:
+            raise ValueError("READ_MAX_STALENESS_SECONDS must be at least 90")
+        return value
+
+    @field_validator("RATE_LIMIT_TRUSTED_PROXIES")
+    @classmethod
+    def check_trusted_proxies(cls, value: int) -> int:
+        """Reject hop counts that would not select an appended address."""
+        if value < 1:
+            raise ValueError("RATE_LIMIT_TRUSTED_PROXIES must be at least 1")
+        return value
+
+    @field_validator("GZIP_LEVEL")
+    @classmethod
+    def check_gzip_level(cls, value: int) -> int:
+        """Reject levels zlib would refuse when the first response is sent."""
+        if not 1 <= value <= 9:
+            raise ValueError("GZIP_LEVEL must be between 1 and 9")
+        return value
+
+    @field_validator("BROTLI_QUALITY")
+    @classmethod
+    def check_brotli_quality(cls, value: int) -> int:
+        """Reject qualities brotli would refuse when the first response is sent."""
+        if not 0 <= value <= 11:
+            raise ValueError("BROTLI_QUALITY must be between 0 and 11")
+        return value
+
+    @field_validator("CLOCK_IN_FEED_RESUME_PAGE_SIZE")
+    @classmethod
+    def check_resume_page_size(cls, value: int) -> int:
+        """Reject page sizes that would never let a resume finish."""
+        if value < 1:
+            raise ValueError("CLOCK_IN_FEED_RESUME_PAGE_SIZE must be at least 1")
+        return value
+
+    @model_validator(mode="after")
+    def check_mongodb_uri(self) -> "Settings":
+        """Require MONGODB_URI when the data lives in MongoDB."""
+        if self.STORAGE_BACKEND == "mongo" and not self.MONGODB_URI:
+            raise ValueError("MONGODB_URI is required when STORAGE_BACKEND is 'mongo'")
+        return self
+
     class Config(object):
         """
         Configuration for the settings.
@@ -3,12 +3,39 @@
 This module contains functions to connect and disconnect from a MongoDB
 database using the Motor library.
 
+Connecting does not block application startup: the client is created
+immediately (Motor connects lazily) and a background task pings the
+server with exponential backoff, then reconciles the collection indexes.
+The readiness probe reports the progress of that task.
+
+Services reach their collections through `get_repository`, which serves
+MongoDB or the in-memory engine depending on STORAGE_BACKEND. With the
+in-memory engine there is nothing to connect to and the database is
+ready as soon as the application starts.
+
 """
 
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import asyncio
+import logging
+import random
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
 
 from app.config import settings
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import (
+        AsyncIOMotorClient,
+        AsyncIOMotorCollection,
+        AsyncIOMotorDatabase,
+    )
+
+    from app.repositories.base import Repository
+
+logger = logging.getLogger(__name__)
+
+# Server error code for an index that exists with different options.
+_INDEX_OPTIONS_CONFLICT = 85
+
 
 class Database(object):
     """
@@ -17,45 +44,254 @@ class Database(object):
     Attributes:
         client: The AsyncIOMotorClient instance.
         db: The AsyncIOMotorDatabase instance.
+        connected: Whether the server has answered a ping since startup.
+        indexes_ready: Whether the collection indexes have been reconciled.
+        last_error: The last error seen while connecting, if any.
+        connect_task: The background task establishing the connection.
+        collections: Collection handles configured per operation, keyed by
+            (collection name, operation).
     """
 
-    client: AsyncIOMotorClient = None
-    db: AsyncIOMotorDatabase = None
+    client: "AsyncIOMotorClient" = None
+    db: "AsyncIOMotorDatabase" = None
+    connected: bool = False
+    indexes_ready: bool = False
+    last_error: Optional[str] = None
+    connect_task: Optional[asyncio.Task] = None
+    collections: dict[tuple[str, str], "AsyncIOMotorCollection"] = {}
 
 
 db = Database()
 
+# Coroutine functions run once the connection is established and indexes
+# are reconciled, e.g. to warm in-memory structures from the database,
+# each with whether to retry it until it succeeds.
+_ready_hooks: list[tuple[Callable[[], Awaitable[None]], bool]] = []
+
+# Repositories by collection name, created on first use.
+_repositories: dict[str, "Repository"] = {}
+
+
+def get_index_specs() -> dict[str, list[tuple[list[tuple[str, int]], dict]]]:
+    """Get the indexes each collection is expected to have.
+
+    Returns:
+        A mapping of collection name to a list of (keys, options) pairs,
+        in the form accepted by ``create_index``.
+    """
+    return {
+        settings.ITEMS_COLLECTION: [
+            ([("email", 1)], {}),
+            ([("expiry_date", 1)], {}),
+            ([("email", 1), ("expiry_date", 1)], {}),
+            ([("insert_date", 1)], {}),
+            ([("quantity", 1)], {}),
+        ],
+        settings.CLOCK_IN_COLLECTION: [
+            ([("email", 1)], {}),
+            ([("location", 1)], {}),
+            ([("insert_datetime", 1)], {}),
+        ],
+        settings.IDEMPOTENCY_COLLECTION: [
+            (
+                [("created_at", 1)],
+                {"expireAfterSeconds": settings.IDEMPOTENCY_TTL_SECONDS},
+            ),
+        ],
+    }
+
+
+async def _retry_with_backoff(
+    operation: Callable[[], Awaitable[None]], description: str
+) -> None:
+    """Run `operation` until it succeeds, sleeping with jittered backoff.
+
+    Args:
+        operation: The coroutine function to run.
+        description: A short description used in log messages.
+    """
+    delay = settings.MONGO_CONNECT_RETRY_INITIAL_DELAY
+    while True:
+        try:
+            await operation()
+            db.last_error = None
+            return
+        except Exception as e:
+            db.last_error = f"{description}: {e}"
+            logger.warning("%s failed, retrying in %.1fs: %s", description, delay, e)
+        await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+        delay = min(delay * 2, settings.MONGO_CONNECT_RETRY_MAX_DELAY)
+
+
+async def _ping() -> None:
+    """Ping the server, raising if it cannot be reached."""
+    await db.client.admin.command("ping")
+    db.connected = True
+
+
+async def reconcile_indexes() -> None:
+    """Create any missing indexes on the collections.
+
+    `create_index` is a no-op for indexes that already exist with the
+    same keys and options, so this is safe to run on every startup. An
+    existing index whose options differ is a conflict that retrying cannot
+    resolve: a changed TTL is applied in place with `collMod`, and any
+    other conflict is logged and the index left as it is.
+    """
+    from pymongo.errors import OperationFailure
+
+    for collection, indexes in get_index_specs().items():
+        for keys, options in indexes:
+            try:
+                await db.db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                if e.code != _INDEX_OPTIONS_CONFLICT:
+                    raise
+                if "expireAfterSeconds" in options:
+                    await db.db.command(
+                        {
+                            "collMod": collection,
+                            "index": {
+                                "keyPattern": dict(keys),
+                                "expireAfterSeconds": options["expireAfterSeconds"],
+                            },
+                        }
+                    )
+                    logger.info(
+                        "Updated the TTL of index %s on %s to %ds",
+                        keys,
+                        collection,
+                        options["expireAfterSeconds"],
+                    )
+                else:
+                    logger.warning(
+                        "Index %s on %s exists with other options; left as is: %s",
+                        keys,
+                        collection,
+                        e,
+                    )
+    db.indexes_ready = True
+
+
+async def _establish_connection() -> None:
+    """Connect to the server and reconcile indexes, retrying until both succeed."""
+    await _retry_with_backoff(_ping, "MongoDB ping")
+    logger.info("Connected to MongoDB")
+    await _retry_with_backoff(reconcile_indexes, "Index reconciliation")
+    logger.info("MongoDB indexes reconciled")
+    await _run_ready_hooks()
+
+
+async def _run_ready_hooks() -> None:
+    """Run the registered ready hooks in order."""
+    for hook, retry in _ready_hooks:
+        try:
+            if retry:
+                await _retry_with_backoff(hook, f"Ready hook {hook.__qualname__}")
+            else:
+                await hook()
+        except Exception:
+            logger.exception("Database ready hook %s failed", hook.__qualname__)
+
+
+def on_ready(hook: Callable[[], Awaitable[None]], retry: bool = False) -> None:
+    """Register a coroutine function to run once the database is usable.
+
+    Hooks run in registration order, in the background connection task,
+    after the indexes are reconciled. A failing hook is logged and does
+    not prevent the others from running.
+
+    Args:
+        hook: The coroutine function to run.
+        retry: Whether to rerun the hook with backoff until it succeeds,
+            for hooks that must not be left undone by a transient error.
+            Later hooks wait for it, so register these last.
+    """
+    _ready_hooks.append((hook, retry))
+
 
 async def connect_to_mongo() -> None:
     """Connect to the MongoDB database
 
-    This function connects to the MongoDB database using the MONGODB_URI
-    environment variable and sets the database instance to the specified
-    DATABASE_NAME.
+    This function creates the client using the MONGODB_URI environment
+    variable and sets the database instance to the specified
+    DATABASE_NAME. It returns immediately; the connection is established
+    (and indexes are reconciled) by a background task that retries with
+    exponential backoff, so a slow server does not delay startup.
 
-    If the connection fails, this function will raise an exception.
+    With the in-memory storage backend, only the ready hooks run.
 
     """
-    db.client = AsyncIOMotorClient(settings.MONGODB_URI)
+    if settings.STORAGE_BACKEND == "memory":
+        db.connected = db.indexes_ready = True
+        db.connect_task = asyncio.create_task(_run_ready_hooks())
+        return
+
+    # Motor pulls in pymongo and its own framework glue; importing it
+    # here keeps it off the `app.main` import path.
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    db.client = AsyncIOMotorClient(
+        settings.MONGODB_URI,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    )
     db.db = db.client[settings.DATABASE_NAME]
-    await db.client.server_info()
+    db.collections = {}
+    db.connect_task = asyncio.create_task(_establish_connection())
 
 
 async def close_mongo_connection() -> None:
     """
     Close the connection to the MongoDB database.
 
-    This function closes the connection to the MongoDB database and
-    releases any resources held by the connection.
+    This function cancels any pending connection attempt, closes the
+    connection to the MongoDB database and releases any resources held
+    by the connection.
 
     If the connection is already closed, this function does nothing.
 
     """
+    if db.connect_task and not db.connect_task.done():
+        db.connect_task.cancel()
+        try:
+            await db.connect_task
+        except asyncio.CancelledError:
+            pass
     if db.client:
         db.client.close()
+    db.connected = False
+    db.indexes_ready = False
+    db.collections = {}
+    _ready_hooks.clear()
+
+
+async def readiness_status() -> dict[str, bool]:
+    """Report whether the database is usable.
+
+    Connectivity is checked with a live ping bounded by
+    READINESS_PING_TIMEOUT, so the probe notices a server that went away
+    after startup.
+
+    Returns:
+        A mapping of check name to whether it passed.
+    """
+    if settings.STORAGE_BACKEND == "memory":
+        return {"database": db.connected, "indexes": db.indexes_ready}
+    status = {"database": False, "indexes": db.indexes_ready}
+    if db.client is None or not db.connected:
+        return status
+    try:
+        await asyncio.wait_for(
+            db.client.admin.command("ping"), settings.READINESS_PING_TIMEOUT
+        )
+        status["database"] = True
+    except Exception as e:
+        db.last_error = f"MongoDB ping: {e}"
+        logger.warning("Readiness ping failed: %s", e)
+    return status
 
 
-def get_database() -> AsyncIOMotorDatabase:
+def get_database() -> "AsyncIOMotorDatabase":
     """Get the AsyncIOMotorDatabase instance.
 
     This function returns the AsyncIOMotorDatabase instance which is
@@ -68,3 +304,88 @@ def get_database() -> AsyncIOMotorDatabase:
         The AsyncIOMotorDatabase instance.
     """
     return db.db
+
+
+def _read_preference(mode: str):
+    """Build the pymongo read preference for a mode name.
+
+    Args:
+        mode: The read preference mode, e.g. "secondaryPreferred".
+
+    Returns:
+        The read preference, bounded by READ_MAX_STALENESS_SECONDS for
+        every mode other than primary.
+    """
+    from pymongo import read_preferences
+
+    if mode == "primary":
+        return read_preferences.Primary()
+    mode_class = {
+        "primaryPreferred": read_preferences.PrimaryPreferred,
+        "secondary": read_preferences.Secondary,
+        "secondaryPreferred": read_preferences.SecondaryPreferred,
+        "nearest": read_preferences.Nearest,
+    }[mode]
+    max_staleness = settings.READ_MAX_STALENESS_SECONDS
+    return mode_class(max_staleness=-1 if max_staleness is None else max_staleness)
+
+
+def get_collection(name: str, operation: str) -> "AsyncIOMotorCollection":
+    """Get a collection handle configured for a service operation.
+
+    The read preference and read concern come from READ_PREFERENCES and
+    READ_CONCERNS, keyed by the operation name; operations that are not
+    configured use the client defaults (primary). Handles are cached, so
+    the lookup is cheap enough to do on every call.
+
+    Args:
+        name: The collection name.
+        operation: The service operation, e.g. "filter_items".
+
+    Returns:
+        The AsyncIOMotorCollection instance.
+    """
+    collection = db.collections.get((name, operation))
+    if collection is None:
+        from pymongo.read_concern import ReadConcern
+
+        options = {}
+        mode = settings.READ_PREFERENCES.get(operation)
+        if mode:
+            options["read_preference"] = _read_preference(mode)
+        level = settings.READ_CONCERNS.get(operation)
+        if level:
+            options["read_concern"] = ReadConcern(level)
+        collection = db.db.get_collection(name, **options)
+        db.collections[(name, operation)] = collection
+    return collection
+
+
+def get_repository(name: str) -> "Repository":
+    """Get the repository serving a collection.
+
+    The backend is chosen by STORAGE_BACKEND. In-memory repositories
+    get a secondary index on the leading field of every index in
+    `get_index_specs()`, and keep their data for the life of the process.
+
+    Args:
+        name: The collection name.
+
+    Returns:
+        The Repository instance.
+    """
+    repository = _repositories.get(name)
+    if repository is None:
+        if settings.STORAGE_BACKEND == "memory":
+            from app.repositories.memory import InMemoryRepository
+
+            indexed_fields = [
+                keys[0][0] for keys, _ in get_index_specs().get(name, [])
+            ]
+            repository = InMemoryRepository(name, indexed_fields)
+        else:
+            from app.repositories.mongo import MongoRepository
+
+            repository = MongoRepository(name)
+        _repositories[name] = repository
+    return repository
@@ -0,0 +1,72 @@
+"""Event loop lag monitor.
+
+This module contains a background sampler (`EventLoopLagMonitor`) that
+measures how late the event loop wakes a sleeping task. A healthy loop
+wakes it almost on time; a loop saturated with work (or blocked by
+synchronous code) wakes it late, and that delay is added to every
+request in flight. The latest lag is exported as a metric and can be
+used by admission control to shed load.
+
+"""
+
+import asyncio
+from typing import Optional
+
+from app.config import settings
+from app.metrics import metrics
+
+
+class EventLoopLagMonitor(object):
+    """
+    Samples event loop lag in a background task.
+
+    Attributes:
+        interval: Seconds between samples.
+        lag: The most recent lag sample, in seconds.
+        max_lag: The largest lag seen since startup, in seconds.
+    """
+
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        """Sleep for `interval` repeatedly and record how late each wake-up is."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            if self.lag > self.max_lag:
+                self.max_lag = self.lag
+
+    def start(self) -> None:
+        """Start sampling on the running loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+loop_lag_monitor = EventLoopLagMonitor(settings.LOOP_LAG_SAMPLE_INTERVAL)
+
+metrics.gauge(
+    "event_loop_lag_seconds",
+    "Most recent event loop lag sample.",
+    lambda: loop_lag_monitor.lag,
+)
+metrics.gauge(
+    "event_loop_lag_max_seconds",
+    "Largest event loop lag seen since startup.",
+    lambda: loop_lag_monitor.max_lag,
+)
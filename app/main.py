@@ -6,11 +6,25 @@ its lifespan events.
 """
 
 from typing import AsyncIterator
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from app.api import items, clock_in
+from app.api import items, clock_in, health, internal
 from app.config import settings
-from app.database import connect_to_mongo, close_mongo_connection
+from app.database import connect_to_mongo, close_mongo_connection, on_ready
+from app.loop_monitor import loop_lag_monitor
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.profiling import profile_store
+from app.repositories.base import QueryTimeoutError, StorageUnavailableError
+from app.services.expiry_scheduler import expiry_scheduler
+from app.services.item_service import ItemService
+
+
+async def start_expiry_scheduler() -> None:
+    """Start emitting expiry notifications, loading items through the service."""
+    expiry_scheduler.start(ItemService.expiring_after)
 
 
 @asynccontextmanager
@@ -24,13 +38,24 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
 
     This is used to connect to the database when the application
     starts and close the connection when the application
-    stops.
+    stops. Connecting does not wait for the server, so the
+    application becomes live immediately; `/readyz` reports when
+    the database is usable. The event loop lag monitor runs for
+    the lifetime of the application.
     """
 
-    # Startup: connect to the database
+    # Startup: start connecting to the database in the background and
+    # warm the search index once it is reachable, retrying transient
+    # failures since search answers 503 until the index is built
+    if settings.EXPIRY_SCHEDULER_ENABLED:
+        on_ready(start_expiry_scheduler)
+    on_ready(ItemService.rebuild_search_index, retry=True)
     await connect_to_mongo()
+    loop_lag_monitor.start()
     yield
     # Shutdown: close database connection
+    await expiry_scheduler.stop()
+    await loop_lag_monitor.stop()
     await close_mongo_connection()
 
 
@@ -38,8 +63,58 @@ app = FastAPI(
     title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, lifespan=lifespan
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE
+    )
+
+if settings.PROFILE_SECRET or settings.PROFILE_SAMPLE_EVERY > 0:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        secret=settings.PROFILE_SECRET,
+        sample_every=settings.PROFILE_SAMPLE_EVERY,
+        exempt_paths=("/healthz", "/readyz", "/metrics", "/internal"),
+    )
+
+# Added last so it runs first: rejected requests skip the other middleware.
+app.add_middleware(
+    AdmissionControlMiddleware,
+    limits=settings.ADMISSION_LIMITS,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    lag_monitor=loop_lag_monitor,
+    lag_threshold=settings.LOOP_LAG_SHED_THRESHOLD_MS / 1000,
+    shed_groups=tuple(settings.LOOP_LAG_SHED_GROUPS),
+    exempt_paths=("/healthz", "/readyz", "/metrics"),
+)
+
+
+@app.exception_handler(QueryTimeoutError)
+async def query_budget_exceeded(
+    request: Request, exc: QueryTimeoutError
+) -> JSONResponse:
+    """Answers 504 when a query runs out of its maxTimeMS budget."""
+    return JSONResponse(
+        status_code=504, content={"detail": "Database query exceeded its time budget"}
+    )
+
+
+@app.exception_handler(StorageUnavailableError)
+async def database_unavailable(
+    request: Request, exc: StorageUnavailableError
+) -> JSONResponse:
+    """Answers 503 when no database server or pooled connection is available."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database temporarily unavailable"},
+        headers={"Retry-After": "1"},
+    )
+
+
+app.include_router(health.router, tags=["health"])
 app.include_router(items.router, prefix="/items", tags=["items"])
 app.include_router(clock_in.router, prefix="/clock-in", tags=["clock-in"])
+app.include_router(internal.router, prefix="/internal", include_in_schema=False)
 
 if __name__ == "__main__":
     import uvicorn
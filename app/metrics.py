@@ -0,0 +1,107 @@
+"""Application metrics.
+
+This module contains a minimal in-process metrics registry rendered in
+the Prometheus text exposition format by the `/metrics` endpoint. It only
+supports what the application needs: labelled counters, and gauges whose
+value is read from a callback at scrape time so that hot paths never
+have to update them.
+
+"""
+
+from typing import Callable, Union
+
+Labels = tuple[tuple[str, str], ...]
+GaugeValue = Union[float, dict[Labels, float]]
+
+
+class Counter(object):
+    """
+    A monotonically increasing, optionally labelled, counter.
+
+    Attributes:
+        name: The metric name.
+        help: The metric description.
+    """
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increment the counter for the given label values."""
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> dict[Labels, float]:
+        """Get the current value for every label combination."""
+        return dict(self._values)
+
+
+class Gauge(object):
+    """
+    A gauge whose value is computed by a callback when scraped.
+
+    The callback returns either a single number or a mapping of label
+    tuples to numbers.
+
+    Attributes:
+        name: The metric name.
+        help: The metric description.
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable[[], GaugeValue]) -> None:
+        self.name = name
+        self.help = help
+        self._fn = fn
+
+    def samples(self) -> dict[Labels, float]:
+        """Get the current value for every label combination."""
+        value = self._fn()
+        if isinstance(value, dict):
+            return value
+        return {(): value}
+
+
+class MetricsRegistry(object):
+    """
+    A registry of counters and gauges.
+
+    Methods:
+        counter: Registers (or returns the existing) counter.
+        gauge: Registers a callback gauge, replacing any with the same name.
+        render: Renders every metric in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Union[Counter, Gauge]] = {}
+
+    def counter(self, name: str, help: str) -> Counter:
+        """Register a counter, or return the one already registered."""
+        metric = self._metrics.get(name)
+        if not isinstance(metric, Counter):
+            metric = self._metrics[name] = Counter(name, help)
+        return metric
+
+    def gauge(self, name: str, help: str, fn: Callable[[], GaugeValue]) -> Gauge:
+        """Register a gauge computed by `fn`."""
+        metric = self._metrics[name] = Gauge(name, help, fn)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            kind = "counter" if isinstance(metric, Counter) else "gauge"
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            for labels, value in metric.samples().items():
+                if labels:
+                    rendered = ",".join(f'{key}="{val}"' for key, val in labels)
+                    lines.append(f"{metric.name}{{{rendered}}} {value}")
+                else:
+                    lines.append(f"{metric.name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
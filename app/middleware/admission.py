@@ -0,0 +1,117 @@
+"""Admission control middleware.
+
+This module contains an ASGI middleware (`AdmissionControlMiddleware`)
+that caps the number of concurrent requests per route group. Requests
+over the cap are rejected immediately with a 503 and a `Retry-After`
+header instead of queueing on the event loop and the Motor connection
+pool, which keeps latency bounded for the requests that are admitted.
+
+"""
+
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.loop_monitor import EventLoopLagMonitor
+from app.metrics import metrics
+
+rejected_requests = metrics.counter(
+    "admission_rejected_total", "Requests rejected by admission control."
+)
+
+
+def route_group(method: str, path: str) -> str:
+    """Classify a request into a route group.
+
+    Args:
+        method: The HTTP method.
+        path: The request path.
+
+    Returns:
+        str: "aggregate", "reads" or "writes".
+    """
+    path = path.rstrip("/")
+    if method in ("GET", "HEAD"):
+        return "aggregate" if path.endswith("/aggregate") else "reads"
+    if method == "POST" and path.endswith("/batch-get"):
+        return "reads"
+    return "writes"
+
+
+class AdmissionControlMiddleware(object):
+    """
+    Limits concurrent HTTP requests per route group.
+
+    Attributes:
+        limits: Maximum concurrent requests per group; 0 or missing means
+            unlimited.
+        retry_after: Value of the `Retry-After` header on rejections.
+        lag_monitor: Event loop lag monitor used for shedding, if any.
+        lag_threshold: Lag in seconds above which `shed_groups` are
+            rejected; 0 disables lag-based shedding.
+        shed_groups: The groups shed while the loop is lagging.
+        exempt_paths: Paths never subject to admission control.
+        in_flight: Requests currently being served per group.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: dict[str, int],
+        retry_after: int = 1,
+        lag_monitor: Optional[EventLoopLagMonitor] = None,
+        lag_threshold: float = 0.0,
+        shed_groups: tuple[str, ...] = (),
+        exempt_paths: tuple[str, ...] = (),
+    ) -> None:
+        self.app = app
+        self.limits = limits
+        self.retry_after = retry_after
+        self.lag_monitor = lag_monitor
+        self.lag_threshold = lag_threshold
+        self.shed_groups = frozenset(shed_groups)
+        self.exempt_paths = frozenset(exempt_paths)
+        self.in_flight = {group: 0 for group in ("reads", "writes", "aggregate")}
+        metrics.gauge(
+            "admission_in_flight",
+            "Requests currently admitted per route group.",
+            lambda: {(("group", g),): n for g, n in self.in_flight.items()},
+        )
+
+    def _rejection_reason(self, group: str) -> Optional[str]:
+        """Decide whether a request in `group` must be rejected."""
+        if (
+            self.lag_threshold
+            and self.lag_monitor is not None
+            and group in self.shed_groups
+            and self.lag_monitor.lag > self.lag_threshold
+        ):
+            return "loop_lag"
+        limit = self.limits.get(group)
+        if limit and self.in_flight[group] >= limit:
+            return "concurrency"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        group = route_group(scope["method"], scope["path"])
+        reason = self._rejection_reason(group)
+        if reason:
+            rejected_requests.inc(group=group, reason=reason)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded, retry later"},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.in_flight[group] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[group] -= 1
@@ -0,0 +1,116 @@
+"""Response compression middleware.
+
+This module contains an ASGI middleware (`CompressionMiddleware`) that
+compresses JSON and text responses with gzip or brotli, whichever the
+client prefers among those available. Responses smaller than the
+threshold, of other media types, or that already carry a
+`Content-Encoding` (such as precompressed cached payloads) are passed
+through untouched.
+
+"""
+
+import asyncio
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.compression import (
+    COMPRESSIBLE_TYPES,
+    THREAD_THRESHOLD,
+    StreamCompressor,
+    compress,
+    negotiate,
+)
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses HTTP responses.
+
+    Bodies sent in one message are compressed whole (in a worker thread
+    when larger than `thread_threshold`, so big listings do not stall the
+    event loop); streamed bodies are compressed chunk by chunk.
+
+    Attributes:
+        minimum_size: Bodies smaller than this many bytes are sent as is.
+        thread_threshold: Bodies at least this large are compressed in a
+            worker thread.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        thread_threshold: int = THREAD_THRESHOLD,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is not None:
+                chunk = compressor.compress(body)
+                if not more_body:
+                    chunk += compressor.finish()
+                message = {"type": "http.response.body", "body": chunk}
+                await send({**message, "more_body": more_body})
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                if len(body) >= self.thread_threshold:
+                    body = await asyncio.to_thread(compress, body, encoding)
+                else:
+                    body = compress(body, encoding)
+                headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            del headers["Content-Length"]
+            compressor = StreamCompressor(encoding)
+            await send(start)
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": compressor.compress(body),
+                    "more_body": True,
+                }
+            )
+
+        await self.app(scope, receive, send_compressed)
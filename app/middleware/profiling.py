@@ -0,0 +1,138 @@
+"""Request profiling middleware.
+
+This module contains an ASGI middleware (`ProfilingMiddleware`) that
+profiles selected requests: those carrying the shared secret in an
+`X-Profile` header, and one in every N requests when sampling is on.
+A profiled request runs under cProfile (when no other request holds it)
+and gets a per-phase breakdown from `app.phase_timing`; the result is
+written to the profile store after the response has been sent. The
+response carries the profile ID in `X-Profile-Id` and the phases in
+`Server-Timing`.
+
+"""
+
+import asyncio
+import cProfile
+import hmac
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.phase_timing import RequestProfile, current_profile
+from app.profiling import ProfileStore, cprofile_lock
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware(object):
+    """
+    Profiles requests selected by secret header or by sampling.
+
+    Note that cProfile sees everything the event loop runs while it is
+    enabled, including other requests interleaved with the profiled one;
+    the phase breakdown only counts the profiled request.
+
+    Attributes:
+        secret: The `X-Profile` header value that enables profiling, or
+            empty to disable header-triggered profiling.
+        sample_every: Profile one in this many requests, or 0 for none.
+        store: Where profiles are written.
+        exempt_paths: Paths never profiled, such as the profile endpoints
+            themselves, which take the same header.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        secret: str = "",
+        sample_every: int = 0,
+        exempt_paths: tuple[str, ...] = (),
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.secret = secret.encode()
+        self.sample_every = sample_every
+        self.exempt_paths = exempt_paths
+        self._requests = 0
+        self._write_tasks: set[asyncio.Task] = set()
+
+    def _selected(self, scope: Scope) -> bool:
+        """Decide whether to profile a request."""
+        if scope["path"].startswith(self.exempt_paths):
+            return False
+        if self.secret:
+            header = Headers(scope=scope).get("x-profile")
+            if header is not None and hmac.compare_digest(
+                header.encode(), self.secret
+            ):
+                return True
+        if self.sample_every <= 0:
+            return False
+        self._requests += 1
+        return self._requests % self.sample_every == 0
+
+    async def _write(
+        self, profile_id: str, summary: dict[str, Any], profiler: Any
+    ) -> None:
+        """Write a profile to the store from a worker thread."""
+        try:
+            await asyncio.to_thread(self.store.save, profile_id, summary, profiler)
+        except OSError as e:
+            logger.warning("Writing profile %s failed: %s", profile_id, e)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        status: Optional[int] = None
+        start = time.perf_counter()
+
+        async def send_profiled(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = profile.server_timing(time.perf_counter() - start)
+                headers = MutableHeaders(scope=message)
+                headers["X-Profile-Id"] = profile.id
+                headers.append("Server-Timing", timing)
+            await send(message)
+
+        profiler = None
+        if cprofile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        token = current_profile.set(profile)
+        started_at = datetime.now(timezone.utc)
+        try:
+            if profiler is not None:
+                profiler.enable()
+            await self.app(scope, receive, send_profiled)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                cprofile_lock.release()
+            current_profile.reset(token)
+            total = time.perf_counter() - start
+            summary = {
+                "id": profile.id,
+                "started_at": started_at.isoformat(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope["query_string"].decode("latin-1"),
+                "status": status,
+                "total_ms": round(total * 1000, 3),
+                "phases_ms": {
+                    phase: round(seconds * 1000, 3)
+                    for phase, seconds in profile.phases.items()
+                },
+                "cprofile": profiler is not None,
+            }
+            task = asyncio.create_task(self._write(profile.id, summary, profiler))
+            self._write_tasks.add(task)
+            task.add_done_callback(self._write_tasks.discard)
@@ -0,0 +1,104 @@
+"""Phase timing for profiled requests.
+
+This module contains `RequestProfile`, the per-phase timings of one
+profiled request, the `current_profile` context variable through which
+the code serving the request reaches it, and `timed`, a decorator adding
+a coroutine's duration to a phase. Outside profiled requests recording is
+a single context variable lookup.
+
+It has no web framework dependencies, so that the repositories can time
+their calls without importing FastAPI; the route and middleware that
+fill in the other phases live in `app.profiling` and
+`app.middleware.profiling`.
+
+"""
+
+import functools
+import secrets
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+class RequestProfile(object):
+    """
+    Timings of one profiled request.
+
+    Phases, in seconds:
+        validation: Request parsing, validation and dependencies.
+        endpoint: The endpoint function, excluding database time.
+        db: Database calls made through the repositories.
+        serialization: Response validation and encoding.
+
+    Attributes:
+        id: The profile ID, sortable by creation time.
+        phases: Seconds spent per phase.
+    """
+
+    __slots__ = ("id", "phases", "endpoint_started", "endpoint_finished")
+
+    def __init__(self) -> None:
+        now = datetime.now(timezone.utc)
+        self.id = f"{now:%Y%m%dT%H%M%S%f}-{secrets.token_hex(4)}"
+        self.phases: dict[str, float] = {}
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add time to a phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """
+        Format the phases as a `Server-Timing` header value.
+
+        Args:
+            total (float): Seconds spent on the request so far.
+
+        Returns:
+            str: The header value.
+        """
+        phases = {**self.phases, "total": total}
+        return ", ".join(
+            f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in phases.items()
+        )
+
+
+def timed(
+    phase: str,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    Build a decorator adding a coroutine function's duration to a phase of
+    the current profile, if any.
+
+    Args:
+        phase (str): The phase name, e.g. "db".
+
+    Returns:
+        The decorator.
+    """
+
+    def decorator(
+        function: Callable[..., Awaitable[T]],
+    ) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(function)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            profile = current_profile.get()
+            if profile is None:
+                return await function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                profile.add(phase, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
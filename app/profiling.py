@@ -0,0 +1,205 @@
+"""Per-request profiling.
+
+This module contains the web-facing pieces behind the opt-in request
+profiler (see `app.middleware.profiling`); the phase timings themselves
+are recorded through `app.phase_timing`:
+
+- `ProfiledRoute`, an `APIRoute` that splits the time spent in FastAPI
+  into request validation, the endpoint itself and response
+  serialization.
+- `ProfileStore`, a bounded on-disk ring of profile files.
+
+"""
+
+import asyncio
+import functools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.config import settings
+from app.phase_timing import current_profile
+
+# cProfile can only profile one request at a time; concurrent profiled
+# requests still get their phase breakdown.
+cprofile_lock = threading.Lock()
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9A-Za-z-]+$")
+
+
+def _timed_endpoint(call: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an async endpoint to record when it starts and finishes."""
+
+    @functools.wraps(call)
+    async def endpoint(*args: Any, **kwargs: Any) -> Any:
+        profile = current_profile.get()
+        if profile is None:
+            return await call(*args, **kwargs)
+        profile.endpoint_started = time.perf_counter()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            profile.endpoint_finished = time.perf_counter()
+
+    endpoint.__profiled__ = True
+    return endpoint
+
+
+class ProfiledRoute(APIRoute):
+    """
+    An `APIRoute` that reports where a profiled request spent its time.
+
+    Time before the endpoint runs counts as validation, time after it
+    returns as serialization, and the endpoint's own time (minus what the
+    repositories recorded as "db") as endpoint. Only async endpoints are
+    instrumented, which is all of them in this application.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        call = self.dependant.call
+        if (
+            call is not None
+            and asyncio.iscoroutinefunction(call)
+            and not getattr(call, "__profiled__", False)
+        ):
+            self.dependant.call = _timed_endpoint(call)
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request) -> Response:
+            profile = current_profile.get()
+            if profile is None:
+                return await handler(request)
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                end = time.perf_counter()
+                started = profile.endpoint_started
+                finished = profile.endpoint_finished
+                if started is None or finished is None:
+                    profile.add("validation", end - start)
+                else:
+                    profile.add("validation", started - start)
+                    db = profile.phases.get("db", 0.0)
+                    profile.add("endpoint", finished - started - db)
+                    profile.add("serialization", end - finished)
+
+        return profiled_handler
+
+
+def _top_functions(stats: pstats.Stats, limit: int) -> list[dict[str, Any]]:
+    """Summarize the functions with the highest cumulative time."""
+    rows = sorted(stats.stats.items(), key=lambda row: row[1][3], reverse=True)
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows[:limit]
+    ]
+
+
+class ProfileStore(object):
+    """
+    A bounded on-disk ring of request profiles.
+
+    Each profile is a JSON summary (`<id>.json`) and, when cProfile ran,
+    the raw stats (`<id>.prof`, readable with `pstats` or snakeviz).
+    Once there are more than `max_files` profiles the oldest are deleted.
+    Every method does blocking file IO; call them from a worker thread.
+
+    Attributes:
+        directory: Where profiles are written.
+        max_files: The number of profiles kept.
+    """
+
+    def __init__(self, directory: str, max_files: int) -> None:
+        self.directory = directory
+        self.max_files = max_files
+
+    def path(self, profile_id: str, extension: str) -> Optional[str]:
+        """
+        Get the path of a stored profile file.
+
+        Args:
+            profile_id (str): The profile ID.
+            extension (str): "json" or "prof".
+
+        Returns:
+            str: The path, or None if the ID is invalid or the file missing.
+        """
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{extension}")
+        return path if os.path.isfile(path) else None
+
+    def save(
+        self,
+        profile_id: str,
+        summary: dict[str, Any],
+        profiler: Optional[Any] = None,
+    ) -> None:
+        """
+        Write a profile and evict the oldest ones beyond `max_files`.
+
+        Args:
+            profile_id (str): The profile ID.
+            summary (dict): The request summary and phase timings.
+            profiler: The disabled cProfile.Profile, if cProfile ran.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile_id)
+        if profiler is not None:
+            stats = pstats.Stats(profiler)
+            stats.dump_stats(f"{base}.prof")
+            summary = {**summary, "top_functions": _top_functions(stats, 20)}
+        with open(f"{base}.json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        stored = sorted(
+            name[:-5]
+            for name in os.listdir(self.directory)
+            if name.endswith(".json")
+        )
+        for old_id in stored[: max(0, len(stored) - self.max_files)]:
+            for extension in ("json", "prof"):
+                old_path = os.path.join(self.directory, f"{old_id}.{extension}")
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list[dict[str, Any]]:
+        """
+        List the stored profiles, newest first.
+
+        Returns:
+            list[dict]: The summaries, without their function listings.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        summaries = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary.pop("top_functions", None)
+            summaries.append(summary)
+        return summaries
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
@@ -0,0 +1,367 @@
+"""Query budget guard.
+
+Every `find`, `count` and `aggregate` issued by the Mongo repository
+goes through the helpers in this module. They apply a per-operation
+`maxTimeMS` budget, log queries slower than SLOW_QUERY_THRESHOLD_MS
+together with the shape of their filter and the number of documents
+returned, and can sample slow shapes with `explain`, which logs the
+documents examined and flags collection scans before they become an
+incident. The driver does not report documents examined, so they are
+only logged for sampled queries; the slow-query entry and its explain
+entry share an `explain_id`.
+
+When a budget runs out the server raises `ExecutionTimeout`, which the
+Mongo repository re-raises as `QueryTimeoutError` and the application
+maps to a 504 response. This module is only imported with the Mongo
+backend, so it is free to import pymongo.
+
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from functools import partial
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+from pymongo.errors import ExecutionTimeout
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+logger = logging.getLogger(__name__)
+
+# Shape key -> time.monotonic() of the last explain, so each shape is
+# explained at most once per QUERY_EXPLAIN_INTERVAL_SECONDS.
+_explained_at: dict[str, float] = {}
+_MAX_EXPLAINED_SHAPES = 1024
+# Keeps running explain tasks referenced until they finish.
+_explain_tasks: set[asyncio.Task] = set()
+
+
+def max_time_ms(operation: str) -> int:
+    """Get the time budget for an operation.
+
+    Args:
+        operation: The service operation, e.g. "filter_items".
+
+    Returns:
+        The budget in milliseconds.
+    """
+    return settings.QUERY_MAX_TIME_MS.get(operation, settings.QUERY_DEFAULT_MAX_TIME_MS)
+
+
+def query_shape(query: Any) -> Any:
+    """Replace the values in a filter or pipeline with placeholders.
+
+    Two queries that differ only in their values have the same shape, so
+    the shape is what identifies a query pattern (and its index needs).
+
+    Args:
+        query: A filter document, pipeline, or value.
+
+    Returns:
+        The query with every leaf value replaced by "?".
+    """
+    if isinstance(query, dict):
+        return {key: query_shape(value) for key, value in query.items()}
+    if isinstance(query, (list, tuple)):
+        return [query_shape(value) for value in query[:1]]
+    return "?"
+
+
+def _find_key(document: Any, key: str, skip: tuple[str, ...] = ()) -> Any:
+    """Find the first value stored under `key` anywhere in a nested document."""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        children = [v for k, v in document.items() if k not in skip]
+    elif isinstance(document, list):
+        children = document
+    else:
+        return None
+    for child in children:
+        found = _find_key(child, key, skip)
+        if found is not None:
+            return found
+    return None
+
+
+def _has_collscan(document: Any) -> bool:
+    """Check whether a winning plan contains a COLLSCAN stage."""
+    if isinstance(document, dict):
+        if document.get("stage") == "COLLSCAN":
+            return True
+        return any(
+            _has_collscan(value)
+            for key, value in document.items()
+            if key not in ("rejectedPlans", "allPlansExecution")
+        )
+    if isinstance(document, list):
+        return any(_has_collscan(value) for value in document)
+    return False
+
+
+async def _explain(
+    collection: "AsyncIOMotorCollection",
+    command: dict,
+    shape_key: str,
+    explain_id: str,
+) -> None:
+    """Explain a slow query and log its plan summary under `explain_id`."""
+    try:
+        explanation = await collection.database.command(
+            {"explain": command, "verbosity": settings.QUERY_EXPLAIN_VERBOSITY},
+            read_preference=collection.read_preference,
+        )
+    except Exception as e:
+        logger.warning(
+            "Explain failed on %s: explain_id=%s shape=%s: %s",
+            collection.name,
+            explain_id,
+            shape_key,
+            e,
+        )
+        return
+
+    # find and count report executionStats at the top level; aggregations
+    # nest it in their first stage. Without "executionStats" verbosity
+    # there is nothing to report.
+    stats = explanation.get("executionStats") or _find_key(
+        explanation, "executionStats"
+    )
+    docs_examined = (stats or {}).get("totalDocsExamined", "n/a")
+    keys_examined = (stats or {}).get("totalKeysExamined", "n/a")
+    if _has_collscan(explanation):
+        logger.warning(
+            "COLLSCAN on %s: explain_id=%s shape=%s docs_examined=%s "
+            "keys_examined=%s",
+            collection.name,
+            explain_id,
+            shape_key,
+            docs_examined,
+            keys_examined,
+        )
+    else:
+        logger.info(
+            "Explained slow query on %s: explain_id=%s shape=%s docs_examined=%s "
+            "keys_examined=%s",
+            collection.name,
+            explain_id,
+            shape_key,
+            docs_examined,
+            keys_examined,
+        )
+
+
+def _maybe_explain(
+    collection: "AsyncIOMotorCollection", command: dict, shape_key: str
+) -> Optional[str]:
+    """Schedule an explain for a slow shape if sampling selects it.
+
+    Returns:
+        The ID the explain entry will be logged under, or None if no
+        explain was scheduled.
+    """
+    rate = settings.QUERY_EXPLAIN_SAMPLE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return None
+    now = time.monotonic()
+    last = _explained_at.get(shape_key)
+    if last is not None and now - last < settings.QUERY_EXPLAIN_INTERVAL_SECONDS:
+        return None
+    if len(_explained_at) >= _MAX_EXPLAINED_SHAPES:
+        _explained_at.clear()
+    _explained_at[shape_key] = now
+
+    explain_id = uuid.uuid4().hex[:12]
+    task = asyncio.create_task(_explain(collection, command, shape_key, explain_id))
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+    return explain_id
+
+
+async def _run(
+    collection: "AsyncIOMotorCollection",
+    operation: str,
+    command: dict,
+    shape: Any,
+    run: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Run a query, logging it if it is slow or exceeds its budget.
+
+    Args:
+        collection: The collection being queried.
+        operation: The service operation issuing the query.
+        command: The equivalent server command, used for `explain`.
+        shape: The query shape, used for logging.
+        run: A coroutine function executing the query.
+
+    Returns:
+        Whatever `run` returns.
+    """
+    start = time.perf_counter()
+    try:
+        result = await run()
+    except ExecutionTimeout:
+        logger.warning(
+            "Query budget exceeded: collection=%s operation=%s shape=%s budget_ms=%d",
+            collection.name,
+            operation,
+            json.dumps(shape, sort_keys=True),
+            command["maxTimeMS"],
+        )
+        raise
+
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        shape_key = json.dumps(shape, sort_keys=True)
+        if isinstance(result, list):
+            returned = len(result)
+        elif isinstance(result, int):
+            returned = result
+        else:
+            returned = int(result is not None)
+        # Documents examined are only known from an explain, which is
+        # logged separately under the same explain_id ("-" if not sampled).
+        explain_id = _maybe_explain(collection, command, shape_key)
+        logger.warning(
+            "Slow query: collection=%s operation=%s shape=%s duration_ms=%.1f "
+            "docs_returned=%d explain_id=%s",
+            collection.name,
+            operation,
+            shape_key,
+            duration_ms,
+            returned,
+            explain_id or "-",
+        )
+    return result
+
+
+async def find_many(
+    collection: "AsyncIOMotorCollection",
+    operation: str,
+    filter_query: dict,
+    **kwargs: Any,
+) -> list[dict]:
+    """Run a budgeted `find` and return every matching document.
+
+    Args:
+        collection: The collection to query.
+        operation: The service operation issuing the query.
+        filter_query: The filter document.
+        **kwargs: Extra arguments for `find`, e.g. `sort` or `limit`.
+
+    Returns:
+        list[dict]: The matching documents.
+    """
+    budget = max_time_ms(operation)
+    command = {"find": collection.name, "filter": filter_query, "maxTimeMS": budget}
+    if "sort" in kwargs:
+        command["sort"] = dict(kwargs["sort"])
+    for option in ("skip", "limit"):
+        if kwargs.get(option):
+            command[option] = kwargs[option]
+    return await _run(
+        collection,
+        operation,
+        command,
+        query_shape(filter_query),
+        lambda: collection.find(filter_query, max_time_ms=budget, **kwargs).to_list(
+            None
+        ),
+    )
+
+
+async def find_one(
+    collection: "AsyncIOMotorCollection", operation: str, filter_query: dict
+) -> Optional[dict]:
+    """Run a budgeted `find_one`.
+
+    Args:
+        collection: The collection to query.
+        operation: The service operation issuing the query.
+        filter_query: The filter document.
+
+    Returns:
+        The first matching document, or None.
+    """
+    budget = max_time_ms(operation)
+    command = {
+        "find": collection.name,
+        "filter": filter_query,
+        "limit": 1,
+        "maxTimeMS": budget,
+    }
+    return await _run(
+        collection,
+        operation,
+        command,
+        query_shape(filter_query),
+        lambda: collection.find_one(filter_query, max_time_ms=budget),
+    )
+
+
+async def aggregate(
+    collection: "AsyncIOMotorCollection", operation: str, pipeline: list[dict]
+) -> list[dict]:
+    """Run a budgeted aggregation and return every result document.
+
+    Args:
+        collection: The collection to aggregate.
+        operation: The service operation issuing the query.
+        pipeline: The aggregation pipeline.
+
+    Returns:
+        list[dict]: The result documents.
+    """
+    budget = max_time_ms(operation)
+    command = {
+        "aggregate": collection.name,
+        "pipeline": pipeline,
+        "cursor": {},
+        "maxTimeMS": budget,
+    }
+    # Stage names plus the shape of any $match identify the pipeline.
+    shape = [
+        {name: query_shape(body) if name == "$match" else "?"}
+        for stage in pipeline
+        for name, body in stage.items()
+    ]
+    return await _run(
+        collection,
+        operation,
+        command,
+        shape,
+        lambda: collection.aggregate(pipeline, maxTimeMS=budget).to_list(None),
+    )
+
+
+async def count(
+    collection: "AsyncIOMotorCollection", operation: str, filter_query: dict
+) -> int:
+    """Run a budgeted count.
+
+    An empty filter uses `estimated_document_count`, which reads the
+    collection metadata instead of scanning; otherwise `count_documents`
+    counts the matches, from the index when the filter allows it.
+
+    Args:
+        collection: The collection to count.
+        operation: The service operation issuing the query.
+        filter_query: The filter document.
+
+    Returns:
+        int: The number of matching documents.
+    """
+    budget = max_time_ms(operation)
+    command = {"count": collection.name, "query": filter_query, "maxTimeMS": budget}
+    if filter_query:
+        run = partial(collection.count_documents, filter_query, maxTimeMS=budget)
+    else:
+        run = partial(collection.estimated_document_count, maxTimeMS=budget)
+    return await _run(collection, operation, command, query_shape(filter_query), run)
@@ -0,0 +1,159 @@
+"""Per-client rate limiting for write endpoints.
+
+This module contains an in-memory token bucket (`TokenBucketLimiter`)
+and a FastAPI dependency factory (`rate_limit`) that enforces the
+RATE_LIMITS entry of a route, keyed by client IP. Fields of the request
+body (such as `email`) are chosen by the client and are not used as keys,
+since a client could evade its limit by changing them.
+
+The bucket is implemented as the generic cell rate algorithm (GCRA),
+which is equivalent to a token bucket but stores a single float per key:
+the "theoretical arrival time" at which the bucket will be full again.
+A key whose arrival time is in the past has a full bucket, so it carries
+no information and can be evicted, which keeps memory bounded by the
+number of recently active clients.
+
+"""
+
+import math
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+
+from app.config import settings
+
+_PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0}
+
+
+class TokenBucketLimiter(object):
+    """
+    A token bucket per key, stored as one float per key.
+
+    Keys are kept in a dict ordered by last use, so idle keys accumulate
+    at the front and are evicted by a cheap sweep from the front.
+
+    Attributes:
+        interval: Seconds to refill one token.
+        capacity: Seconds of credit in a full bucket (burst * interval).
+        max_keys: Upper bound on the number of tracked keys.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 1_000_000) -> None:
+        self.interval = 1.0 / rate
+        self.capacity = burst * self.interval
+        self.max_keys = max_keys
+        self._sweep_interval = max(1.0, self.capacity)
+        self._next_sweep = 0.0
+        self._buckets: dict[str, float] = {}
+
+    @classmethod
+    def from_spec(cls, spec: str, max_keys: int = 1_000_000) -> "TokenBucketLimiter":
+        """Build a limiter from a spec such as "30/minute".
+
+        The count is both the sustained rate over the period and the
+        burst size.
+
+        Args:
+            spec (str): "<count>/<second|minute|hour>".
+            max_keys (int): Upper bound on the number of tracked keys.
+
+        Returns:
+            TokenBucketLimiter: The limiter.
+        """
+        count, _, unit = spec.partition("/")
+        burst = int(count)
+        return cls(burst / _PERIODS[unit.strip()], burst, max_keys)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """Take one token from the bucket of `key`.
+
+        Args:
+            key (str): The client key.
+            now (float): The current monotonic time; defaults to now.
+
+        Returns:
+            float: 0.0 if the request is allowed, otherwise the number of
+            seconds until it would be.
+        """
+        if now is None:
+            now = time.monotonic()
+        buckets = self._buckets
+        # Popping and re-inserting keeps the dict ordered by last use.
+        tat = max(buckets.pop(key, now), now)
+        new_tat = tat + self.interval
+        if new_tat - now > self.capacity:
+            buckets[key] = tat
+            return new_tat - now - self.capacity
+        buckets[key] = new_tat
+        if now >= self._next_sweep or len(buckets) > self.max_keys:
+            self._sweep(now)
+        return 0.0
+
+    def _sweep(self, now: float) -> None:
+        """Evict idle keys from the front, plus the least recently used
+        keys beyond `max_keys`.
+
+        The scan stops at the first key that is still refilling, so a
+        sweep only touches keys that are evicted (plus one).
+        """
+        self._next_sweep = now + self._sweep_interval
+        overflow = len(self._buckets) - self.max_keys
+        evicted = []
+        for key, tat in self._buckets.items():
+            if tat > now and len(evicted) >= overflow:
+                break
+            evicted.append(key)
+        for key in evicted:
+            del self._buckets[key]
+
+
+def _client_key(request: Request) -> str:
+    """Identify the client of a request by its IP address.
+
+    When RATE_LIMIT_TRUST_FORWARDED is set, the X-Forwarded-For address
+    RATE_LIMIT_TRUSTED_PROXIES hops from the right is used; every proxy
+    appends to the header, so addresses left of it are client-supplied.
+    The peer address is used otherwise.
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            addresses = [address.strip() for address in forwarded.split(",")]
+            hops = min(settings.RATE_LIMIT_TRUSTED_PROXIES, len(addresses))
+            return "ip:" + addresses[-hops]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def rate_limit(route: str) -> Callable[[Request], Awaitable[None]]:
+    """Build a dependency enforcing the RATE_LIMITS entry for `route`.
+
+    Args:
+        route (str): The route name, e.g. "create_item".
+
+    Returns:
+        A FastAPI dependency that raises a 429 with `Retry-After` once
+        the client has used up its bucket.
+    """
+    spec = settings.RATE_LIMITS.get(route)
+    limiter = (
+        TokenBucketLimiter.from_spec(spec, settings.RATE_LIMIT_MAX_KEYS)
+        if spec
+        else None
+    )
+
+    async def dependency(request: Request) -> None:
+        if limiter is None:
+            return
+        retry_after = limiter.hit(_client_key(request))
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return dependency
@@ -0,0 +1,169 @@
+"""Storage repository interface.
+
+This module contains the `Repository` base class, the document-level
+interface the services use to read and write a collection, and the
+errors its implementations raise. Documents are plain dicts in the shape
+MongoDB stores them: `_id` is an `ObjectId` and datetimes are naive UTC.
+
+Every method takes the service operation issuing it (e.g.
+"filter_items"), which implementations may use to pick a read
+preference or a time budget.
+
+"""
+
+import abc
+from typing import Any, AsyncIterator, Optional
+
+Sort = list[tuple[str, int]]
+
+
+class DuplicateKeyError(Exception):
+    """Raised when an insert would duplicate an existing `_id`."""
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query runs out of its time budget."""
+
+
+class StorageUnavailableError(Exception):
+    """Raised when the storage backend cannot be reached."""
+
+
+class Repository(abc.ABC):
+    """
+    Base class for collection repositories.
+
+    Filters use the MongoDB query language. Implementations must support
+    at least field equality, `$eq`, `$ne`, `$gt`, `$gte`, `$lt`, `$lte`,
+    `$in`, `$and` and `$or`, which is everything the services issue.
+
+    Attributes:
+        name: The collection name.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    @abc.abstractmethod
+    async def insert_one(self, operation: str, document: dict) -> Any:
+        """
+        Insert a document, generating its `_id` if it has none.
+
+        Args:
+            operation (str): The service operation issuing the write.
+            document (dict): The document; its `_id` is set in place.
+
+        Returns:
+            The `_id` of the inserted document.
+
+        Raises:
+            DuplicateKeyError: If a document with the same `_id` exists.
+        """
+
+    @abc.abstractmethod
+    async def find_one(self, operation: str, filter_query: dict) -> Optional[dict]:
+        """
+        Get the first document matching a filter.
+
+        Args:
+            operation (str): The service operation issuing the query.
+            filter_query (dict): The filter document.
+
+        Returns:
+            dict: The document, or None if nothing matches.
+        """
+
+    @abc.abstractmethod
+    async def find(
+        self,
+        operation: str,
+        filter_query: dict,
+        projection: Optional[dict] = None,
+        sort: Optional[Sort] = None,
+        skip: int = 0,
+        limit: int = 0,
+    ) -> list[dict]:
+        """
+        Get every document matching a filter.
+
+        Args:
+            operation (str): The service operation issuing the query.
+            filter_query (dict): The filter document.
+            projection (dict): The fields to return, e.g. {"email": 1}.
+            sort (list[tuple[str, int]]): (field, 1 or -1) pairs.
+            skip (int): The number of documents to skip.
+            limit (int): The maximum number of documents; 0 for all.
+
+        Returns:
+            list[dict]: The matching documents.
+        """
+
+    @abc.abstractmethod
+    def scan(
+        self, operation: str, filter_query: dict, projection: Optional[dict] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Stream the documents matching a filter without loading them all.
+
+        Args:
+            operation (str): The service operation issuing the query.
+            filter_query (dict): The filter document.
+            projection (dict): The fields to return.
+
+        Returns:
+            An async iterator over the matching documents.
+        """
+
+    @abc.abstractmethod
+    async def count(self, operation: str, filter_query: dict) -> int:
+        """
+        Count the documents matching a filter.
+
+        Args:
+            operation (str): The service operation issuing the query.
+            filter_query (dict): The filter document.
+
+        Returns:
+            int: The number of matching documents.
+        """
+
+    @abc.abstractmethod
+    async def update_one(self, operation: str, filter_query: dict, values: dict) -> int:
+        """
+        Set fields on the first document matching a filter.
+
+        Args:
+            operation (str): The service operation issuing the write.
+            filter_query (dict): The filter document.
+            values (dict): The fields to set.
+
+        Returns:
+            int: 1 if a document was modified, 0 otherwise (no match, or
+            every value was already set).
+        """
+
+    @abc.abstractmethod
+    async def delete_one(self, operation: str, filter_query: dict) -> int:
+        """
+        Delete the first document matching a filter.
+
+        Args:
+            operation (str): The service operation issuing the write.
+            filter_query (dict): The filter document.
+
+        Returns:
+            int: The number of deleted documents, 0 or 1.
+        """
+
+    @abc.abstractmethod
+    async def aggregate(self, operation: str, pipeline: list[dict]) -> list[dict]:
+        """
+        Run an aggregation pipeline.
+
+        Args:
+            operation (str): The service operation issuing the query.
+            pipeline (list[dict]): The aggregation pipeline.
+
+        Returns:
+            list[dict]: The result documents.
+        """
@@ -0,0 +1,706 @@
+"""In-memory repository.
+
+This module contains `InMemoryRepository`, a `Repository` that keeps a
+collection in a dict, for integration tests and for benchmarks that must
+measure the application without a database behind it.
+
+Documents are normalized the way a BSON round trip would (datetimes
+become naive UTC with millisecond precision), so services behave as they
+do against MongoDB. Each indexed field has a `SortedEntries` of
+`(type rank, value, _id)`: a query picks the most selective usable index
+(equality, then `$in`, then ranges), scans only its matching range, and
+checks the rest of the filter on those candidates. When the sort follows
+that index, the scan stops as soon as `skip + limit` documents match.
+
+Comparisons follow MongoDB's ordering across types: query operators
+only match values of the same type as the operand, and sorting and
+aggregation expressions order values by BSON type first. The aggregation
+pipeline supports `$match`, `$group`, `$project`, `$sort`, `$skip` and
+`$limit` with the expression operators the services use.
+
+"""
+
+import asyncio
+import operator
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Optional
+
+from bson import ObjectId
+
+from app.phase_timing import timed
+from app.repositories.base import DuplicateKeyError, Repository, Sort
+from app.sorted_entries import SortedEntries
+
+# Stands for a field that is absent from a document.
+_MISSING = object()
+
+# Ranks of the types that can be ordered by value within their rank.
+_ORDERABLE_RANKS = frozenset((2, 3, 7, 8, 9))
+
+_QUERY_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+# Documents scanned between two yields to the event loop in `scan`.
+_SCAN_BATCH = 1000
+
+
+_RANKS_BY_TYPE = {
+    type(None): 1,
+    int: 2,
+    float: 2,
+    str: 3,
+    dict: 4,
+    list: 5,
+    ObjectId: 7,
+    bool: 8,
+    datetime: 9,
+}
+
+
+def _rank(value: Any) -> int:
+    """Get the position of a value's type in MongoDB's comparison order."""
+    rank = _RANKS_BY_TYPE.get(type(value))
+    if rank is not None:
+        return rank
+    if value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _sort_key(value: Any) -> tuple:
+    """Get a key ordering values across types like MongoDB does."""
+    rank = _rank(value)
+    return (rank, value) if rank in _ORDERABLE_RANKS else (rank,)
+
+
+def _to_stored(value: Any) -> Any:
+    """Copy a value as it would come back from MongoDB."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    if isinstance(value, dict):
+        return {key: _to_stored(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_stored(item) for item in value]
+    return value
+
+
+def _clone(value: Any) -> Any:
+    """Copy the containers of a stored value, so callers cannot alter it."""
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+
+def _get(document: Any, path: str) -> Any:
+    """Get the value at a dotted path, or _MISSING."""
+    if "." not in path:
+        if isinstance(document, dict):
+            return document.get(path, _MISSING)
+        return _MISSING
+    for part in path.split("."):
+        if not isinstance(document, dict) or part not in document:
+            return _MISSING
+        document = document[part]
+    return document
+
+
+def _equal(value: Any, operand: Any) -> bool:
+    """Check query equality; null matches missing fields, arrays their items."""
+    if operand is None:
+        return value is None or value is _MISSING
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _compare(op: str, value: Any, operand: Any) -> bool:
+    """Apply one query operator to a field value."""
+    if op == "$eq":
+        return _equal(value, operand)
+    if op == "$ne":
+        return not _equal(value, operand)
+    if op == "$in":
+        return any(_equal(value, item) for item in operand)
+    if op == "$nin":
+        return not any(_equal(value, item) for item in operand)
+    compare = _QUERY_OPERATORS.get(op)
+    if compare is None:
+        raise ValueError(f"Unsupported query operator: {op}")
+    rank = _rank(operand)
+    if value is _MISSING or _rank(value) != rank:
+        return False
+    if rank not in _ORDERABLE_RANKS:
+        return op in ("$gte", "$lte") and value == operand
+    return compare(value, operand)
+
+
+def _matches(document: dict, filter_query: dict) -> bool:
+    """Check whether a document matches a filter."""
+    for key, condition in filter_query.items():
+        if key == "$and":
+            if not all(_matches(document, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(document, f) for f in condition):
+                return False
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported query operator: {key}")
+        else:
+            value = _get(document, key)
+            if _is_operator_document(condition):
+                if not all(
+                    _compare(op, value, operand) for op, operand in condition.items()
+                ):
+                    return False
+            elif not _equal(value, condition):
+                return False
+    return True
+
+
+def _is_operator_document(condition: Any) -> bool:
+    """Check whether a filter condition is made of query operators."""
+    return (
+        isinstance(condition, dict)
+        and bool(condition)
+        and next(iter(condition)).startswith("$")
+    )
+
+
+def _sort(documents: list[dict], sort: Sort) -> None:
+    """Sort documents in place by (field, direction) pairs."""
+    for field, direction in reversed(sort):
+        documents.sort(key=lambda d: _sort_key(_get(d, field)), reverse=direction < 0)
+
+
+def _project(document: dict, projection: Optional[dict]) -> dict:
+    """Copy a document, keeping only the projected fields."""
+    if not projection:
+        return _clone(document)
+    if all(not value for key, value in projection.items() if key != "_id"):
+        excluded = {key for key, value in projection.items() if not value}
+        return {k: _clone(v) for k, v in document.items() if k not in excluded}
+    fields = [key for key, value in projection.items() if value and key != "_id"]
+    if projection.get("_id", 1):
+        fields.insert(0, "_id")
+    return {key: _clone(document[key]) for key in fields if key in document}
+
+
+def _truthy(value: Any) -> bool:
+    """Check truthiness the way aggregation expressions do."""
+    if value is None or value is _MISSING or value is False:
+        return False
+    return not (isinstance(value, (int, float)) and value == 0)
+
+
+def _add(args: list[Any]) -> Any:
+    """Evaluate `$add`: numbers add up, numbers added to a date are ms."""
+    if any(arg is None or arg is _MISSING for arg in args):
+        return None
+    dates = [arg for arg in args if isinstance(arg, datetime)]
+    total = sum(arg for arg in args if not isinstance(arg, datetime))
+    if dates:
+        return dates[0] + timedelta(milliseconds=total)
+    return total
+
+
+def _round(args: list[Any]) -> Any:
+    """Evaluate `$round`."""
+    value, places = args[0], args[1] if len(args) > 1 else 0
+    return None if value is None or value is _MISSING else round(value, places)
+
+
+def _comparison(compare: Callable[[Any, Any], bool]) -> Callable[[list], bool]:
+    """Build an expression comparison ordering values across types."""
+    return lambda args: compare(_sort_key(args[0]), _sort_key(args[1]))
+
+
+# Expression operators taking a list of evaluated arguments.
+_EXPRESSION_OPERATORS: dict[str, Callable[[list[Any]], Any]] = {
+    "$and": lambda args: all(_truthy(arg) for arg in args),
+    "$or": lambda args: any(_truthy(arg) for arg in args),
+    "$not": lambda args: not _truthy(args[0]),
+    "$eq": _comparison(operator.eq),
+    "$ne": _comparison(operator.ne),
+    "$gt": _comparison(operator.gt),
+    "$gte": _comparison(operator.ge),
+    "$lt": _comparison(operator.lt),
+    "$lte": _comparison(operator.le),
+    "$add": _add,
+    "$size": lambda args: len(args[0]),
+    "$round": _round,
+}
+
+# A compiled expression: (document, variables) -> value.
+Expression = Callable[[dict, dict[str, Any]], Any]
+
+
+def _constant(value: Any) -> Expression:
+    """Compile a constant; `is_constant` lets enclosing operators fold it."""
+    expression = lambda document, variables: value  # noqa: E731
+    expression.is_constant = True
+    return expression
+
+
+def _compile(expression: Any) -> Expression:
+    """
+    Compile an aggregation expression into a function.
+
+    A pipeline is compiled once and then applied to every document, and
+    operators whose arguments are all constants are evaluated right away,
+    so per-document work is only the parts that depend on the document.
+    """
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, _, path = expression[2:].partition(".")
+        if name == "ROOT":
+            return lambda d, v: _get(d, path) if path else d
+        return lambda d, v: _get(v.get(name, _MISSING), path) if path else v.get(
+            name, _MISSING
+        )
+    if isinstance(expression, str) and expression.startswith("$"):
+        path = expression[1:]
+        return lambda d, v: _get(d, path)
+    if isinstance(expression, list):
+        items = [_compile(item) for item in expression]
+        return lambda d, v: [item(d, v) for item in items]
+    if not isinstance(expression, dict):
+        return _constant(expression)
+    if not _is_operator_document(expression):
+        fields = [(key, _compile(value)) for key, value in expression.items()]
+        return lambda d, v: {
+            key: value
+            for key, value in ((key, field(d, v)) for key, field in fields)
+            if value is not _MISSING
+        }
+
+    ((name, argument),) = expression.items()
+    if name == "$literal":
+        return _constant(argument)
+    if name == "$filter":
+        return _compile_filter(argument)
+    evaluate = _EXPRESSION_OPERATORS.get(name)
+    if evaluate is None:
+        raise ValueError(f"Unsupported aggregation operator: {name}")
+    # Operators take a list of arguments, or a single one on its own.
+    args = [
+        _compile(item)
+        for item in (argument if isinstance(argument, list) else [argument])
+    ]
+    if all(getattr(arg, "is_constant", False) for arg in args):
+        return _constant(evaluate([arg(None, {}) for arg in args]))
+    return lambda d, v: evaluate([arg(d, v) for arg in args])
+
+
+def _compile_filter(argument: dict) -> Expression:
+    """Compile a `$filter` expression."""
+    items = _compile(argument["input"])
+    condition = _compile(argument["cond"])
+    alias = argument.get("as", "this")
+
+    def evaluate(document: dict, variables: dict[str, Any]) -> Any:
+        values = items(document, variables)
+        if values is None or values is _MISSING:
+            return None
+        scope = dict(variables)
+        kept = []
+        for value in values:
+            scope[alias] = value
+            if _truthy(condition(document, scope)):
+                kept.append(value)
+        return kept
+
+    return evaluate
+
+
+def _hashable(value: Any) -> Any:
+    """Make a group key hashable."""
+    if isinstance(value, dict):
+        return tuple((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+def _is_number(value: Any) -> bool:
+    """Check whether a value is a number (booleans are not)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _group(documents: list[dict], spec: dict) -> list[dict]:
+    """Evaluate a `$group` stage."""
+    key_of = _compile(spec["_id"])
+    accumulators = []
+    for field, accumulator in spec.items():
+        if field != "_id":
+            ((name, argument),) = accumulator.items()
+            accumulators.append((field, name, _compile(argument)))
+
+    groups: dict[Any, dict] = {}
+    for document in documents:
+        key = key_of(document, {})
+        key = None if key is _MISSING else key
+        group = groups.get(_hashable(key))
+        if group is None:
+            group = groups[_hashable(key)] = {"_id": key}
+            for field, name, _ in accumulators:
+                if name == "$sum":
+                    group[field] = 0
+                elif name == "$avg":
+                    group[field] = [0, 0]
+                elif name in ("$push", "$addToSet"):
+                    group[field] = []
+                else:
+                    group[field] = _MISSING
+        for field, name, argument in accumulators:
+            value = argument(document, {})
+            current = group[field]
+            if name == "$sum":
+                if _is_number(value):
+                    group[field] = current + value
+            elif name == "$avg":
+                if _is_number(value):
+                    current[0] += value
+                    current[1] += 1
+            elif name in ("$min", "$max"):
+                if value is None or value is _MISSING:
+                    continue
+                better = operator.lt if name == "$min" else operator.gt
+                if current is _MISSING or better(_sort_key(value), _sort_key(current)):
+                    group[field] = value
+            elif name == "$push":
+                if value is not _MISSING:
+                    current.append(value)
+            elif name == "$addToSet":
+                if value is not _MISSING and value not in current:
+                    current.append(value)
+            elif name == "$first":
+                if current is _MISSING:
+                    group[field] = None if value is _MISSING else value
+            elif name == "$last":
+                group[field] = None if value is _MISSING else value
+            else:
+                raise ValueError(f"Unsupported accumulator: {name}")
+
+    for group in groups.values():
+        for field, name, _ in accumulators:
+            value = group[field]
+            if name == "$avg":
+                value = value[0] / value[1] if value[1] else None
+            group[field] = None if value is _MISSING else value
+    return list(groups.values())
+
+
+def _is_flag(value: Any) -> bool:
+    """Check whether a `$project` value includes or excludes a field."""
+    return isinstance(value, (bool, int, float))
+
+
+def _project_stage(documents: list[dict], spec: dict) -> list[dict]:
+    """Evaluate a `$project` stage."""
+    fields = {key: value for key, value in spec.items() if key != "_id"}
+    if all(_is_flag(value) and not value for value in fields.values()):
+        excluded = {key for key, value in spec.items() if not value}
+        return [
+            {k: v for k, v in document.items() if k not in excluded}
+            for document in documents
+        ]
+
+    id_spec = spec.get("_id", True)
+    if not _is_flag(id_spec):
+        fields = {"_id": id_spec, **fields}
+    keep_id = _is_flag(id_spec) and bool(id_spec)
+    included = [key for key, value in fields.items() if _is_flag(value) and value]
+    computed = [
+        (key, _compile(value)) for key, value in fields.items() if not _is_flag(value)
+    ]
+
+    results = []
+    for document in documents:
+        result = {"_id": document["_id"]} if keep_id and "_id" in document else {}
+        for field in included:
+            if field in document:
+                result[field] = document[field]
+        for field, expression in computed:
+            value = expression(document, {})
+            if value is not _MISSING:
+                result[field] = value
+        results.append(result)
+    return results
+
+
+class InMemoryRepository(Repository):
+    """
+    A collection repository held in process memory.
+
+    Array values are not indexed (there are no multikey indexes), so
+    indexed fields are expected to hold scalars, as they do in this app.
+
+    Attributes:
+        name: The collection name.
+        indexed_fields: The fields with a secondary index.
+    """
+
+    def __init__(self, name: str, indexed_fields: Iterable[str] = ()) -> None:
+        super().__init__(name)
+        self.indexed_fields = tuple(dict.fromkeys(indexed_fields))
+        self._documents: dict[Any, dict] = {}
+        self._indexes = {field: SortedEntries() for field in self.indexed_fields}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _index(self, document: dict, fields: Iterable[str]) -> None:
+        """Add a document's values for `fields` to their indexes."""
+        for field in fields:
+            index = self._indexes.get(field)
+            value = _get(document, field)
+            if index is not None and _rank(value) in _ORDERABLE_RANKS:
+                index.add((_rank(value), value, document["_id"]))
+
+    def _unindex(self, document: dict, fields: Iterable[str]) -> None:
+        """Remove a document's values for `fields` from their indexes."""
+        for field in fields:
+            index = self._indexes.get(field)
+            value = _get(document, field)
+            if index is not None and _rank(value) in _ORDERABLE_RANKS:
+                index.discard((_rank(value), value, document["_id"]))
+
+    def _range(
+        self,
+        field: str,
+        low: Any = _MISSING,
+        low_inclusive: bool = True,
+        high: Any = _MISSING,
+        high_inclusive: bool = True,
+    ) -> Iterator[Any]:
+        """Iterate over the IDs whose `field` lies in a range, in value order."""
+        anchor = low if low is not _MISSING else high
+        rank = _rank(anchor)
+        if high is not _MISSING and _rank(high) != rank:
+            return
+        start = (rank, low) if low is not _MISSING else (rank,)
+        for entry_rank, value, document_id in self._indexes[field].iter_from(start):
+            if entry_rank != rank:
+                return
+            if not low_inclusive and value == low:
+                continue
+            if high is not _MISSING and (
+                value > high or (not high_inclusive and value == high)
+            ):
+                return
+            yield document_id
+
+    def _plan(self, filter_query: dict) -> tuple[Optional[str], Iterable[Any]]:
+        """
+        Choose how to find the candidates for a filter.
+
+        Returns:
+            The indexed field used (or None) and the candidate IDs, ordered
+            by (field value, _id) when an index is used.
+        """
+        best = None
+        for field, condition in filter_query.items():
+            operators = (
+                condition
+                if _is_operator_document(condition)
+                else {"$eq": condition}
+            )
+            if field == "_id":
+                if "$eq" in operators:
+                    return None, [operators["$eq"]]
+                if "$in" in operators:
+                    return None, list(dict.fromkeys(operators["$in"]))
+                continue
+            if field not in self._indexes:
+                continue
+
+            if "$eq" in operators and _rank(operators["$eq"]) in _ORDERABLE_RANKS:
+                value = operators["$eq"]
+                plan = (0, lambda f=field, v=value: self._range(f, v, True, v, True))
+            elif "$in" in operators and all(
+                _rank(value) in _ORDERABLE_RANKS for value in operators["$in"]
+            ):
+                values = sorted(set(operators["$in"]), key=_sort_key)
+                plan = (
+                    1,
+                    lambda f=field, vs=values: (
+                        document_id
+                        for v in vs
+                        for document_id in self._range(f, v, True, v, True)
+                    ),
+                )
+            else:
+                low = high = _MISSING
+                low_inclusive = high_inclusive = True
+                for op, operand in operators.items():
+                    if _rank(operand) not in _ORDERABLE_RANKS:
+                        continue
+                    if op in ("$gt", "$gte"):
+                        low, low_inclusive = operand, op == "$gte"
+                    elif op in ("$lt", "$lte"):
+                        high, high_inclusive = operand, op == "$lte"
+                if low is _MISSING and high is _MISSING:
+                    continue
+                bounds = (low, low_inclusive, high, high_inclusive)
+                plan = (
+                    2 if low is not _MISSING and high is not _MISSING else 3,
+                    lambda f=field, b=bounds: self._range(f, *b),
+                )
+            if best is None or plan[0] < best[0]:
+                best = (plan[0], field, plan[1])
+
+        if best is None:
+            return None, list(self._documents)
+        return best[1], best[2]()
+
+    def _select(
+        self,
+        filter_query: dict,
+        sort: Optional[Sort] = None,
+        skip: int = 0,
+        limit: int = 0,
+    ) -> list[dict]:
+        """Get the stored documents matching a filter, sorted and paginated."""
+        filter_query = _to_stored(filter_query)
+        field, candidates = self._plan(filter_query)
+        in_index_order = field is not None and (
+            not sort or list(sort) in ([(field, 1)], [(field, 1), ("_id", 1)])
+        )
+        stop = skip + limit if limit and (not sort or in_index_order) else None
+
+        documents = []
+        for document_id in candidates:
+            document = self._documents.get(document_id)
+            if document is not None and _matches(document, filter_query):
+                documents.append(document)
+                if stop is not None and len(documents) >= stop:
+                    break
+        if sort and not in_index_order:
+            _sort(documents, sort)
+        return documents[skip : skip + limit if limit else None]
+
+    @timed("db")
+    async def insert_one(self, operation: str, document: dict) -> Any:
+        document.setdefault("_id", ObjectId())
+        document_id = document["_id"]
+        if document_id in self._documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} "
+                f"dup key: {{ _id: {document_id!r} }}"
+            )
+        stored = _to_stored(document)
+        self._documents[document_id] = stored
+        self._index(stored, self.indexed_fields)
+        return document_id
+
+    @timed("db")
+    async def find_one(self, operation: str, filter_query: dict) -> Optional[dict]:
+        documents = self._select(filter_query, limit=1)
+        return _clone(documents[0]) if documents else None
+
+    @timed("db")
+    async def find(
+        self,
+        operation: str,
+        filter_query: dict,
+        projection: Optional[dict] = None,
+        sort: Optional[Sort] = None,
+        skip: int = 0,
+        limit: int = 0,
+    ) -> list[dict]:
+        return [
+            _project(document, projection)
+            for document in self._select(filter_query, sort, skip, limit)
+        ]
+
+    async def scan(
+        self, operation: str, filter_query: dict, projection: Optional[dict] = None
+    ) -> AsyncIterator[dict]:
+        documents = self._select(filter_query)
+        for i in range(0, len(documents), _SCAN_BATCH):
+            for document in documents[i : i + _SCAN_BATCH]:
+                yield _project(document, projection)
+            await asyncio.sleep(0)
+
+    @timed("db")
+    async def count(self, operation: str, filter_query: dict) -> int:
+        if not filter_query:
+            return len(self._documents)
+        return len(self._select(filter_query))
+
+    @timed("db")
+    async def update_one(self, operation: str, filter_query: dict, values: dict) -> int:
+        documents = self._select(filter_query, limit=1)
+        if not documents:
+            return 0
+        document = documents[0]
+        changed = {
+            field: value
+            for field, value in _to_stored(values).items()
+            if document.get(field, _MISSING) != value
+        }
+        if not changed:
+            return 0
+        self._unindex(document, changed)
+        document.update(changed)
+        self._index(document, changed)
+        return 1
+
+    @timed("db")
+    async def delete_one(self, operation: str, filter_query: dict) -> int:
+        documents = self._select(filter_query, limit=1)
+        if not documents:
+            return 0
+        document = documents[0]
+        self._unindex(document, self.indexed_fields)
+        del self._documents[document["_id"]]
+        return 1
+
+    @timed("db")
+    async def aggregate(self, operation: str, pipeline: list[dict]) -> list[dict]:
+        pipeline = _to_stored(pipeline)
+        if pipeline and "$match" in pipeline[0]:
+            documents = self._select(pipeline[0]["$match"])
+            pipeline = pipeline[1:]
+        else:
+            documents = list(self._documents.values())
+
+        for stage in pipeline:
+            ((name, spec),) = stage.items()
+            if name == "$match":
+                documents = [d for d in documents if _matches(d, spec)]
+            elif name == "$group":
+                documents = _group(documents, spec)
+            elif name == "$project":
+                documents = _project_stage(documents, spec)
+            elif name == "$sort":
+                documents = list(documents)
+                _sort(documents, list(spec.items()))
+            elif name == "$skip":
+                documents = documents[spec:]
+            elif name == "$limit":
+                documents = documents[:spec]
+            else:
+                raise ValueError(f"Unsupported aggregation stage: {name}")
+        return [_clone(document) for document in documents]
@@ -0,0 +1,117 @@
+"""MongoDB repository.
+
+This module contains `MongoRepository`, the `Repository` implementation
+backed by Motor. Reads go through the query guard, so they keep their
+per-operation read routing, time budgets and slow query logging. Driver
+errors are translated to the repository errors, so that nothing above
+this layer needs to import pymongo.
+
+"""
+
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from pymongo import errors
+
+from app import query_guard
+from app.database import get_collection
+from app.phase_timing import timed
+from app.repositories.base import (
+    DuplicateKeyError,
+    QueryTimeoutError,
+    Repository,
+    Sort,
+    StorageUnavailableError,
+)
+
+
+@contextmanager
+def _translate_errors() -> Iterator[None]:
+    """Re-raise driver errors as the repository errors."""
+    try:
+        yield
+    except errors.DuplicateKeyError as e:
+        raise DuplicateKeyError(str(e)) from e
+    except errors.ExecutionTimeout as e:
+        raise QueryTimeoutError(str(e)) from e
+    except errors.ConnectionFailure as e:
+        raise StorageUnavailableError(str(e)) from e
+
+
+class MongoRepository(Repository):
+    """A collection repository backed by MongoDB."""
+
+    @timed("db")
+    async def insert_one(self, operation: str, document: dict) -> Any:
+        collection = get_collection(self.name, operation)
+        with _translate_errors():
+            result = await collection.insert_one(document)
+        return result.inserted_id
+
+    @timed("db")
+    async def find_one(self, operation: str, filter_query: dict) -> Optional[dict]:
+        collection = get_collection(self.name, operation)
+        with _translate_errors():
+            return await query_guard.find_one(collection, operation, filter_query)
+
+    @timed("db")
+    async def find(
+        self,
+        operation: str,
+        filter_query: dict,
+        projection: Optional[dict] = None,
+        sort: Optional[Sort] = None,
+        skip: int = 0,
+        limit: int = 0,
+    ) -> list[dict]:
+        collection = get_collection(self.name, operation)
+        options = {}
+        if projection is not None:
+            options["projection"] = projection
+        if sort:
+            options["sort"] = sort
+        if skip:
+            options["skip"] = skip
+        if limit:
+            options["limit"] = limit
+        with _translate_errors():
+            return await query_guard.find_many(
+                collection, operation, filter_query, **options
+            )
+
+    async def scan(
+        self, operation: str, filter_query: dict, projection: Optional[dict] = None
+    ) -> AsyncIterator[dict]:
+        collection = get_collection(self.name, operation)
+        cursor = collection.find(
+            filter_query, projection, max_time_ms=query_guard.max_time_ms(operation)
+        )
+        with _translate_errors():
+            async for document in cursor:
+                yield document
+
+    @timed("db")
+    async def count(self, operation: str, filter_query: dict) -> int:
+        collection = get_collection(self.name, operation)
+        with _translate_errors():
+            return await query_guard.count(collection, operation, filter_query)
+
+    @timed("db")
+    async def update_one(self, operation: str, filter_query: dict, values: dict) -> int:
+        collection = get_collection(self.name, operation)
+        with _translate_errors():
+            result = await collection.update_one(filter_query, {"$set": values})
+        return result.modified_count
+
+    @timed("db")
+    async def delete_one(self, operation: str, filter_query: dict) -> int:
+        collection = get_collection(self.name, operation)
+        with _translate_errors():
+            result = await collection.delete_one(filter_query)
+        return result.deleted_count
+
+    @timed("db")
+    async def aggregate(self, operation: str, pipeline: list[dict]) -> list[dict]:
+        collection = get_collection(self.name, operation)
+        with _translate_errors():
+            return await query_guard.aggregate(collection, operation, pipeline)
@@ -8,6 +8,7 @@ clock-in records in the database and the API.
 
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Optional
 
 
 class ClockInBase(BaseModel):
@@ -72,3 +73,17 @@ class ClockInInDB(ClockInBase):
         """
 
         allow_population_by_field_name = True
+
+
+class ClockInBatchResult(BaseModel):
+    """
+    The result of fetching clock-in records by ID in one call.
+
+    Attributes:
+        clock_ins (list[Optional[ClockInInDB]]): One entry per requested
+            ID, in request order, None where the record was not found.
+        missing (list[str]): The requested IDs that were not found.
+    """
+
+    clock_ins: list[Optional[ClockInInDB]]
+    missing: list[str]
@@ -0,0 +1,46 @@
+"""
+Schemas shared by the item and clock-in APIs.
+
+This module contains the Pydantic models for request and response
+bodies that do not belong to a single entity.
+
+"""
+
+from bson import ObjectId
+from pydantic import BaseModel, Field
+
+from app.config import settings
+
+
+class BatchGetRequest(BaseModel):
+    """
+    Request body for fetching several records by ID in one call.
+
+    Attributes:
+        ids (list[str]): The IDs to fetch, at most BATCH_GET_MAX_IDS.
+    """
+
+    ids: list[str] = Field(min_length=1, max_length=settings.BATCH_GET_MAX_IDS)
+
+    def canonical_ids(self) -> list[str]:
+        """
+        The IDs in the form results are keyed by.
+
+        ObjectIds are case-insensitive hex but are keyed in lowercase, so
+        valid IDs are normalized; other IDs are returned unchanged.
+
+        Returns:
+            list[str]: One canonical ID per requested ID, in request order.
+        """
+        return [str(ObjectId(i)) if ObjectId.is_valid(i) else i for i in self.ids]
+
+
+class CountResult(BaseModel):
+    """
+    The number of records matching a filter.
+
+    Attributes:
+        count (int): The number of matching records.
+    """
+
+    count: int
@@ -97,6 +97,34 @@ class ItemInDB(ItemBase):
         allow_population_by_field_name = True
 
 
+class ItemBatchResult(BaseModel):
+    """
+    The result of fetching items by ID in one call.
+
+    Attributes:
+        items (list[Optional[ItemInDB]]): One entry per requested ID, in
+            request order, None where the item was not found.
+        missing (list[str]): The requested IDs that were not found.
+    """
+
+    items: list[Optional[ItemInDB]]
+    missing: list[str]
+
+
+class ItemSearchHit(BaseModel):
+    """
+    An item matched by a prefix search.
+
+    This model contains the fields kept in the in-memory search index,
+    so search results never need a database round trip.
+    """
+
+    id: str
+    email: str
+    name: str
+    item_name: str
+
+
 class AggregatedItemDetail(BaseModel):
     """
     An item detail in an aggregated item.
@@ -0,0 +1,228 @@
+"""Live feed of new clock-in records.
+
+This module contains the `ClockInFeed` class, which fans out every
+clock-in committed by `ClockInService.create_clock_in` to the connected
+subscribers, each filtered by email and/or location.
+
+Each event is serialized once and handed to the matching subscribers
+only: subscribers are indexed by their email filter (or location filter,
+or neither), so publishing touches the subscribers that can match rather
+than all of them. Every subscriber has a bounded queue; when a consumer
+falls behind, either its oldest pending events are dropped or it is
+disconnected, depending on CLOCK_IN_FEED_SLOW_POLICY, so one slow client
+never holds memory or delays the others. Closing a subscription sets an
+event of its own rather than queueing a stop marker, so dropping events
+from a full queue can never lose it.
+
+The feed is per process; with several workers, each one only sees the
+clock-ins it created itself.
+
+"""
+
+import asyncio
+from typing import Optional
+
+from app.config import settings
+from app.metrics import metrics
+from app.schemas.clock_in import ClockInInDB
+
+dropped_events = metrics.counter(
+    "clock_in_feed_dropped_total", "Feed events dropped for slow subscribers."
+)
+
+# (clock-in id, JSON payload)
+FeedEvent = tuple[str, str]
+
+
+class Subscription(object):
+    """
+    A feed subscriber.
+
+    Attributes:
+        email: Only receive clock-ins for this email, if set.
+        location: Only receive clock-ins at this location, if set.
+        queue: Pending events for this subscriber.
+        closed: Set once the subscriber should stop.
+        overflowed: Whether the subscriber was disconnected for being slow.
+    """
+
+    __slots__ = ("email", "location", "queue", "closed", "overflowed")
+
+    def __init__(
+        self, email: Optional[str], location: Optional[str], queue_size: int
+    ) -> None:
+        self.email = email
+        self.location = location
+        self.queue: asyncio.Queue[FeedEvent] = asyncio.Queue(maxsize=queue_size)
+        self.closed = asyncio.Event()
+        self.overflowed = False
+
+    def matches(self, clock_in: ClockInInDB) -> bool:
+        """Check whether a clock-in passes this subscriber's filters."""
+        return (self.email is None or self.email == clock_in.email) and (
+            self.location is None or self.location == clock_in.location
+        )
+
+    async def get(self) -> Optional[FeedEvent]:
+        """
+        Wait for the next event.
+
+        Returns:
+            FeedEvent: The next event, or None once the subscription is
+            closed.
+        """
+        if self.closed.is_set():
+            return None
+        if not self.queue.empty():
+            return self.queue.get_nowait()
+        getter = asyncio.ensure_future(self.queue.get())
+        closer = asyncio.ensure_future(self.closed.wait())
+        try:
+            await asyncio.wait(
+                (getter, closer), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            getter.cancel()
+            closer.cancel()
+        if self.closed.is_set():
+            return None
+        return getter.result()
+
+
+class ClockInFeed(object):
+    """
+    Fans out new clock-ins to filtered subscribers.
+
+    Attributes:
+        queue_size: Maximum pending events per subscriber.
+        slow_policy: "drop" to drop a slow subscriber's oldest events,
+            "disconnect" to disconnect it.
+        max_subscribers: Maximum concurrent subscribers.
+    """
+
+    def __init__(
+        self, queue_size: int, slow_policy: str, max_subscribers: int
+    ) -> None:
+        self.queue_size = queue_size
+        self.slow_policy = slow_policy
+        self.max_subscribers = max_subscribers
+        self._by_email: dict[str, set[Subscription]] = {}
+        self._by_location: dict[str, set[Subscription]] = {}
+        self._unfiltered: set[Subscription] = set()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _bucket(self, subscription: Subscription) -> set[Subscription]:
+        """Get the index bucket a subscription belongs in."""
+        if subscription.email is not None:
+            return self._by_email.setdefault(subscription.email, set())
+        if subscription.location is not None:
+            return self._by_location.setdefault(subscription.location, set())
+        return self._unfiltered
+
+    def subscribe(
+        self, email: Optional[str] = None, location: Optional[str] = None
+    ) -> Optional[Subscription]:
+        """
+        Register a subscriber.
+
+        Args:
+            email (str): Only receive clock-ins for this email.
+            location (str): Only receive clock-ins at this location.
+
+        Returns:
+            Subscription: The subscription, or None if the feed is full.
+        """
+        if self._count >= self.max_subscribers:
+            return None
+        subscription = Subscription(email, location, self.queue_size)
+        self._bucket(subscription).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Remove a subscriber. Unknown subscriptions are ignored.
+
+        Args:
+            subscription (Subscription): The subscription to remove.
+        """
+        if subscription.email is not None:
+            index, key = self._by_email, subscription.email
+        elif subscription.location is not None:
+            index, key = self._by_location, subscription.location
+        else:
+            index, key = None, None
+        bucket = self._unfiltered if index is None else index.get(key, set())
+        if subscription in bucket:
+            bucket.discard(subscription)
+            self._count -= 1
+            if index is not None and not bucket:
+                del index[key]
+
+    @staticmethod
+    def close(subscription: Subscription) -> None:
+        """
+        Tell a subscriber to stop, discarding its pending events.
+
+        Args:
+            subscription (Subscription): The subscription to close.
+        """
+        subscription.closed.set()
+        queue = subscription.queue
+        while not queue.empty():
+            queue.get_nowait()
+
+    def _deliver(self, subscription: Subscription, event: FeedEvent) -> None:
+        """Queue an event, applying the slow consumer policy if it is full."""
+        if subscription.closed.is_set():
+            return
+        try:
+            subscription.queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            dropped_events.inc()
+        if self.slow_policy == "disconnect":
+            subscription.overflowed = True
+            self.close(subscription)
+            self.unsubscribe(subscription)
+        else:
+            subscription.queue.get_nowait()
+            subscription.queue.put_nowait(event)
+
+    def publish(self, clock_in: ClockInInDB) -> None:
+        """
+        Send a new clock-in to every matching subscriber.
+
+        Args:
+            clock_in (ClockInInDB): The clock-in record as stored.
+        """
+        if not self._count:
+            return
+        event = (clock_in.id, clock_in.model_dump_json(by_alias=True))
+        for bucket in (
+            self._by_email.get(clock_in.email),
+            self._by_location.get(clock_in.location),
+            self._unfiltered,
+        ):
+            if not bucket:
+                continue
+            # Copy: the disconnect policy may remove subscribers mid-loop.
+            for subscription in list(bucket):
+                if subscription.matches(clock_in):
+                    self._deliver(subscription, event)
+
+
+clock_in_feed = ClockInFeed(
+    queue_size=settings.CLOCK_IN_FEED_QUEUE_SIZE,
+    slow_policy=settings.CLOCK_IN_FEED_SLOW_POLICY,
+    max_subscribers=settings.CLOCK_IN_FEED_MAX_SUBSCRIBERS,
+)
+
+metrics.gauge(
+    "clock_in_feed_subscribers",
+    "Connected clock-in feed subscribers.",
+    lambda: len(clock_in_feed),
+)
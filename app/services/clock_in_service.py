@@ -5,12 +5,17 @@ in the database.
 
 """
 
-from app.database import get_database
+from app.cache import TTLCache
+from app.database import get_repository
+from app.services.clock_in_feed import clock_in_feed
 
 from app.schemas.clock_in import ClockInCreate, ClockInUpdate, ClockInInDB
 from app.config import settings
 from bson import ObjectId
 from datetime import datetime, timezone
+from typing import Optional
+
+_count_cache = TTLCache(settings.COUNT_CACHE_TTL_SECONDS)
 
 
 class ClockInService(object):
@@ -18,14 +23,18 @@ class ClockInService(object):
     The ClockInService class provides methods for creating, retrieving, and
     deleting clock-in records in the database.
 
-    Attributes:
-        db: The AsyncIOMotorDatabase instance.
+    The clock-in collection is reached through `get_repository`, so the
+    same methods run against MongoDB or the in-memory engine.
 
     Methods:
         create_clock_in: Creates a new clock-in record in the database.
         get_clock_in: Retrieves a clock-in record from the database by its ID.
+        get_clock_ins: Retrieves several clock-in records by ID in one query.
         filter_clock_in: Retrieves a list of clock-in records from the database
             based on the provided filters.
+        clock_ins_since: Retrieves the clock-in records created since a time,
+            oldest first, to resume the live feed.
+        count_clock_in: Counts the clock-in records matching the filters.
         delete_clock_in: Deletes a clock-in record from the database by its ID.
         update_clock_in: Updates a clock-in record in the database by its ID.
     """
@@ -42,20 +51,23 @@ class ClockInService(object):
             ClockInInDB: The created clock-in record, with the generated ID.
         """
 
-        db = get_database()
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
         new_clock_in = clock_in.dict()
         new_clock_in["insert_datetime"] = datetime.now(timezone.utc)
 
-        result = await db[settings.CLOCK_IN_COLLECTION].insert_one(new_clock_in)
-        created_clock_in = await db[settings.CLOCK_IN_COLLECTION].find_one(
-            {"_id": result.inserted_id}
+        inserted_id = await repository.insert_one("create_clock_in", new_clock_in)
+        created_clock_in = await repository.find_one(
+            "create_clock_in", {"_id": inserted_id}
         )
 
         # Convert ObjectId to string before returning
         if created_clock_in:
             created_clock_in["_id"] = str(created_clock_in["_id"])
 
-        return ClockInInDB(**created_clock_in)
+        created = ClockInInDB(**created_clock_in)
+        _count_cache.clear()
+        clock_in_feed.publish(created)
+        return created
 
     @staticmethod
     async def get_clock_in(clock_in_id: str) -> ClockInInDB:
@@ -68,9 +80,9 @@ class ClockInService(object):
         Returns:
             ClockInInDB: The retrieved clock-in record, or None if not found.
         """
-        db = get_database()
-        clock_in = await db[settings.CLOCK_IN_COLLECTION].find_one(
-            {"_id": ObjectId(clock_in_id)}
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
+        clock_in = await repository.find_one(
+            "get_clock_in", {"_id": ObjectId(clock_in_id)}
         )
         if clock_in:
             clock_in["_id"] = str(clock_in["_id"])
@@ -78,22 +90,52 @@ class ClockInService(object):
         return None
 
     @staticmethod
-    async def filter_clock_in(
+    async def get_clock_ins(clock_in_ids: list[str]) -> dict[str, ClockInInDB]:
+        """
+        Retrieves several clock-in records from the database by ID with one
+        `$in` query.
+
+        Args:
+            clock_in_ids (list[str]): The IDs of the records to retrieve. IDs
+                that are not valid ObjectIds can never match and are skipped.
+
+        Returns:
+            dict[str, ClockInInDB]: The records that were found, keyed by ID.
+        """
+
+        object_ids = [
+            ObjectId(i) for i in dict.fromkeys(clock_in_ids) if ObjectId.is_valid(i)
+        ]
+        if not object_ids:
+            return {}
+
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
+        clock_ins = await repository.find(
+            "get_clock_ins", {"_id": {"$in": object_ids}}
+        )
+        return {
+            str(clock_in["_id"]): ClockInInDB(
+                **{**clock_in, "_id": str(clock_in["_id"])}
+            )
+            for clock_in in clock_ins
+        }
+
+    @staticmethod
+    def build_filter(
         email: str = None, location: str = None, insert_datetime: str = None
-    ) -> list[ClockInInDB]:
+    ) -> dict:
         """
-        Retrieves a list of clock-in records from the database based on the provided filters.
+        Builds the MongoDB filter shared by `filter_clock_in` and `count_clock_in`.
 
         Args:
             email (str): Filter by email.
             location (str): Filter by location.
-            insert_datetime (str): Filter by insert datetime, in the format "YYYY-MM-DD HH:MM:SS".
+            insert_datetime (str): Filter by insert datetime, in the format
+                "YYYY-MM-DD HH:MM:SS".
 
         Returns:
-            list[ClockInInDB]: The list of filtered clock-in records.
+            dict: The filter document; empty when no filter is given.
         """
-
-        db = get_database()
         filter_query = {}
         if email:
             filter_query["email"] = email
@@ -103,10 +145,27 @@ class ClockInService(object):
             filter_query["insert_datetime"] = {
                 "$gte": datetime.strptime(insert_datetime, "%Y-%m-%d %H:%M:%S")
             }
+        return filter_query
 
-        clock_ins = (
-            await db[settings.CLOCK_IN_COLLECTION].find(filter_query).to_list(None)
-        )
+    @staticmethod
+    async def filter_clock_in(
+        email: str = None, location: str = None, insert_datetime: str = None
+    ) -> list[ClockInInDB]:
+        """
+        Retrieves a list of clock-in records from the database based on the provided filters.
+
+        Args:
+            email (str): Filter by email.
+            location (str): Filter by location.
+            insert_datetime (str): Filter by insert datetime, in the format "YYYY-MM-DD HH:MM:SS".
+
+        Returns:
+            list[ClockInInDB]: The list of filtered clock-in records.
+        """
+
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
+        filter_query = ClockInService.build_filter(email, location, insert_datetime)
+        clock_ins = await repository.find("filter_clock_in", filter_query)
 
         # Convert ObjectId to string for each clock-in
         return [
@@ -114,6 +173,84 @@ class ClockInService(object):
             for clock_in in clock_ins
         ]
 
+    @staticmethod
+    async def clock_ins_since(
+        since: datetime,
+        email: str = None,
+        location: str = None,
+        limit: int = 0,
+        after_id: Optional[str] = None,
+    ) -> list[ClockInInDB]:
+        """
+        Retrieves the clock-in records created at or after `since`, oldest
+        first, to resume the live feed. Pages are read by passing the
+        insert datetime and ID of the last record of the previous page as
+        `since` and `after_id`.
+
+        Reads go to the primary (the default for this operation) so a
+        resume does not miss records that a lagging secondary has not
+        replicated yet.
+
+        Args:
+            since (datetime): The earliest insert datetime to return (UTC).
+            email (str): Filter by email.
+            location (str): Filter by location.
+            limit (int): The maximum number of records to return; 0 for all.
+            after_id (str): The ID of the page cursor, or None to include
+                every record created at `since`.
+
+        Returns:
+            list[ClockInInDB]: The records, ordered by insert datetime.
+        """
+
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
+        filter_query = ClockInService.build_filter(email, location)
+        filter_query["insert_datetime"] = {"$gte": since}
+        if after_id is not None:
+            filter_query["$or"] = [
+                {"insert_datetime": {"$gt": since}},
+                {"_id": {"$gt": ObjectId(after_id)}},
+            ]
+        clock_ins = await repository.find(
+            "clock_ins_since",
+            filter_query,
+            sort=[("insert_datetime", 1), ("_id", 1)],
+            limit=limit,
+        )
+        return [
+            ClockInInDB(**{**clock_in, "_id": str(clock_in["_id"])})
+            for clock_in in clock_ins
+        ]
+
+    @staticmethod
+    async def count_clock_in(
+        email: str = None, location: str = None, insert_datetime: str = None
+    ) -> int:
+        """
+        Counts the clock-in records matching the same filters as `filter_clock_in`.
+
+        Results are cached per filter for COUNT_CACHE_TTL_SECONDS.
+
+        Args:
+            email (str): Filter by email.
+            location (str): Filter by location.
+            insert_datetime (str): Filter by insert datetime, in the format
+                "YYYY-MM-DD HH:MM:SS".
+
+        Returns:
+            int: The number of matching clock-in records.
+        """
+        cache_key = ("clock_in", email, location, insert_datetime)
+        cached = _count_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
+        filter_query = ClockInService.build_filter(email, location, insert_datetime)
+        total = await repository.count("count_clock_in", filter_query)
+        _count_cache.set(cache_key, total)
+        return total
+
     @staticmethod
     async def delete_clock_in(clock_in_id: str) -> bool:
         """
@@ -126,11 +263,13 @@ class ClockInService(object):
             bool: True if the clock-in record was deleted, False otherwise.
         """
 
-        db = get_database()
-        result = await db[settings.CLOCK_IN_COLLECTION].delete_one(
-            {"_id": ObjectId(clock_in_id)}
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
+        deleted = await repository.delete_one(
+            "delete_clock_in", {"_id": ObjectId(clock_in_id)}
         )
-        return result.deleted_count > 0
+        if deleted > 0:
+            _count_cache.clear()
+        return deleted > 0
 
     @staticmethod
     async def update_clock_in(clock_in_id: str, clock_in: ClockInUpdate) -> ClockInInDB:
@@ -145,14 +284,15 @@ class ClockInService(object):
             ClockInInDB: The updated clock-in record, or None if the record was not found.
         """
 
-        db = get_database()
+        repository = get_repository(settings.CLOCK_IN_COLLECTION)
         updated_clock_in = clock_in.dict(exclude_unset=True)
-        result = await db[settings.CLOCK_IN_COLLECTION].update_one(
-            {"_id": ObjectId(clock_in_id)}, {"$set": updated_clock_in}
+        modified = await repository.update_one(
+            "update_clock_in", {"_id": ObjectId(clock_in_id)}, updated_clock_in
         )
-        if result.modified_count > 0:
-            updated_doc = await db[settings.CLOCK_IN_COLLECTION].find_one(
-                {"_id": ObjectId(clock_in_id)}
+        if modified > 0:
+            _count_cache.clear()
+            updated_doc = await repository.find_one(
+                "update_clock_in", {"_id": ObjectId(clock_in_id)}
             )
             if updated_doc:
                 updated_doc["_id"] = str(updated_doc["_id"])
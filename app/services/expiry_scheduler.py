@@ -0,0 +1,306 @@
+"""Scheduled item expiry notifications.
+
+This module contains the `ExpiryScheduler` class, which emits an event to
+a pluggable sink when an item reaches its expiry date (optionally some
+lead time before it), and the sinks themselves.
+
+The scheduler never polls the whole collection. It keeps a min-heap of
+the upcoming expiries and loads them from MongoDB in windows of
+EXPIRY_SCHEDULER_WINDOW_HOURS, paging by (expiry_date, _id) with an
+indexed range query, at most EXPIRY_SCHEDULER_BATCH_SIZE at a time. Item
+writes are pushed to it by the item service, so an item created or
+updated inside the loaded window is scheduled (or rescheduled) without a
+reload.
+
+Each process runs its own scheduler; with several workers, enable it in
+only one of them or make the sink idempotent.
+
+"""
+
+import abc
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from app.config import settings
+from app.schemas.item import ItemInDB
+
+logger = logging.getLogger(__name__)
+
+# Loads items with (expiry_date, id) after the cursor and expiry_date
+# before the bound, ordered by (expiry_date, id), at most `limit` of them.
+ExpiryLoader = Callable[
+    [datetime, Optional[str], datetime, int], Awaitable[list[ItemInDB]]
+]
+
+
+def _utcnow() -> datetime:
+    """Get the current UTC time as a naive datetime, as stored in MongoDB."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _expiry_datetime(item: ItemInDB) -> datetime:
+    """Get the stored expiry datetime (midnight UTC) of an item."""
+    return datetime.combine(item.expiry_date, datetime.min.time())
+
+
+class ExpirySink(abc.ABC):
+    """
+    Base class for expiry event sinks.
+
+    Subclasses implement `emit`, which is awaited once per expiring item.
+    """
+
+    @abc.abstractmethod
+    async def emit(self, item: ItemInDB, fire_at: datetime) -> None:
+        """
+        Deliver an expiry event.
+
+        Args:
+            item (ItemInDB): The expiring item.
+            fire_at (datetime): When the event was due (UTC).
+        """
+
+
+class LogExpirySink(ExpirySink):
+    """An expiry sink that writes each event to the application log."""
+
+    async def emit(self, item: ItemInDB, fire_at: datetime) -> None:
+        logger.info(
+            "Item %s (%s) for %s expires on %s",
+            item.id,
+            item.item_name,
+            item.email,
+            item.expiry_date.isoformat(),
+        )
+
+
+class WebhookExpirySink(ExpirySink):
+    """
+    A stub webhook sink.
+
+    It builds the payload that would be POSTed to EXPIRY_WEBHOOK_URL and
+    logs it; delivery (retries, signing) is left to a real integration.
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+
+    async def emit(self, item: ItemInDB, fire_at: datetime) -> None:
+        payload = {
+            "event": "item.expiring",
+            "item_id": item.id,
+            "email": item.email,
+            "item_name": item.item_name,
+            "expiry_date": item.expiry_date.isoformat(),
+            "fire_at": fire_at.isoformat(),
+        }
+        logger.info("Webhook stub: would POST %s to %s", payload, self.url)
+
+
+def get_expiry_sink(name: str) -> ExpirySink:
+    """
+    Build the sink configured by EXPIRY_SINK.
+
+    Args:
+        name (str): "log" or "webhook".
+
+    Returns:
+        ExpirySink: The sink.
+    """
+    if name == "webhook":
+        return WebhookExpirySink(settings.EXPIRY_WEBHOOK_URL)
+    return LogExpirySink()
+
+
+class ExpiryScheduler(object):
+    """
+    Emits expiry events from a windowed min-heap of upcoming expiries.
+
+    Heap entries are (fire_at, item id). `_scheduled` holds the current
+    fire time and item per id; heap entries that no longer match it
+    (the item was updated or deleted) are skipped when popped.
+
+    `_cursor` is the (fire_at, item id) key up to which items have been
+    loaded; an id of None means every item firing before that time.
+
+    Attributes:
+        sink: Where events are delivered.
+        window: How far ahead of now items are loaded.
+        lead: How long before the expiry date an event fires.
+        batch_size: Maximum number of items held in the heap from loads.
+    """
+
+    def __init__(
+        self,
+        sink: ExpirySink,
+        window: timedelta,
+        lead: timedelta = timedelta(0),
+        batch_size: int = 1000,
+    ) -> None:
+        self.sink = sink
+        self.window = window
+        self.lead = lead
+        self.batch_size = batch_size
+        self._loader: Optional[ExpiryLoader] = None
+        self._heap: list[tuple[datetime, str]] = []
+        self._scheduled: dict[str, tuple[datetime, ItemInDB]] = {}
+        self._cursor: tuple[datetime, Optional[str]] = (_utcnow(), None)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Writes seen while a load is in flight, replayed after it.
+        self._deferred: Optional[list[tuple[str, object]]] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the scheduler task is running."""
+        return self._task is not None and not self._task.done()
+
+    def _schedule(self, item: ItemInDB) -> None:
+        """Put an item on the heap."""
+        fire_at = _expiry_datetime(item) - self.lead
+        self._scheduled[item.id] = (fire_at, item)
+        heapq.heappush(self._heap, (fire_at, item.id))
+
+    def _within_cursor(self, fire_at: datetime, item_id: str) -> bool:
+        """Check whether an item's key falls in the range already loaded."""
+        cursor_at, cursor_id = self._cursor
+        if cursor_id is None:
+            return fire_at < cursor_at
+        return (fire_at, item_id) <= (cursor_at, cursor_id)
+
+    def notify_upsert(self, item: ItemInDB) -> None:
+        """
+        Account for a created or updated item.
+
+        Args:
+            item (ItemInDB): The item as stored.
+        """
+        if not self.running:
+            return
+        if self._deferred is not None:
+            self._deferred.append(("upsert", item))
+            return
+        self._scheduled.pop(item.id, None)
+        fire_at = _expiry_datetime(item) - self.lead
+        # Writes that are already due are not emitted, like at startup.
+        if fire_at > _utcnow() and self._within_cursor(fire_at, item.id):
+            self._schedule(item)
+            self._wake.set()
+
+    def notify_delete(self, item_id: str) -> None:
+        """
+        Account for a deleted item.
+
+        Args:
+            item_id (str): The ID of the deleted item.
+        """
+        if not self.running:
+            return
+        if self._deferred is not None:
+            self._deferred.append(("delete", item_id))
+            return
+        self._scheduled.pop(item_id, None)
+
+    async def _fill(self, now: datetime) -> None:
+        """Load upcoming expiries up to now + window, within the batch size."""
+        horizon = now + self.window
+        self._deferred = []
+        try:
+            while len(self._scheduled) < self.batch_size and self._cursor[0] < horizon:
+                limit = self.batch_size - len(self._scheduled)
+                cursor_at, cursor_id = self._cursor
+                items = await self._loader(
+                    cursor_at + self.lead, cursor_id, horizon + self.lead, limit
+                )
+                for item in items:
+                    self._schedule(item)
+                if len(items) < limit:
+                    self._cursor = (horizon, None)
+                else:
+                    last = items[-1]
+                    self._cursor = (_expiry_datetime(last) - self.lead, last.id)
+        finally:
+            deferred, self._deferred = self._deferred, None
+        for kind, value in deferred:
+            if kind == "upsert":
+                self.notify_upsert(value)
+            else:
+                self.notify_delete(value)
+
+    async def _run(self) -> None:
+        """Load windows, emit due events and sleep until the next one."""
+        refill_interval = max(1.0, self.window.total_seconds() / 4)
+        while True:
+            now = _utcnow()
+            try:
+                await self._fill(now)
+            except Exception:
+                logger.exception("Loading upcoming expiries failed")
+                await asyncio.sleep(refill_interval)
+                continue
+
+            now = _utcnow()
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, item_id = heapq.heappop(self._heap)
+                scheduled = self._scheduled.get(item_id)
+                if scheduled is None or scheduled[0] != fire_at:
+                    continue
+                del self._scheduled[item_id]
+                try:
+                    await self.sink.emit(scheduled[1], fire_at)
+                except Exception:
+                    logger.exception("Expiry sink failed for item %s", item_id)
+
+            # A cursor with an id means the last load stopped at the batch
+            # size rather than at the horizon; load the rest right away if
+            # emitting made room for it.
+            if self._cursor[1] is not None and len(self._scheduled) < self.batch_size:
+                continue
+
+            timeout = refill_interval
+            if self._heap:
+                due_in = (self._heap[0][0] - _utcnow()).total_seconds()
+                timeout = min(timeout, max(0.0, due_in))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, loader: ExpiryLoader) -> None:
+        """
+        Start the scheduler on the running loop.
+
+        Items whose event is already due are not emitted; the scheduler
+        only looks forward from the moment it starts.
+
+        Args:
+            loader: Loads upcoming items from the database.
+        """
+        if self.running:
+            return
+        self._loader = loader
+        self._heap, self._scheduled = [], {}
+        self._cursor = (_utcnow(), None)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the scheduler."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+expiry_scheduler = ExpiryScheduler(
+    get_expiry_sink(settings.EXPIRY_SINK),
+    window=timedelta(hours=settings.EXPIRY_SCHEDULER_WINDOW_HOURS),
+    lead=timedelta(hours=settings.EXPIRY_NOTIFY_LEAD_HOURS),
+    batch_size=settings.EXPIRY_SCHEDULER_BATCH_SIZE,
+)
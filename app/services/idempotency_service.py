@@ -0,0 +1,245 @@
+"""Services for idempotent requests.
+
+This module contains a class (`IdempotencyService`) that runs a create
+operation at most once per `Idempotency-Key`, so that a client retrying a
+request after a network failure gets the original response back instead
+of creating a duplicate record.
+
+A key is claimed by inserting it, as the `_id` of a record in the
+idempotency collection, before the operation runs; the unique `_id` makes
+the claim atomic across processes. Once the operation succeeds the record
+stores the serialized response; if it fails the claim is released so the
+client can retry. Records expire after IDEMPOTENCY_TTL_SECONDS (a TTL
+index in MongoDB, checked on read as well). Completed responses are also
+kept in an in-process cache until their record expires, and concurrent
+retries within this process wait for the first attempt instead of
+hitting the database.
+
+A claim that is still pending is never taken over before it expires: its
+operation may have run (the process may have died, or failed to store
+the response, after creating the record), so running it again could
+create a duplicate. Retries get a 409 instead.
+
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.cache import TTLCache
+from app.config import settings
+from app.database import get_repository
+from app.repositories.base import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Completed responses by scoped key: (request fingerprint, response body).
+_responses = TTLCache(
+    settings.IDEMPOTENCY_TTL_SECONDS, maxsize=settings.IDEMPOTENCY_CACHE_SIZE
+)
+
+# Attempts running in this process, by scoped key; concurrent retries wait
+# for them rather than racing for the claim.
+_in_flight: dict[str, asyncio.Future] = {}
+
+
+def _fingerprint(request: BaseModel) -> str:
+    """Hash a request body, to detect a key reused for another request."""
+    return hashlib.blake2b(
+        request.model_dump_json().encode(), digest_size=16
+    ).hexdigest()
+
+
+def _replay(fingerprint: str, stored_fingerprint: str, body: str) -> Response:
+    """
+    Build the response for a repeated key.
+
+    Raises:
+        HTTPException: 422 if the key was first used with another request.
+    """
+    if fingerprint != stored_fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _in_progress() -> HTTPException:
+    """Build the error for a key whose first attempt is still running."""
+    return HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key is in progress",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _outcome_unknown() -> HTTPException:
+    """Build the error for a key whose first attempt never finished."""
+    return HTTPException(
+        status_code=409,
+        detail=(
+            "A request with this Idempotency-Key did not finish and may have "
+            "succeeded; check before retrying with a new key"
+        ),
+    )
+
+
+class IdempotencyService(object):
+    """
+    Service class for idempotent requests.
+
+    This class provides a method for running a create operation once per
+    idempotency key and replaying its response to retries.
+    """
+
+    @staticmethod
+    async def _claim(key: str, fingerprint: str) -> Optional[Response]:
+        """
+        Claim a key in the idempotency collection.
+
+        Args:
+            key (str): The scoped key.
+            fingerprint (str): The request fingerprint.
+
+        Returns:
+            Response: The stored response if the key was already completed,
+                or None if the claim succeeded.
+
+        Raises:
+            HTTPException: 409 if another attempt with the key is running
+                or never finished, 422 if the key was used with another
+                request.
+        """
+        repository = get_repository(settings.IDEMPOTENCY_COLLECTION)
+        for _ in range(3):
+            now = datetime.now(timezone.utc)
+            try:
+                await repository.insert_one(
+                    "claim_idempotency_key",
+                    {
+                        "_id": key,
+                        "fingerprint": fingerprint,
+                        "body": None,
+                        "created_at": now,
+                    },
+                )
+                return None
+            except DuplicateKeyError:
+                pass
+
+            record = await repository.find_one("claim_idempotency_key", {"_id": key})
+            if record is None:
+                continue
+            created_at = record["created_at"].replace(tzinfo=timezone.utc)
+            age = now - created_at
+            ttl = timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+            if age < ttl:
+                if record["body"] is not None:
+                    # Cached only for what is left of the record's TTL.
+                    _responses.set(
+                        key,
+                        (record["fingerprint"], record["body"]),
+                        ttl=(ttl - age).total_seconds(),
+                    )
+                    return _replay(fingerprint, record["fingerprint"], record["body"])
+                if age < timedelta(
+                    seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS
+                ):
+                    raise _in_progress()
+                raise _outcome_unknown()
+            # Expired but not yet removed by the TTL index: the key is free
+            # again. Matching on created_at lets only one taker delete it.
+            await repository.delete_one(
+                "claim_idempotency_key",
+                {"_id": key, "created_at": record["created_at"]},
+            )
+        raise _in_progress()
+
+    @staticmethod
+    async def run(
+        scope: str,
+        key: str,
+        request: BaseModel,
+        operation: Callable[[], Awaitable[BaseModel]],
+    ) -> BaseModel | Response:
+        """
+        Run a create operation once per idempotency key.
+
+        Args:
+            scope (str): The operation name, e.g. "create_item". Keys are
+                only unique within a scope.
+            key (str): The client's `Idempotency-Key`.
+            request (BaseModel): The request body.
+            operation: The coroutine function performing the create.
+
+        Returns:
+            The created model on the first attempt, or a replay of its
+            serialized response, marked with `Idempotent-Replayed: true`.
+
+        Raises:
+            HTTPException: 409 if another attempt with the key is running
+                or never finished, 422 if the key was used with another
+                request.
+        """
+        scoped_key = f"{scope}:{key}"
+        fingerprint = _fingerprint(request)
+
+        while scoped_key in _in_flight:
+            await asyncio.shield(_in_flight[scoped_key])
+        cached = _responses.get(scoped_key)
+        if cached is not None:
+            return _replay(fingerprint, *cached)
+
+        # Set once this attempt is over, whatever its outcome, so that
+        # waiters look again: at the cache, or at a released claim.
+        done = asyncio.get_running_loop().create_future()
+        _in_flight[scoped_key] = done
+        repository = get_repository(settings.IDEMPOTENCY_COLLECTION)
+        # No later than the record's created_at, so the response is not
+        # cached past the record's expiry.
+        claimed_at = datetime.now(timezone.utc)
+        try:
+            replay = await IdempotencyService._claim(scoped_key, fingerprint)
+            if replay is not None:
+                return replay
+            try:
+                created = await operation()
+            except BaseException:
+                await repository.delete_one(
+                    "release_idempotency_key", {"_id": scoped_key}
+                )
+                raise
+            body = created.model_dump_json(by_alias=True)
+            # The record exists now, so the claim must not be released
+            # even if storing the response fails; it stays pending and
+            # retries in other processes get a 409 rather than a duplicate.
+            try:
+                await repository.update_one(
+                    "complete_idempotency_key", {"_id": scoped_key}, {"body": body}
+                )
+            except Exception:
+                logger.exception(
+                    "Storing the response for idempotency key %s failed",
+                    scoped_key,
+                )
+            age = datetime.now(timezone.utc) - claimed_at
+            _responses.set(
+                scoped_key,
+                (fingerprint, body),
+                ttl=settings.IDEMPOTENCY_TTL_SECONDS - age.total_seconds(),
+            )
+            return created
+        finally:
+            del _in_flight[scoped_key]
+            done.set_result(None)
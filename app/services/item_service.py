@@ -6,11 +6,29 @@ items in the database.
 
 """
 
-from app.database import get_database
-from app.schemas.item import ItemCreate, ItemUpdate, ItemInDB
+from app.cache import TTLCache
+from app.database import get_repository
+from app.schemas.item import ItemCreate, ItemUpdate, ItemInDB, ItemSearchHit
+from app.services.expiry_scheduler import expiry_scheduler
+from app.services.search_index import indexed_fields, item_name_index
 from app.config import settings
 from bson import ObjectId
-from datetime import datetime, timezone, date
+from datetime import datetime, timezone, date, timedelta
+from typing import AsyncIterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+_count_cache = TTLCache(settings.COUNT_CACHE_TTL_SECONDS)
+
+
+def _item_written(item: ItemInDB) -> None:
+    """Refresh an item in the name prefix index and the expiry scheduler,
+    and drop the cached counts it may have changed."""
+    _count_cache.clear()
+    if settings.SEARCH_INDEX_ENABLED:
+        item_name_index.add(item.id, item.email, item.name, item.item_name)
+    expiry_scheduler.notify_upsert(item)
 
 
 class ItemService(object):
@@ -19,8 +37,8 @@ class ItemService(object):
 
     This class provides methods for creating, retrieving, filtering, aggregating, deleting, and updating items in the database.
 
-    Attributes:
-        db (motor.motor_asyncio.AsyncIOMotorDatabase): The database object.
+    The items collection is reached through `get_repository`, so the same
+    methods run against MongoDB or the in-memory engine.
     """
 
     @staticmethod
@@ -34,7 +52,7 @@ class ItemService(object):
         Returns:
             ItemInDB: The created item, with the generated ID.
         """
-        db = get_database()
+        repository = get_repository(settings.ITEMS_COLLECTION)
         new_item = item.dict()
 
         # Convert `expiry_date` from date to datetime, if it exists
@@ -44,14 +62,14 @@ class ItemService(object):
             )
 
         new_item["insert_date"] = datetime.now(timezone.utc)
-        result = await db[settings.ITEMS_COLLECTION].insert_one(new_item)
-        created_item = await db[settings.ITEMS_COLLECTION].find_one(
-            {"_id": result.inserted_id}
-        )
+        inserted_id = await repository.insert_one("create_item", new_item)
+        created_item = await repository.find_one("create_item", {"_id": inserted_id})
 
         # Convert ObjectId to string for the ItemInDB model
         created_item["_id"] = str(created_item["_id"])
-        return ItemInDB(**created_item)
+        created = ItemInDB(**created_item)
+        _item_written(created)
+        return created
 
     @staticmethod
     async def get_item(item_id: str) -> ItemInDB:
@@ -65,8 +83,8 @@ class ItemService(object):
             ItemInDB: The retrieved item, or None if not found.
         """
 
-        db = get_database()
-        item = await db[settings.ITEMS_COLLECTION].find_one({"_id": ObjectId(item_id)})
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        item = await repository.find_one("get_item", {"_id": ObjectId(item_id)})
         if item:
             # Convert ObjectId to string for the ItemInDB model
             item["_id"] = str(item["_id"])
@@ -74,14 +92,40 @@ class ItemService(object):
         return None
 
     @staticmethod
-    async def filter_items(
+    async def get_items(item_ids: list[str]) -> dict[str, ItemInDB]:
+        """
+        Retrieves several items from the database by ID with one `$in` query.
+
+        Args:
+            item_ids (list[str]): The IDs of the items to retrieve. IDs that
+                are not valid ObjectIds can never match and are skipped.
+
+        Returns:
+            dict[str, ItemInDB]: The items that were found, keyed by ID.
+        """
+
+        object_ids = [
+            ObjectId(i) for i in dict.fromkeys(item_ids) if ObjectId.is_valid(i)
+        ]
+        if not object_ids:
+            return {}
+
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        items = await repository.find("get_items", {"_id": {"$in": object_ids}})
+        return {
+            str(item["_id"]): ItemInDB(**{**item, "_id": str(item["_id"])})
+            for item in items
+        }
+
+    @staticmethod
+    def build_filter(
         email: str = None,
         expiry_date: str = None,
         insert_date: str = None,
         quantity: int = None,
-    ) -> list[ItemInDB]:
+    ) -> dict:
         """
-        Filter items based on email, expiry date, insert date, and quantity.
+        Build the MongoDB filter shared by `filter_items` and `count_items`.
 
         Args:
             email (str): Filter by email.
@@ -90,9 +134,8 @@ class ItemService(object):
             quantity (int): Filter by quantity.
 
         Returns:
-            list[ItemInDB]: A list of filtered items.
+            dict: The filter document; empty when no filter is given.
         """
-        db = get_database()
         filter_query = {}
         if email:
             filter_query["email"] = email
@@ -108,12 +151,200 @@ class ItemService(object):
 
         if quantity is not None:
             filter_query["quantity"] = {"$gte": quantity}
+        return filter_query
+
+    @staticmethod
+    async def filter_items(
+        email: str = None,
+        expiry_date: str = None,
+        insert_date: str = None,
+        quantity: int = None,
+    ) -> list[ItemInDB]:
+        """
+        Filter items based on email, expiry date, insert date, and quantity.
 
-        items = await db[settings.ITEMS_COLLECTION].find(filter_query).to_list(None)
+        Args:
+            email (str): Filter by email.
+            expiry_date (str): Filter by expiry date, in the format "YYYY-MM-DD".
+            insert_date (str): Filter by insert date, in the format "YYYY-MM-DD".
+            quantity (int): Filter by quantity.
+
+        Returns:
+            list[ItemInDB]: A list of filtered items.
+        """
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        filter_query = ItemService.build_filter(
+            email, expiry_date, insert_date, quantity
+        )
+        items = await repository.find("filter_items", filter_query)
 
         # Convert ObjectId to string for each item in the list
         return [ItemInDB(**{**item, "_id": str(item["_id"])}) for item in items]
 
+    @staticmethod
+    async def count_items(
+        email: str = None,
+        expiry_date: str = None,
+        insert_date: str = None,
+        quantity: int = None,
+    ) -> int:
+        """
+        Count the items matching the same filters as `filter_items`.
+
+        Results are cached per filter for COUNT_CACHE_TTL_SECONDS.
+
+        Args:
+            email (str): Filter by email.
+            expiry_date (str): Filter by expiry date, in the format "YYYY-MM-DD".
+            insert_date (str): Filter by insert date, in the format "YYYY-MM-DD".
+            quantity (int): Filter by quantity.
+
+        Returns:
+            int: The number of matching items.
+        """
+        cache_key = ("items", email, expiry_date, insert_date, quantity)
+        cached = _count_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        filter_query = ItemService.build_filter(
+            email, expiry_date, insert_date, quantity
+        )
+        total = await repository.count("count_items", filter_query)
+        _count_cache.set(cache_key, total)
+        return total
+
+    @staticmethod
+    def search_items(
+        prefix: str, email: str = None, limit: int = 10
+    ) -> Optional[list[ItemSearchHit]]:
+        """
+        Search items whose name or item name starts with a prefix.
+
+        Served entirely from the in-memory prefix index.
+
+        Args:
+            prefix (str): The case-insensitive prefix to match.
+            email (str): Only return items belonging to this email.
+            limit (int): The maximum number of items to return.
+
+        Returns:
+            list[ItemSearchHit]: The matching items, or None if the index
+            is disabled or has not finished building yet.
+        """
+        if not settings.SEARCH_INDEX_ENABLED or not item_name_index.ready:
+            return None
+        return [
+            ItemSearchHit(**hit)
+            for hit in item_name_index.search(prefix, email=email, limit=limit)
+        ]
+
+    @staticmethod
+    async def rebuild_search_index() -> None:
+        """
+        Rebuild the item name prefix index from a projection-only scan.
+
+        Writes made while the scan runs are kept; see `ItemNameIndex.rebuild`.
+        """
+        if not settings.SEARCH_INDEX_ENABLED:
+            return
+
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        cursor = repository.scan(
+            "build_search_index", {}, {"email": 1, "name": 1, "item_name": 1}
+        )
+
+        skipped = 0
+
+        async def scan() -> AsyncIterator[tuple[str, tuple[str, str, str]]]:
+            nonlocal skipped
+            async for item in cursor:
+                indexed = indexed_fields(item)
+                if indexed is None:
+                    skipped += 1
+                    continue
+                yield str(item["_id"]), indexed
+
+        await item_name_index.rebuild(scan())
+        logger.info("Item search index built with %d items", len(item_name_index))
+        if skipped:
+            logger.warning(
+                "Skipped %d items without a name in the search index", skipped
+            )
+
+    @staticmethod
+    async def expiring_items(
+        within_days: int, email: str = None, skip: int = 0, limit: int = 50
+    ) -> list[ItemInDB]:
+        """
+        Retrieve the items expiring from today through `within_days` days
+        from today, soonest first, with an indexed range scan.
+
+        Args:
+            within_days (int): How many days ahead to look; 0 means today only.
+            email (str): Only return items belonging to this email.
+            skip (int): The number of items to skip, for pagination.
+            limit (int): The maximum number of items to return.
+
+        Returns:
+            list[ItemInDB]: The expiring items, ordered by expiry date.
+        """
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        today = datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time())
+        filter_query = {
+            "expiry_date": {"$gte": today, "$lte": today + timedelta(days=within_days)}
+        }
+        if email:
+            filter_query["email"] = email
+
+        items = await repository.find(
+            "expiring_items",
+            filter_query,
+            sort=[("expiry_date", 1), ("_id", 1)],
+            skip=skip,
+            limit=limit,
+        )
+        return [ItemInDB(**{**item, "_id": str(item["_id"])}) for item in items]
+
+    @staticmethod
+    async def expiring_after(
+        after: datetime, after_id: Optional[str], before: datetime, limit: int
+    ) -> list[ItemInDB]:
+        """
+        Retrieve the next page of items by (expiry date, ID), for the
+        expiry scheduler.
+
+        Args:
+            after (datetime): The expiry date of the page cursor.
+            after_id (str): The ID of the page cursor, or None to include
+                every item expiring at `after`.
+            before (datetime): Only return items expiring before this.
+            limit (int): The maximum number of items to return.
+
+        Returns:
+            list[ItemInDB]: The items, ordered by (expiry date, ID).
+        """
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        if after_id is None:
+            filter_query = {"expiry_date": {"$gte": after, "$lt": before}}
+        else:
+            filter_query = {
+                "expiry_date": {"$gte": after, "$lt": before},
+                "$or": [
+                    {"expiry_date": {"$gt": after}},
+                    {"_id": {"$gt": ObjectId(after_id)}},
+                ],
+            }
+
+        items = await repository.find(
+            "expiring_after",
+            filter_query,
+            sort=[("expiry_date", 1), ("_id", 1)],
+            limit=limit,
+        )
+        return [ItemInDB(**{**item, "_id": str(item["_id"])}) for item in items]
+
     @staticmethod
     async def aggregate_items() -> list[any]:
         """
@@ -123,7 +354,7 @@ class ItemService(object):
             list[any]: A list of aggregated items
         """
 
-        db = get_database()
+        repository = get_repository(settings.ITEMS_COLLECTION)
         now = datetime.now(timezone.utc)
         pipeline = [
             {
@@ -192,7 +423,7 @@ class ItemService(object):
             {"$sort": {"total_quantity": -1}},
         ]
 
-        result = await db[settings.ITEMS_COLLECTION].aggregate(pipeline).to_list(None)
+        result = await repository.aggregate("aggregate_items", pipeline)
 
         # Convert ObjectId to string and format dates
         for item in result:
@@ -231,11 +462,16 @@ class ItemService(object):
             bool: True if the item was deleted, False otherwise.
         """
 
-        db = get_database()
-        result = await db[settings.ITEMS_COLLECTION].delete_one(
-            {"_id": ObjectId(item_id)}
+        repository = get_repository(settings.ITEMS_COLLECTION)
+        deleted = await repository.delete_one(
+            "delete_item", {"_id": ObjectId(item_id)}
         )
-        return result.deleted_count > 0
+        if deleted > 0:
+            _count_cache.clear()
+            item_name_index.remove(item_id)
+            expiry_scheduler.notify_delete(item_id)
+            return True
+        return False
 
     @staticmethod
     async def update_item(item_id: str, item: ItemUpdate) -> ItemInDB:
@@ -250,7 +486,7 @@ class ItemService(object):
             ItemInDB: The updated item, or None if the item was not found.
         """
 
-        db = get_database()
+        repository = get_repository(settings.ITEMS_COLLECTION)
         updated_item = item.dict(exclude_unset=True)
 
         # Convert `expiry_date` from date to datetime, if it exists
@@ -261,14 +497,16 @@ class ItemService(object):
                 updated_item["expiry_date"], datetime.min.time()
             )
 
-        result = await db[settings.ITEMS_COLLECTION].update_one(
-            {"_id": ObjectId(item_id)}, {"$set": updated_item}
+        modified = await repository.update_one(
+            "update_item", {"_id": ObjectId(item_id)}, updated_item
         )
-        if result.modified_count > 0:
-            updated_doc = await db[settings.ITEMS_COLLECTION].find_one(
-                {"_id": ObjectId(item_id)}
+        if modified > 0:
+            updated_doc = await repository.find_one(
+                "update_item", {"_id": ObjectId(item_id)}
             )
             # Convert ObjectId to string for the ItemInDB model
             updated_doc["_id"] = str(updated_doc["_id"])
-            return ItemInDB(**updated_doc)
+            updated = ItemInDB(**updated_doc)
+            _item_written(updated)
+            return updated
         return None
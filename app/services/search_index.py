@@ -0,0 +1,214 @@
+"""In-memory prefix index over item names.
+
+This module contains the `ItemNameIndex` class, which answers prefix
+(autocomplete) queries over the `name` and `item_name` of every item,
+optionally scoped to one email, without touching the database.
+
+Each indexed name is stored as a `(casefolded name, item id)` tuple in a
+chunked sorted list, one for all items and one per email. A prefix query
+is a `bisect` to the first candidate followed by a scan that stops at the
+first non-matching entry, so its cost depends on the number of results
+rather than on the number of items.
+
+The index is built at startup from a projection-only scan and kept up to
+date by the item service on every create, update and delete. Stored
+documents are not validated, so the scan goes through `indexed_fields`:
+a missing or non-string field is indexed as empty, and a document with
+neither name is skipped rather than failing the build.
+
+"""
+
+import asyncio
+from typing import Any, AsyncIterable, Optional
+
+from app.sorted_entries import SortedEntries
+
+# item id -> (email, name, item_name)
+IndexedItem = tuple[str, str, str]
+# (casefolded name, item id)
+Entry = tuple[str, str]
+
+
+def _keys(name: str, item_name: str) -> set[str]:
+    """Get the casefolded strings an item is indexed under."""
+    return {key for key in (name.casefold(), item_name.casefold()) if key}
+
+
+def indexed_fields(document: dict[str, Any]) -> Optional[IndexedItem]:
+    """
+    Get the indexed fields of a stored item document.
+
+    Args:
+        document (dict): The item, as read from the database.
+
+    Returns:
+        IndexedItem: The email, name and item name, with missing or
+        non-string fields as empty strings, or None if the document has
+        no name to index.
+    """
+    email, name, item_name = (
+        value if isinstance(value, str) else ""
+        for value in (
+            document.get("email"),
+            document.get("name"),
+            document.get("item_name"),
+        )
+    )
+    if not name and not item_name:
+        return None
+    return email, name, item_name
+
+
+def _build(
+    items: dict[str, IndexedItem]
+) -> tuple[SortedEntries, dict[str, SortedEntries]]:
+    """Build the sorted entries for a snapshot of items."""
+    entries = []
+    by_email: dict[str, list[Entry]] = {}
+    for item_id, (email, name, item_name) in items.items():
+        email_entries = by_email.setdefault(email, [])
+        for key in _keys(name, item_name):
+            entry = (key, item_id)
+            entries.append(entry)
+            email_entries.append(entry)
+    return SortedEntries(entries), {
+        email: SortedEntries(email_entries)
+        for email, email_entries in by_email.items()
+    }
+
+
+class ItemNameIndex(object):
+    """
+    A prefix index over item names.
+
+    Attributes:
+        ready: Whether the initial build has completed.
+
+    Methods:
+        add: Indexes an item, replacing any previous version of it.
+        remove: Removes an item from the index.
+        search: Finds items whose name or item name starts with a prefix.
+        rebuild: Replaces the index contents with a full snapshot.
+    """
+
+    def __init__(self) -> None:
+        self.ready = False
+        self._items: dict[str, IndexedItem] = {}
+        self._entries = SortedEntries()
+        self._by_email: dict[str, SortedEntries] = {}
+        # IDs written while a rebuild is running; re-applied once it swaps in.
+        self._dirty: Optional[set[str]] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item_id: str, email: str, name: str, item_name: str) -> None:
+        """
+        Indexes an item, replacing any previous version of it.
+
+        Args:
+            item_id (str): The ID of the item.
+            email (str): The email the item belongs to.
+            name (str): The name of the item.
+            item_name (str): The item name of the item.
+        """
+        self.remove(item_id)
+        self._items[item_id] = (email, name, item_name)
+        email_entries = self._by_email.setdefault(email, SortedEntries())
+        for key in _keys(name, item_name):
+            self._entries.add((key, item_id))
+            email_entries.add((key, item_id))
+        if self._dirty is not None:
+            self._dirty.add(item_id)
+
+    def remove(self, item_id: str) -> None:
+        """
+        Removes an item from the index. Unknown IDs are ignored.
+
+        Args:
+            item_id (str): The ID of the item.
+        """
+        if self._dirty is not None:
+            self._dirty.add(item_id)
+        indexed = self._items.pop(item_id, None)
+        if indexed is None:
+            return
+        email, name, item_name = indexed
+        email_entries = self._by_email[email]
+        for key in _keys(name, item_name):
+            self._entries.discard((key, item_id))
+            email_entries.discard((key, item_id))
+        if not email_entries:
+            del self._by_email[email]
+
+    def search(
+        self, prefix: str, email: Optional[str] = None, limit: int = 10
+    ) -> list[dict[str, str]]:
+        """
+        Finds items whose name or item name starts with `prefix`.
+
+        Matching is case-insensitive. Results are ordered by the matching
+        name.
+
+        Args:
+            prefix (str): The prefix to match.
+            email (str): Only return items belonging to this email.
+            limit (int): The maximum number of items to return.
+
+        Returns:
+            list[dict[str, str]]: The matching items, with their id, email,
+            name and item name.
+        """
+        if email is None:
+            entries = self._entries
+        else:
+            entries = self._by_email.get(email) or SortedEntries()
+        folded = prefix.casefold()
+        hits = []
+        seen = set()
+        for key, item_id in entries.iter_from((folded,)):
+            if len(hits) >= limit or not key.startswith(folded):
+                break
+            if item_id not in seen:
+                seen.add(item_id)
+                item_email, name, item_name = self._items[item_id]
+                hits.append(
+                    {
+                        "id": item_id,
+                        "email": item_email,
+                        "name": name,
+                        "item_name": item_name,
+                    }
+                )
+        return hits
+
+    async def rebuild(self, items: AsyncIterable[tuple[str, IndexedItem]]) -> None:
+        """
+        Replaces the index contents with a full snapshot.
+
+        `items` is typically a database scan that is slow to drain; writes
+        that happen meanwhile are applied to the live index as usual and
+        re-applied on top of the snapshot once it is swapped in, so they
+        are never lost. Sorting runs in a worker thread.
+
+        Args:
+            items: (item id, (email, name, item_name)) pairs.
+        """
+        self._dirty = set()
+        try:
+            snapshot = {item_id: indexed async for item_id, indexed in items}
+            entries, by_email = await asyncio.to_thread(_build, snapshot)
+            live, dirty = self._items, self._dirty
+            self._dirty = None
+            self._items, self._entries, self._by_email = snapshot, entries, by_email
+            for item_id in dirty:
+                if item_id in live:
+                    self.add(item_id, *live[item_id])
+                else:
+                    self.remove(item_id)
+            self.ready = True
+        finally:
+            self._dirty = None
+
+
+item_name_index = ItemNameIndex()
@@ -0,0 +1,81 @@
+"""Chunked sorted lists.
+
+This module contains `SortedEntries`, a sorted list of tuples that stays
+cheap to update at millions of entries. It backs the item name prefix
+index and the secondary indexes of the in-memory storage engine.
+
+"""
+
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Iterable, Iterator
+
+
+class SortedEntries(object):
+    """
+    A sorted list of entries split into chunks of bounded size.
+
+    Inserting into or deleting from one flat list of a million entries
+    moves megabytes of pointers on every write; here a write only touches
+    one chunk, and a lookup is two bisects (chunk maxima, then chunk).
+    """
+
+    CHUNK_SIZE = 1000
+
+    def __init__(self, entries: Iterable[tuple] = ()) -> None:
+        ordered = sorted(entries)
+        self._chunks = [
+            ordered[i : i + self.CHUNK_SIZE]
+            for i in range(0, len(ordered), self.CHUNK_SIZE)
+        ]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, entry: tuple) -> None:
+        """Insert an entry, keeping the order."""
+        if not self._chunks:
+            self._chunks.append([entry])
+            self._maxes.append(entry)
+            self._len = 1
+            return
+        i = min(bisect_left(self._maxes, entry), len(self._chunks) - 1)
+        chunk = self._chunks[i]
+        insort(chunk, entry)
+        self._maxes[i] = chunk[-1]
+        self._len += 1
+        if len(chunk) > 2 * self.CHUNK_SIZE:
+            half = chunk[self.CHUNK_SIZE :]
+            del chunk[self.CHUNK_SIZE :]
+            self._chunks.insert(i + 1, half)
+            self._maxes[i] = chunk[-1]
+            self._maxes.insert(i + 1, half[-1])
+
+    def discard(self, entry: tuple) -> None:
+        """Remove an entry if present."""
+        i = bisect_left(self._maxes, entry)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, entry)
+        if j == len(chunk) or chunk[j] != entry:
+            return
+        del chunk[j]
+        self._len -= 1
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+
+    def iter_from(self, start: tuple) -> Iterator[tuple]:
+        """Iterate over the entries not less than `start`, in order."""
+        i = bisect_left(self._maxes, start)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        yield from islice(chunk, bisect_left(chunk, start), None)
+        for chunk in self._chunks[i + 1 :]:
+            yield from chunk
@@ -0,0 +1,100 @@
+"""Benchmark for the application overhead of the API.
+
+Runs the app in process with the in-memory storage backend and measures
+the latency of typical requests through the full ASGI stack (routing,
+validation, middleware, serialization), without a database or a network
+in the way. Comparing these numbers with the same requests against
+MongoDB separates framework cost from database cost.
+
+Run from the repository root:
+
+    python -m benchmarks.api_benchmark
+
+"""
+
+import asyncio
+import os
+import statistics
+import time
+from datetime import date, timedelta
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("RATE_LIMITS", "{}")
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+ITEMS = 10_000
+REQUESTS = 2_000
+
+
+async def timed(
+    client: httpx.AsyncClient, method: str, url: str, **kwargs
+) -> float:
+    """Return the latency of one request in microseconds."""
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    elapsed = (time.perf_counter() - start) * 1e6
+    response.raise_for_status()
+    return elapsed
+
+
+def report(name: str, samples: list[float]) -> None:
+    """Print the median and p99 of a list of latencies."""
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:18} p50 {statistics.median(samples):8.0f} us  p99 {p99:8.0f} us")
+
+
+async def main() -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        today = date.today()
+        created = []
+        for i in range(ITEMS):
+            body = {
+                "email": f"user{i % 100}@example.com",
+                "name": f"Item {i}",
+                "item_name": f"widget-{i % 250}",
+                "quantity": i % 50,
+                "expiry_date": str(today + timedelta(days=i % 90)),
+            }
+            created.append(await timed(client, "POST", "/items/", json=body))
+        report("create item", created[-REQUESTS:])
+
+        items = (await client.get("/items/", params={"quantity": 49})).json()
+        ids = [item["_id"] for item in items]
+        report(
+            "get item",
+            [
+                await timed(client, "GET", f"/items/{ids[i % len(ids)]}")
+                for i in range(REQUESTS)
+            ],
+        )
+        report(
+            "filter by email",
+            [
+                await timed(
+                    client, "GET", "/items/", params={"email": f"user{i % 100}@example.com"}
+                )
+                for i in range(REQUESTS)
+            ],
+        )
+        report(
+            "expiring in 7d",
+            [
+                await timed(client, "GET", "/items/expiring", params={"within_days": 7})
+                for _ in range(REQUESTS)
+            ],
+        )
+        report(
+            "aggregate",
+            [await timed(client, "GET", "/items/aggregate") for _ in range(20)],
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
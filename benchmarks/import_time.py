@@ -0,0 +1,59 @@
+"""Benchmark for the cold import time of the application.
+
+Imports `app.main` in fresh interpreters with `python -X importtime` and
+reports the median total, the heaviest top-level imports, and the cost of
+the MongoDB driver, which `app.main` does not import: Motor is imported
+when the application connects (see `connect_to_mongo`).
+
+Run from the repository root:
+
+    python -m benchmarks.import_time
+
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+LINE = re.compile(r"import time:\s+(\d+) \|\s+\d+ \| *(\S+)")
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Import a module in a fresh interpreter and return the microseconds
+    spent importing each top-level package (self time, summed)."""
+    env = {**os.environ, "MONGODB_URI": "mongodb://localhost:27017"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for match in LINE.finditer(result.stderr):
+        package = match.group(2).split(".")[0]
+        times[package] = times.get(package, 0) + int(match.group(1))
+    return times
+
+
+def main() -> None:
+    runs = [import_times("app.main") for _ in range(RUNS)]
+    total = statistics.median(sum(run.values()) for run in runs)
+    print(f"import app.main           {total / 1000:8.1f} ms (median of {RUNS})")
+    heaviest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    for package, self_time in heaviest[:10]:
+        print(f"  {package:23} {self_time / 1000:8.1f} ms")
+
+    for module in ("motor.motor_asyncio", "pymongo"):
+        cost = statistics.median(
+            sum(import_times(module).values()) for _ in range(RUNS)
+        )
+        state = "loaded" if module.split(".")[0] in runs[-1] else "deferred"
+        print(f"import {module:19} {cost / 1000:8.1f} ms ({state})")
+
+
+if __name__ == "__main__":
+    main()
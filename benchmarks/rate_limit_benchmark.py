@@ -0,0 +1,59 @@
+"""Benchmark for the write-endpoint rate limiter.
+
+Measures the cost of one `TokenBucketLimiter.hit` for a hot key and for a
+stream of distinct keys, and the memory held per tracked key.
+
+Run from the repository root:
+
+    python -m benchmarks.rate_limit_benchmark
+
+"""
+
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+from app.rate_limit import TokenBucketLimiter  # noqa: E402
+
+N = 1_000_000
+
+
+def bench_hot_key() -> float:
+    """Return nanoseconds per hit on a single key."""
+    limiter = TokenBucketLimiter(rate=1e9, burst=1_000_000)
+    hit = limiter.hit
+    start = time.perf_counter()
+    for _ in range(N):
+        hit("ip:203.0.113.7")
+    return (time.perf_counter() - start) / N * 1e9
+
+
+def bench_distinct_keys(keys: list[str]) -> float:
+    """Return nanoseconds per hit with every hit on a new key."""
+    limiter = TokenBucketLimiter(rate=1, burst=10, max_keys=2 * N)
+    hit = limiter.hit
+    start = time.perf_counter()
+    for key in keys:
+        hit(key)
+    return (time.perf_counter() - start) / len(keys) * 1e9
+
+
+def bench_memory(keys: list[str]) -> float:
+    """Return bytes held by the limiter per tracked key, excluding the keys."""
+    limiter = TokenBucketLimiter(rate=1, burst=10, max_keys=2 * N)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for key in keys:
+        limiter.hit(key)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(limiter)
+
+
+if __name__ == "__main__":
+    keys = [f"ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(N)]
+    print(f"hot key:        {bench_hot_key():8.0f} ns/hit")
+    print(f"distinct keys:  {bench_distinct_keys(keys):8.0f} ns/hit")
+    print(f"memory:         {bench_memory(keys):8.0f} bytes/key")
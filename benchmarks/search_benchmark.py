@@ -0,0 +1,81 @@
+"""Benchmark for the item name prefix index.
+
+Builds an `ItemNameIndex` over synthetic items and measures the latency
+of prefix searches (global and scoped to one email) and of keeping the
+index current on writes (one `add` plus one `remove`). The index is
+queried directly, so the numbers exclude HTTP and serialization; see
+`api_benchmark` for the full stack.
+
+Run from the repository root:
+
+    python -m benchmarks.search_benchmark [items]
+
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from typing import AsyncIterator, Callable
+
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+from app.services.search_index import IndexedItem, ItemNameIndex  # noqa: E402
+
+ITEMS = 1_000_000
+QUERIES = 20_000
+WORDS = ["apple", "banana", "carrot", "dates", "eggs", "flour", "grapes", "honey"]
+
+
+async def snapshot(items: int) -> AsyncIterator[tuple[str, IndexedItem]]:
+    """Yield synthetic (id, (email, name, item_name)) pairs."""
+    for i in range(items):
+        yield f"{i:024x}", (
+            f"user{i % 1000}@example.com",
+            f"{WORDS[i % len(WORDS)]} {i}",
+            f"{WORDS[i * 7 % len(WORDS)]}-{i % 5000}",
+        )
+
+
+def report(name: str, run: Callable[[int], object], runs: int) -> None:
+    """Print the p50 and p99 latency of `run(i)` over `runs` calls."""
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        run(i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:18} p50 {statistics.median(samples):8.1f} us  p99 {p99:8.1f} us")
+
+
+async def main(items: int) -> None:
+    index = ItemNameIndex()
+    start = time.perf_counter()
+    await index.rebuild(snapshot(items))
+    print(f"build {items} items  {time.perf_counter() - start:8.2f} s")
+
+    rng = random.Random(0)
+    prefixes = [
+        rng.choice(WORDS)[: rng.randint(1, 5)] + rng.choice(["", " 1", "-4"])
+        for _ in range(QUERIES)
+    ]
+    report("search", lambda i: index.search(prefixes[i]), QUERIES)
+    report(
+        "search by email",
+        lambda i: index.search(prefixes[i], email=f"user{i % 1000}@example.com"),
+        QUERIES,
+    )
+
+    def write(i: int) -> None:
+        item_id = f"new{i:021x}"
+        index.add(item_id, "writer@example.com", f"grapes {i}", f"flour-{i}")
+        index.remove(item_id)
+
+    report("add + remove", write, QUERIES)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else ITEMS))
@@ -0,0 +1,54 @@
+"""Shared fixtures for the test suite.
+
+The application is configured for the in-memory storage backend before
+it is imported, so the suite runs without a MongoDB server. Rate limits
+are off by default; the rate limiter has tests of its own.
+
+"""
+
+import os
+from datetime import date, timedelta
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["RATE_LIMITS"] = "{}"
+
+from typing import Any, Iterator  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import database  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import idempotency_service  # noqa: E402
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    """A client for the application, running on empty in-memory collections."""
+    database._repositories.clear()
+    idempotency_service._responses.clear()
+    with TestClient(app) as test_client:
+        # Let the ready hooks (the search index build) finish first.
+        async def wait_until_ready() -> None:
+            await database.db.connect_task
+
+        test_client.portal.call(wait_until_ready)
+        yield test_client
+
+
+@pytest.fixture
+def item_payload() -> dict[str, Any]:
+    """A valid body for creating an item, expiring in a week."""
+    return {
+        "name": "Ada",
+        "email": "ada@example.com",
+        "item_name": "Milk",
+        "quantity": 1,
+        "expiry_date": (date.today() + timedelta(days=7)).isoformat(),
+    }
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    """Run async tests on asyncio only."""
+    return "asyncio"
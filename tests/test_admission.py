@@ -0,0 +1,109 @@
+"""Tests for admission control and the event loop lag monitor."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from starlette.responses import PlainTextResponse
+
+from app.loop_monitor import EventLoopLagMonitor
+from app.middleware.admission import AdmissionControlMiddleware, route_group
+
+
+class BlockingApp(object):
+    """An ASGI app whose requests wait until `release` is set."""
+
+    def __init__(self) -> None:
+        self.release = asyncio.Event()
+        self.started = 0
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.started += 1
+        await self.release.wait()
+        await PlainTextResponse("ok")(scope, receive, send)
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+
+
+@pytest.mark.parametrize(
+    "method, path, group",
+    [
+        ("GET", "/items/", "reads"),
+        ("HEAD", "/items/", "reads"),
+        ("GET", "/items/aggregate", "aggregate"),
+        ("POST", "/items/batch-get", "reads"),
+        ("POST", "/items/", "writes"),
+        ("DELETE", "/clock-in/abc", "writes"),
+    ],
+)
+def test_route_group(method, path, group) -> None:
+    assert route_group(method, path) == group
+
+
+@pytest.mark.anyio
+async def test_requests_over_the_group_limit_are_rejected() -> None:
+    inner = BlockingApp()
+    middleware = AdmissionControlMiddleware(inner, {"reads": 2}, retry_after=3)
+    async with client_for(middleware) as client:
+        admitted = [asyncio.create_task(client.get("/items/")) for _ in range(2)]
+        while inner.started < 2:
+            await asyncio.sleep(0)
+
+        rejected = await client.get("/items/")
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "3"
+        # Other groups have their own budget.
+        write = asyncio.create_task(client.post("/items/"))
+
+        inner.release.set()
+        responses = await asyncio.gather(*admitted, write)
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert middleware.in_flight == {"reads": 0, "writes": 0, "aggregate": 0}
+
+
+@pytest.mark.anyio
+async def test_exempt_paths_bypass_limits() -> None:
+    inner = BlockingApp()
+    inner.release.set()
+    middleware = AdmissionControlMiddleware(
+        inner, {"reads": 1}, exempt_paths=("/healthz",)
+    )
+    middleware.in_flight["reads"] = 1
+    async with client_for(middleware) as client:
+        assert (await client.get("/healthz")).status_code == 200
+        assert (await client.get("/items/")).status_code == 503
+
+
+@pytest.mark.anyio
+async def test_lagging_loop_sheds_configured_groups() -> None:
+    inner = BlockingApp()
+    inner.release.set()
+    middleware = AdmissionControlMiddleware(
+        inner,
+        {},
+        lag_monitor=SimpleNamespace(lag=0.5),
+        lag_threshold=0.1,
+        shed_groups=("reads",),
+    )
+    async with client_for(middleware) as client:
+        assert (await client.get("/items/")).status_code == 503
+        assert (await client.post("/items/")).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_loop_lag_monitor_measures_blocked_loop() -> None:
+    monitor = EventLoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)  # Block the loop.
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+
+    assert monitor.max_lag >= 0.05
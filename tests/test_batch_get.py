@@ -0,0 +1,36 @@
+"""Tests for the batch-get endpoints."""
+
+from bson import ObjectId
+
+
+def test_items_batch_get_accepts_uppercase_ids(client, item_payload):
+    item_id = client.post("/items/", json=item_payload).json()["_id"]
+    unknown = str(ObjectId())
+    ids = [item_id.upper(), unknown, "not-an-id", item_id]
+
+    response = client.post("/items/batch-get", json={"ids": ids})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item and item["_id"] for item in body["items"]] == [
+        item_id,
+        None,
+        None,
+        item_id,
+    ]
+    assert body["missing"] == [unknown, "not-an-id"]
+
+
+def test_clock_in_batch_get_accepts_uppercase_ids(client):
+    record = {"email": "ada@example.com", "location": "Lisbon"}
+    clock_in_id = client.post("/clock-in/", json=record).json()["_id"]
+
+    response = client.post(
+        "/clock-in/batch-get", json={"ids": [clock_in_id.upper(), "bad"]}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["clock_ins"][0]["_id"] == clock_in_id
+    assert body["clock_ins"][1] is None
+    assert body["missing"] == ["bad"]
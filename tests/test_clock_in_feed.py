@@ -0,0 +1,149 @@
+"""Tests for the live clock-in feed."""
+
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.config import settings
+from app.database import get_repository
+from app.schemas.clock_in import ClockInInDB
+from app.services.clock_in_feed import ClockInFeed, clock_in_feed
+from app.services.clock_in_service import ClockInService
+
+NOW = datetime(2030, 1, 1, 12, 0)
+
+
+def _clock_in(clock_in_id: str, email: str = "ada@example.com") -> ClockInInDB:
+    return ClockInInDB(
+        _id=clock_in_id, email=email, location="Lisbon", insert_datetime=NOW
+    )
+
+
+async def _drain(subscription) -> list[str]:
+    """Read the queued event IDs without waiting for more."""
+    ids = []
+    while not subscription.queue.empty():
+        ids.append((await subscription.get())[0])
+    return ids
+
+
+@pytest.mark.anyio
+async def test_publish_reaches_matching_subscribers_only():
+    feed = ClockInFeed(queue_size=10, slow_policy="drop", max_subscribers=10)
+    ada = feed.subscribe(email="ada@example.com")
+    lisbon = feed.subscribe(location="Lisbon")
+    porto = feed.subscribe(location="Porto")
+    everyone = feed.subscribe()
+
+    feed.publish(_clock_in("1"))
+    feed.publish(_clock_in("2", email="bob@example.com"))
+
+    assert await _drain(ada) == ["1"]
+    assert await _drain(lisbon) == ["1", "2"]
+    assert await _drain(porto) == []
+    assert await _drain(everyone) == ["1", "2"]
+
+
+@pytest.mark.anyio
+async def test_subscriber_limit():
+    feed = ClockInFeed(queue_size=1, slow_policy="drop", max_subscribers=1)
+    subscription = feed.subscribe()
+    assert feed.subscribe() is None
+    feed.unsubscribe(subscription)
+    feed.unsubscribe(subscription)
+    assert len(feed) == 0
+    assert feed.subscribe() is not None
+
+
+@pytest.mark.anyio
+async def test_drop_policy_keeps_newest_events():
+    feed = ClockInFeed(queue_size=2, slow_policy="drop", max_subscribers=10)
+    subscription = feed.subscribe()
+    for clock_in_id in "123":
+        feed.publish(_clock_in(clock_in_id))
+    assert await _drain(subscription) == ["2", "3"]
+
+
+@pytest.mark.anyio
+async def test_disconnect_policy_closes_slow_subscriber():
+    feed = ClockInFeed(queue_size=1, slow_policy="disconnect", max_subscribers=10)
+    subscription = feed.subscribe()
+    feed.publish(_clock_in("1"))
+    feed.publish(_clock_in("2"))
+
+    assert subscription.overflowed
+    assert len(feed) == 0
+    assert await subscription.get() is None
+
+
+@pytest.mark.anyio
+async def test_close_is_not_lost_when_events_are_dropped():
+    feed = ClockInFeed(queue_size=1, slow_policy="drop", max_subscribers=10)
+    subscription = feed.subscribe()
+    feed.close(subscription)
+    feed.publish(_clock_in("1"))
+    feed.publish(_clock_in("2"))
+
+    assert await asyncio.wait_for(subscription.get(), 1) is None
+
+
+@pytest.mark.anyio
+async def test_close_wakes_a_waiting_subscriber():
+    feed = ClockInFeed(queue_size=1, slow_policy="drop", max_subscribers=10)
+    subscription = feed.subscribe()
+    waiter = asyncio.ensure_future(subscription.get())
+    await asyncio.sleep(0)
+    feed.close(subscription)
+    assert await asyncio.wait_for(waiter, 1) is None
+
+
+@pytest.mark.anyio
+async def test_clock_ins_since_pages_through_equal_timestamps(client):
+    repository = get_repository(settings.CLOCK_IN_COLLECTION)
+    for _ in range(5):
+        await repository.insert_one(
+            "test",
+            {"email": "ada@example.com", "location": "Lisbon", "insert_datetime": NOW},
+        )
+
+    seen = []
+    after, after_id = NOW, None
+    while True:
+        page = await ClockInService.clock_ins_since(after, limit=2, after_id=after_id)
+        seen.extend(clock_in.id for clock_in in page)
+        if len(page) < 2:
+            break
+        after, after_id = page[-1].insert_datetime, page[-1].id
+
+    assert len(seen) == 5
+    assert seen == sorted(set(seen))
+
+
+def test_resume_replays_past_the_page_size_then_goes_live(client, monkeypatch):
+    monkeypatch.setattr(settings, "CLOCK_IN_FEED_RESUME_PAGE_SIZE", 2)
+    record = {"email": "ada@example.com", "location": "Lisbon"}
+    ids = [client.post("/clock-in/", json=record).json()["_id"] for _ in range(5)]
+    client.post("/clock-in/", json={**record, "email": "bob@example.com"})
+
+    with client.websocket_connect(
+        "/clock-in/feed?email=ada@example.com&since=2000-01-01 00:00:00"
+    ) as websocket:
+        assert [websocket.receive_json()["_id"] for _ in range(5)] == ids
+        live = client.post("/clock-in/", json=record).json()["_id"]
+        assert websocket.receive_json()["_id"] == live
+
+    # The server unsubscribes once it sees the disconnect.
+    deadline = time.monotonic() + 1
+    while len(clock_in_feed) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(clock_in_feed) == 0
+
+
+def test_feed_rejects_malformed_since(client):
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect("/clock-in/feed?since=yesterday"):
+            pass
+    assert excinfo.value.code == 1008
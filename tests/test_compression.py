@@ -0,0 +1,127 @@
+"""Tests for response compression and cached payloads."""
+
+import gzip
+import os
+
+import pytest
+from pydantic import ValidationError
+from starlette.requests import Request
+
+from app import compression
+from app.cache import CachedPayload
+from app.config import Settings
+from app.compression import negotiate, payload_response
+
+
+def _request(**headers: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/items/aggregate",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("", None),
+        ("gzip", "gzip"),
+        ("deflate, gzip;q=0.5", "gzip"),
+        ("gzip;q=0", None),
+        ("*", compression.available_encodings()[0]),
+        ("identity", None),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding) == expected
+
+
+@pytest.fixture
+def to_thread_calls(monkeypatch) -> list[str]:
+    """Record the functions `payload_response` runs in worker threads."""
+    calls = []
+    to_thread = compression.asyncio.to_thread
+
+    async def recording_to_thread(function, *args):
+        calls.append(function.__name__)
+        return await to_thread(function, *args)
+
+    monkeypatch.setattr(compression.asyncio, "to_thread", recording_to_thread)
+    return calls
+
+
+@pytest.mark.anyio
+async def test_small_payload_is_compressed_inline(to_thread_calls):
+    payload = CachedPayload(b'{"items": []}' * 200)
+
+    response = await payload_response(_request(accept_encoding="gzip"), payload)
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.body) == payload.body
+    assert to_thread_calls == []
+
+
+@pytest.mark.anyio
+async def test_large_payload_is_compressed_in_a_thread_once(to_thread_calls):
+    body = os.urandom(compression.THREAD_THRESHOLD // 2).hex().encode()
+    payload = CachedPayload(body)
+
+    first = await payload_response(_request(accept_encoding="gzip"), payload)
+    second = await payload_response(_request(accept_encoding="gzip"), payload)
+
+    assert to_thread_calls == ["encoded"]
+    assert first.body == second.body
+    assert gzip.decompress(first.body) == payload.body
+
+
+@pytest.mark.anyio
+async def test_payload_without_accept_encoding_is_sent_as_is(to_thread_calls):
+    payload = CachedPayload(b"x" * compression.THREAD_THRESHOLD)
+
+    response = await payload_response(_request(), payload)
+
+    assert "Content-Encoding" not in response.headers
+    assert response.body == payload.body
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert to_thread_calls == []
+
+
+@pytest.mark.anyio
+async def test_matching_etag_answers_304():
+    payload = CachedPayload(b"{}")
+
+    response = await payload_response(
+        _request(if_none_match=f'"other", {payload.etag}'), payload
+    )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == payload.etag
+
+
+def test_aggregate_endpoint_is_conditional(client):
+    response = client.get("/items/aggregate")
+    assert response.status_code == 200
+
+    etag = response.headers["ETag"]
+    repeated = client.get("/items/aggregate", headers={"If-None-Match": etag})
+    assert repeated.status_code == 304
+
+
+@pytest.mark.parametrize(
+    "setting, value",
+    [
+        ("GZIP_LEVEL", 0),
+        ("GZIP_LEVEL", 10),
+        ("BROTLI_QUALITY", -1),
+        ("BROTLI_QUALITY", 12),
+    ],
+)
+def test_out_of_range_compression_levels_are_rejected(setting, value):
+    with pytest.raises(ValidationError, match=setting):
+        Settings(MONGODB_URI="mongodb://x", **{setting: value})
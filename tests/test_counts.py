@@ -0,0 +1,66 @@
+"""Tests for the count endpoints and their cache."""
+
+import pytest
+
+from app.services import clock_in_service, item_service
+
+CLOCK_IN = {"email": "ada@example.com", "location": "Lisbon"}
+
+
+@pytest.fixture
+def count_cache(monkeypatch):
+    """Enable the count caches for a test, starting empty."""
+    for cache in (item_service._count_cache, clock_in_service._count_cache):
+        cache.clear()
+        monkeypatch.setattr(cache, "ttl", 60.0)
+    yield
+    for cache in (item_service._count_cache, clock_in_service._count_cache):
+        cache.clear()
+
+
+def _counts(client, path: str) -> tuple[int, int, int]:
+    """Return the unfiltered and filtered count, and the HEAD header."""
+    return (
+        client.get(f"{path}/count").json()["count"],
+        client.get(f"{path}/count", params={"email": "ada@example.com"}).json()[
+            "count"
+        ],
+        int(client.head(f"{path}/").headers["X-Total-Count"]),
+    )
+
+
+def test_item_writes_invalidate_cached_counts(client, count_cache, item_payload):
+    assert _counts(client, "/items") == (0, 0, 0)
+
+    item_id = client.post("/items/", json=item_payload).json()["_id"]
+    assert _counts(client, "/items") == (1, 1, 1)
+
+    client.put(f"/items/{item_id}", json={**item_payload, "email": "bob@example.com"})
+    assert _counts(client, "/items")[1] == 0
+
+    client.delete(f"/items/{item_id}")
+    assert _counts(client, "/items") == (0, 0, 0)
+
+
+def test_clock_in_writes_invalidate_cached_counts(client, count_cache):
+    def count() -> int:
+        return client.get(
+            "/clock-in/count", params={"email_filter": "ada@example.com"}
+        ).json()["count"]
+
+    assert count() == 0
+    clock_in_id = client.post("/clock-in/", json=CLOCK_IN).json()["_id"]
+    assert count() == 1
+    moved = {**CLOCK_IN, "email": "bob@example.com"}
+    client.put(f"/clock-in/{clock_in_id}", json=moved)
+    assert count() == 0
+    client.put(f"/clock-in/{clock_in_id}", json=CLOCK_IN)
+    assert count() == 1
+    client.delete(f"/clock-in/{clock_in_id}")
+    assert count() == 0
+
+
+def test_listings_do_not_send_a_page_sized_total(client, item_payload):
+    client.post("/items/", json=item_payload)
+    assert "X-Total-Count" not in client.get("/items/").headers
+    assert "X-Total-Count" not in client.get("/clock-in/").headers
@@ -0,0 +1,185 @@
+"""Tests for the expiry notification scheduler."""
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.schemas.item import ItemInDB
+from app.services import expiry_scheduler as module
+from app.services.expiry_scheduler import ExpiryScheduler, ExpirySink
+
+START = datetime(2030, 1, 1, 12, 0)
+
+
+class Clock(object):
+    """A settable replacement for the scheduler's clock."""
+
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class RecordingSink(ExpirySink):
+    """Records emitted events; fails for the item IDs in `failing`."""
+
+    def __init__(self, failing: tuple[str, ...] = ()) -> None:
+        self.events: list[tuple[str, datetime]] = []
+        self.failing = failing
+
+    async def emit(self, item: ItemInDB, fire_at: datetime) -> None:
+        if item.id in self.failing:
+            raise RuntimeError("sink down")
+        self.events.append((item.id, fire_at))
+
+
+def _item(item_id: str, expiry_date: date) -> ItemInDB:
+    return ItemInDB(
+        _id=item_id,
+        name="Ada",
+        email="ada@example.com",
+        item_name="Milk",
+        quantity=1,
+        expiry_date=expiry_date,
+        insert_date=START,
+    )
+
+
+def _loader(items: list[ItemInDB], calls: list[int]):
+    """Serve `items` the way `ItemService.expiring_after` pages them."""
+
+    async def load(after, after_id, before, limit):
+        calls.append(limit)
+        keyed = sorted(
+            ((module._expiry_datetime(item), item.id), item) for item in items
+        )
+        return [
+            item
+            for key, item in keyed
+            if after <= key[0] < before
+            and (after_id is None or key > (after, after_id))
+        ][:limit]
+
+    return load
+
+
+async def _settle() -> None:
+    """Let the scheduler task run until it waits again."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock(START)
+    monkeypatch.setattr(module, "_utcnow", clock)
+    return clock
+
+
+async def _advance(scheduler: ExpiryScheduler, clock: Clock, to: datetime) -> None:
+    clock.now = to
+    scheduler._wake.set()
+    await _settle()
+
+
+def test_sink_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        ExpirySink()
+
+
+@pytest.mark.anyio
+async def test_emits_in_expiry_order_when_due(clock):
+    items = [
+        _item("c", date(2030, 1, 3)),
+        _item("a", date(2030, 1, 1)),
+        _item("b", date(2030, 1, 2)),
+    ]
+    sink = RecordingSink()
+    scheduler = ExpiryScheduler(sink, window=timedelta(days=7))
+    scheduler.start(_loader(items, []))
+    try:
+        await _settle()
+        # "a" expired before the scheduler started and is not emitted.
+        assert sink.events == []
+
+        await _advance(scheduler, clock, datetime(2030, 1, 2, 0, 1))
+        assert sink.events == [("b", datetime(2030, 1, 2))]
+
+        await _advance(scheduler, clock, datetime(2030, 1, 5))
+        assert [item_id for item_id, _ in sink.events] == ["b", "c"]
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.anyio
+async def test_lead_time_fires_early(clock):
+    sink = RecordingSink()
+    scheduler = ExpiryScheduler(
+        sink, window=timedelta(days=7), lead=timedelta(hours=6)
+    )
+    scheduler.start(_loader([_item("a", date(2030, 1, 2))], []))
+    try:
+        await _advance(scheduler, clock, datetime(2030, 1, 1, 18, 0))
+        assert sink.events == [("a", datetime(2030, 1, 1, 18, 0))]
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.anyio
+async def test_writes_reschedule_and_cancel(clock):
+    items = [_item("a", date(2030, 1, 2)), _item("b", date(2030, 1, 3))]
+    sink = RecordingSink()
+    scheduler = ExpiryScheduler(sink, window=timedelta(days=7))
+    scheduler.start(_loader(items, []))
+    try:
+        await _settle()
+        scheduler.notify_upsert(_item("a", date(2030, 1, 4)))
+        scheduler.notify_delete("b")
+        scheduler.notify_upsert(_item("c", date(2030, 1, 2)))
+        # Outside the loaded window: picked up by a later load instead.
+        scheduler.notify_upsert(_item("d", date(2031, 1, 1)))
+
+        await _advance(scheduler, clock, datetime(2030, 1, 5))
+        assert sink.events == [
+            ("c", datetime(2030, 1, 2)),
+            ("a", datetime(2030, 1, 4)),
+        ]
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.anyio
+async def test_loads_in_batches(clock):
+    items = [_item(f"{i:02d}", date(2030, 1, 2 + i // 2)) for i in range(7)]
+    calls: list[int] = []
+    sink = RecordingSink()
+    scheduler = ExpiryScheduler(sink, window=timedelta(days=7), batch_size=2)
+    scheduler.start(_loader(items, calls))
+    try:
+        await _settle()
+        assert len(scheduler._scheduled) == 2
+
+        await _advance(scheduler, clock, datetime(2030, 1, 6))
+        assert [item_id for item_id, _ in sink.events] == [
+            f"{i:02d}" for i in range(7)
+        ]
+        assert max(calls) <= 2
+    finally:
+        await scheduler.stop()
+
+
+@pytest.mark.anyio
+async def test_sink_failure_does_not_stop_the_scheduler(clock):
+    items = [_item("a", date(2030, 1, 2)), _item("b", date(2030, 1, 2))]
+    sink = RecordingSink(failing=("a",))
+    scheduler = ExpiryScheduler(sink, window=timedelta(days=7))
+    scheduler.start(_loader(items, []))
+    try:
+        await _advance(scheduler, clock, datetime(2030, 1, 3))
+        assert sink.events == [("b", datetime(2030, 1, 2))]
+        assert scheduler.running
+    finally:
+        await scheduler.stop()
+    assert not scheduler.running
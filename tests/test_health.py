@@ -0,0 +1,70 @@
+"""Tests for startup, the health probes and the connection retry loop."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import database
+
+
+def test_importing_the_app_does_not_load_the_driver() -> None:
+    # A fresh interpreter, since this one may have imported pymongo already.
+    code = (
+        "import sys, app.main; "
+        "print(sorted(m for m in ('motor', 'pymongo') if m in sys.modules))"
+    )
+    env = {**os.environ, "STORAGE_BACKEND": "mongo", "MONGODB_URI": "mongodb://x"}
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_liveness(client) -> None:
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readiness(client, monkeypatch) -> None:
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["checks"] == {"database": True, "indexes": True}
+
+    monkeypatch.setattr(database.db, "indexes_ready", False)
+    monkeypatch.setattr(database.db, "last_error", "connect: mongo-0.internal:27017")
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {
+        "status": "not ready",
+        "checks": {"database": True, "indexes": False},
+    }
+
+
+@pytest.mark.anyio
+async def test_retry_with_backoff_retries_until_success(monkeypatch) -> None:
+    delays = []
+    attempts = 0
+
+    async def sleep(delay: float) -> None:
+        delays.append(delay)
+
+    async def operation() -> None:
+        nonlocal attempts
+        attempts += 1
+        if attempts < 4:
+            raise ConnectionError("refused")
+
+    monkeypatch.setattr(database.asyncio, "sleep", sleep)
+    await database._retry_with_backoff(operation, "MongoDB ping")
+
+    assert attempts == 4
+    assert len(delays) == 3
+    # Jittered exponential backoff: each delay is within 0.5-1.5x of 2^n.
+    initial = database.settings.MONGO_CONNECT_RETRY_INITIAL_DELAY
+    for n, delay in enumerate(delays):
+        assert 0.5 * initial * 2**n <= delay <= 1.5 * initial * 2**n
+    assert database.db.last_error is None
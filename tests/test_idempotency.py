@@ -0,0 +1,220 @@
+"""Tests for Idempotency-Key handling and the index reconciliation it needs."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+from pymongo.errors import OperationFailure
+
+from app import database
+from app.config import settings
+from app.database import get_repository
+from app.repositories.base import StorageUnavailableError
+from app.services import idempotency_service
+from app.services.idempotency_service import IdempotencyService
+
+class Body(BaseModel):
+    value: int
+
+
+class Created(BaseModel):
+    id: str
+
+
+class Operation(object):
+    """A create operation that counts its calls and can fail."""
+
+    def __init__(self, error: Exception = None) -> None:
+        self.calls = 0
+        self.error = error
+
+    async def __call__(self) -> Created:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return Created(id=f"record-{self.calls}")
+
+
+def test_retry_replays_the_first_response(client, item_payload):
+    headers = {"Idempotency-Key": "key-1"}
+    first = client.post("/items/", json=item_payload, headers=headers)
+    second = client.post("/items/", json=item_payload, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert client.get("/items/count").json() == {"count": 1}
+
+
+def test_key_reused_with_another_body_is_rejected(client):
+    headers = {"Idempotency-Key": "key-1"}
+    client.post("/clock-in/", json={"email": "a", "location": "b"}, headers=headers)
+    response = client.post(
+        "/clock-in/", json={"email": "a", "location": "c"}, headers=headers
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_replay_survives_the_process_cache(client):
+    operation = Operation()
+    await IdempotencyService.run("scope", "key", Body(value=1), operation)
+    idempotency_service._responses.clear()
+
+    replay = await IdempotencyService.run("scope", "key", Body(value=1), operation)
+
+    assert operation.calls == 1
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.body == b'{"id":"record-1"}'
+
+
+@pytest.mark.anyio
+async def test_failed_attempt_releases_the_key(client):
+    failing = Operation(error=RuntimeError("insert failed"))
+    with pytest.raises(RuntimeError):
+        await IdempotencyService.run("scope", "key", Body(value=1), failing)
+
+    operation = Operation()
+    created = await IdempotencyService.run("scope", "key", Body(value=1), operation)
+
+    assert created == Created(id="record-1")
+
+
+@pytest.mark.anyio
+async def test_unrecorded_success_is_never_run_again(client, monkeypatch):
+    repository = get_repository(settings.IDEMPOTENCY_COLLECTION)
+
+    async def update_one(*args):
+        raise StorageUnavailableError("connection lost")
+
+    monkeypatch.setattr(repository, "update_one", update_one)
+    operation = Operation()
+    created = await IdempotencyService.run("scope", "key", Body(value=1), operation)
+    assert created == Created(id="record-1")
+
+    # Another process: no cached response, and the claim is still pending.
+    idempotency_service._responses.clear()
+    with pytest.raises(HTTPException) as in_progress:
+        await IdempotencyService.run("scope", "key", Body(value=1), operation)
+    assert in_progress.value.status_code == 409
+    assert in_progress.value.headers == {"Retry-After": "1"}
+
+    monkeypatch.setattr(settings, "IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", 0.0)
+    with pytest.raises(HTTPException) as unknown:
+        await IdempotencyService.run("scope", "key", Body(value=1), operation)
+    assert unknown.value.status_code == 409
+    assert unknown.value.headers is None
+    assert operation.calls == 1
+
+
+@pytest.mark.anyio
+async def test_replay_is_not_cached_past_the_record_expiry(client):
+    repository = get_repository(settings.IDEMPOTENCY_COLLECTION)
+    nearly_expired = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.IDEMPOTENCY_TTL_SECONDS - 0.05
+    )
+    await repository.insert_one(
+        "test",
+        {
+            "_id": "scope:key",
+            "fingerprint": idempotency_service._fingerprint(Body(value=1)),
+            "body": '{"id":"record-0"}',
+            "created_at": nearly_expired,
+        },
+    )
+    operation = Operation()
+    replay = await IdempotencyService.run("scope", "key", Body(value=1), operation)
+    assert replay.body == b'{"id":"record-0"}'
+
+    # The record expires and the TTL index removes it.
+    await asyncio.sleep(0.1)
+    await repository.delete_one("test", {"_id": "scope:key"})
+
+    created = await IdempotencyService.run("scope", "key", Body(value=1), operation)
+    assert created == Created(id="record-1")
+
+
+@pytest.mark.anyio
+async def test_expired_key_can_be_reused(client):
+    repository = get_repository(settings.IDEMPOTENCY_COLLECTION)
+    expired = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.IDEMPOTENCY_TTL_SECONDS + 1
+    )
+    await repository.insert_one(
+        "test",
+        {"_id": "scope:key", "fingerprint": "x", "body": None, "created_at": expired},
+    )
+
+    operation = Operation()
+    created = await IdempotencyService.run("scope", "key", Body(value=2), operation)
+
+    assert created == Created(id="record-1")
+    record = await repository.find_one("test", {"_id": "scope:key"})
+    assert record["body"] == '{"id":"record-1"}'
+
+
+class FakeCollection(object):
+    def __init__(self, name: str, failures: dict) -> None:
+        self.name = name
+        self.failures = failures
+
+    async def create_index(self, keys, **options):
+        error = self.failures.get((self.name, keys[0][0]))
+        if error is not None:
+            raise error
+
+
+class FakeDatabase(object):
+    def __init__(self, failures: dict) -> None:
+        self.failures = failures
+        self.commands = []
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        return FakeCollection(name, self.failures)
+
+    async def command(self, command: dict) -> dict:
+        self.commands.append(command)
+        return {"ok": 1}
+
+
+def _conflict() -> OperationFailure:
+    return OperationFailure("Index with name: x already exists", code=85)
+
+
+@pytest.mark.anyio
+async def test_changed_ttl_is_applied_with_coll_mod(monkeypatch):
+    fake = FakeDatabase(
+        {
+            (settings.IDEMPOTENCY_COLLECTION, "created_at"): _conflict(),
+            (settings.ITEMS_COLLECTION, "quantity"): _conflict(),
+        }
+    )
+    monkeypatch.setattr(database, "db", SimpleNamespace(db=fake, indexes_ready=False))
+
+    await database.reconcile_indexes()
+
+    assert database.db.indexes_ready
+    assert fake.commands == [
+        {
+            "collMod": settings.IDEMPOTENCY_COLLECTION,
+            "index": {
+                "keyPattern": {"created_at": 1},
+                "expireAfterSeconds": settings.IDEMPOTENCY_TTL_SECONDS,
+            },
+        }
+    ]
+
+
+@pytest.mark.anyio
+async def test_other_index_errors_are_retried(monkeypatch):
+    error = OperationFailure("not primary", code=10107)
+    fake = FakeDatabase({(settings.ITEMS_COLLECTION, "email"): error})
+    monkeypatch.setattr(database, "db", SimpleNamespace(db=fake, indexes_ready=False))
+
+    with pytest.raises(OperationFailure):
+        await database.reconcile_indexes()
+    assert not database.db.indexes_ready
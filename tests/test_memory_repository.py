@@ -0,0 +1,289 @@
+"""Tests for the in-memory storage engine.
+
+Besides unit tests, the engine is checked against mongomock on seeded
+random data: the filters, sorts, pages and aggregation stages the
+services use must return the same documents in the same order. Sorts
+always end with `_id` so that the order of ties is defined, and every
+document has every field, since mongomock does not follow MongoDB when
+comparing missing fields.
+
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from app.repositories.base import DuplicateKeyError, Repository
+from app.repositories.memory import InMemoryRepository
+
+COMBINATIONS = 300
+EMAILS = ["ada@example.com", "bob@example.com", "cy@example.com", "di@example.com"]
+LOCATIONS = ["Lisbon", "Porto", "Faro"]
+FIELDS = ("email", "location", "quantity", "expiry_date")
+BASE = datetime(2030, 1, 1)
+
+
+def _documents(rng: random.Random, count: int) -> list[dict]:
+    return [
+        {
+            "_id": ObjectId(),
+            "email": rng.choice(EMAILS),
+            "location": rng.choice(LOCATIONS),
+            "quantity": rng.randint(0, 9),
+            "expiry_date": BASE + timedelta(days=rng.randint(0, 20)),
+        }
+        for _ in range(count)
+    ]
+
+
+def _value(rng: random.Random, field: str):
+    if field == "email":
+        return rng.choice(EMAILS)
+    if field == "location":
+        return rng.choice(LOCATIONS)
+    if field == "quantity":
+        return rng.randint(-1, 10)
+    return BASE + timedelta(days=rng.randint(-1, 21))
+
+
+def _condition(rng: random.Random, field: str):
+    op = rng.choice(["eq", "$eq", "$ne", "$in", "$nin", "range", "range"])
+    if op == "eq":
+        return _value(rng, field)
+    if op in ("$in", "$nin"):
+        return {op: [_value(rng, field) for _ in range(rng.randint(1, 3))]}
+    if op == "range":
+        ops = rng.sample(["$gt", "$gte", "$lt", "$lte"], rng.randint(1, 2))
+        return {op: _value(rng, field) for op in ops}
+    return {op: _value(rng, field)}
+
+
+def _filter(rng: random.Random, depth: int = 0) -> dict:
+    kind = rng.random()
+    if depth < 2 and kind < 0.15:
+        return {"$or": [_filter(rng, depth + 1) for _ in range(rng.randint(1, 3))]}
+    if depth < 2 and kind < 0.25:
+        return {"$and": [_filter(rng, depth + 1) for _ in range(2)]}
+    fields = rng.sample(FIELDS, rng.randint(0, 2))
+    return {field: _condition(rng, field) for field in fields}
+
+
+@pytest.fixture
+async def collections():
+    """An in-memory repository and a mongomock collection with the same data."""
+    rng = random.Random(20261019)
+    documents = _documents(rng, 200)
+    repository = InMemoryRepository("items", ["email", "expiry_date", "quantity"])
+    collection = AsyncMongoMockClient()["test"]["items"]
+    for document in documents:
+        await repository.insert_one("test", dict(document))
+    await collection.insert_many([dict(document) for document in documents])
+    return repository, collection
+
+
+@pytest.mark.anyio
+async def test_find_matches_mongomock(collections):
+    repository, collection = collections
+    rng = random.Random(7)
+    for _ in range(COMBINATIONS):
+        filter_query = _filter(rng)
+        field = rng.choice(FIELDS)
+        sort = [(field, rng.choice([1, -1])), ("_id", 1)]
+        skip, limit = rng.randint(0, 5), rng.randint(0, 10)
+
+        found = await repository.find(
+            "test", filter_query, sort=sort, skip=skip, limit=limit
+        )
+        cursor = collection.find(filter_query).sort(sort).skip(skip).limit(limit)
+        expected = await cursor.to_list(None)
+
+        assert [d["_id"] for d in found] == [d["_id"] for d in expected], (
+            filter_query,
+            sort,
+            skip,
+            limit,
+        )
+        assert await repository.count("test", filter_query) == (
+            await collection.count_documents(filter_query)
+        ), filter_query
+
+
+@pytest.mark.anyio
+async def test_projection_matches_mongomock(collections):
+    repository, collection = collections
+    projection = {"email": 1, "quantity": 1}
+    sort = [("quantity", -1), ("_id", 1)]
+
+    found = await repository.find("test", {}, projection=projection, sort=sort)
+    expected = await collection.find({}, projection).sort(sort).to_list(None)
+
+    assert found == expected
+
+
+@pytest.mark.anyio
+async def test_aggregate_matches_mongomock(collections):
+    repository, collection = collections
+    pipeline = [
+        {"$match": {"quantity": {"$gte": 2}}},
+        {
+            "$group": {
+                "_id": "$email",
+                "total_items": {"$sum": 1},
+                "total_quantity": {"$sum": "$quantity"},
+                "avg_quantity": {"$avg": "$quantity"},
+                "min_expiry_date": {"$min": "$expiry_date"},
+                "max_expiry_date": {"$max": "$expiry_date"},
+                "locations": {"$push": "$location"},
+            }
+        },
+        {"$sort": {"total_quantity": -1, "_id": 1}},
+        {"$project": {"email": "$_id", "total_items": 1, "avg_quantity": 1}},
+        {"$skip": 1},
+        {"$limit": 2},
+    ]
+
+    found = await repository.aggregate("test", pipeline)
+    expected = await collection.aggregate(pipeline).to_list(None)
+
+    assert found == expected
+
+
+def test_repository_is_abstract():
+    with pytest.raises(TypeError):
+        Repository("items")
+
+
+@pytest.mark.anyio
+async def test_insert_normalizes_like_bson_and_rejects_duplicates():
+    repository = InMemoryRepository("items")
+    aware = datetime(2030, 1, 1, 12, 0, 0, 123456, tzinfo=timezone(timedelta(hours=1)))
+    document_id = await repository.insert_one("test", {"at": aware})
+
+    stored = await repository.find_one("test", {"_id": document_id})
+    assert stored["at"] == datetime(2030, 1, 1, 11, 0, 0, 123000)
+    with pytest.raises(DuplicateKeyError):
+        await repository.insert_one("test", {"_id": document_id})
+
+
+@pytest.mark.anyio
+async def test_results_are_copies():
+    repository = InMemoryRepository("items")
+    document_id = await repository.insert_one("test", {"tags": ["a"]})
+
+    found = await repository.find_one("test", {"_id": document_id})
+    found["tags"].append("b")
+
+    assert (await repository.find_one("test", {}))["tags"] == ["a"]
+
+
+@pytest.mark.anyio
+async def test_updates_and_deletes_keep_indexes_current():
+    repository = InMemoryRepository("items", ["email"])
+    document_id = await repository.insert_one(
+        "test", {"email": "ada@example.com", "quantity": 1}
+    )
+
+    values = {"email": "bob@example.com"}
+    assert await repository.update_one("test", {"_id": document_id}, values) == 1
+    assert await repository.update_one("test", {"_id": document_id}, values) == 0
+    assert await repository.find("test", {"email": "ada@example.com"}) == []
+    assert await repository.count("test", {"email": "bob@example.com"}) == 1
+
+    assert await repository.delete_one("test", {"email": "bob@example.com"}) == 1
+    assert await repository.delete_one("test", {"email": "bob@example.com"}) == 0
+    assert await repository.find("test", {"email": {"$gte": ""}}) == []
+    assert len(repository) == 0
+
+
+@pytest.mark.anyio
+async def test_query_operators_only_match_their_own_type():
+    repository = InMemoryRepository("items", ["quantity"])
+    await repository.insert_one("test", {"_id": 1, "quantity": 5})
+    await repository.insert_one("test", {"_id": 2, "quantity": "7"})
+    await repository.insert_one("test", {"_id": 3, "quantity": None})
+    await repository.insert_one("test", {"_id": 4})
+
+    async def ids(filter_query: dict) -> list:
+        return [d["_id"] for d in await repository.find("test", filter_query)]
+
+    assert await ids({"quantity": {"$gt": 1}}) == [1]
+    assert await ids({"quantity": {"$gt": "1"}}) == [2]
+    assert sorted(await ids({"quantity": None})) == [3, 4]
+    assert sorted(await ids({"quantity": {"$ne": 5}})) == [2, 3, 4]
+
+
+@pytest.mark.anyio
+async def test_scan_streams_every_match():
+    repository = InMemoryRepository("items")
+    for i in range(2500):
+        await repository.insert_one("test", {"n": i, "odd": i % 2})
+
+    scanned = [
+        document
+        async for document in repository.scan("test", {"odd": 1}, {"n": 1})
+    ]
+
+    assert len(scanned) == 1250
+    assert set(scanned[0]) == {"_id", "n"}
+
+
+@pytest.mark.anyio
+async def test_aggregate_expressions_used_by_the_item_service():
+    repository = InMemoryRepository("items")
+    now = datetime(2030, 1, 10)
+    for days, quantity in ((-1, 1), (3, 2), (30, 4)):
+        await repository.insert_one(
+            "test",
+            {
+                "email": "ada@example.com",
+                "quantity": quantity,
+                "expiry_date": now + timedelta(days=days),
+            },
+        )
+    week = 7 * 24 * 60 * 60 * 1000
+
+    (result,) = await repository.aggregate(
+        "test",
+        [
+            {
+                "$group": {
+                    "_id": "$email",
+                    "avg_quantity": {"$avg": "$quantity"},
+                    "items": {"$push": {"expiry_date": "$expiry_date"}},
+                }
+            },
+            {
+                "$project": {
+                    "avg_quantity": {"$round": ["$avg_quantity", 2]},
+                    "expiring_soon": {
+                        "$size": {
+                            "$filter": {
+                                "input": "$items",
+                                "as": "item",
+                                "cond": {
+                                    "$and": [
+                                        {"$gte": ["$$item.expiry_date", now]},
+                                        {
+                                            "$lte": [
+                                                "$$item.expiry_date",
+                                                {"$add": [now, week]},
+                                            ]
+                                        },
+                                    ]
+                                },
+                            }
+                        }
+                    },
+                }
+            },
+        ],
+    )
+
+    assert result == {
+        "_id": "ada@example.com",
+        "avg_quantity": 2.33,
+        "expiring_soon": 1,
+    }
@@ -0,0 +1,113 @@
+"""Tests for request profiling and phase timing."""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.profiling import ProfilingMiddleware
+from app.phase_timing import RequestProfile, current_profile, timed
+from app.profiling import ProfiledRoute, ProfileStore
+from app.repositories.memory import InMemoryRepository
+
+
+def test_repositories_do_not_import_the_web_framework():
+    code = (
+        "import sys, app.repositories.memory, app.repositories.base; "
+        "print(sorted({'fastapi', 'starlette'} & set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, "STORAGE_BACKEND": "memory"},
+    )
+    assert result.stdout.strip() == "[]"
+
+
+@pytest.mark.anyio
+async def test_timed_records_only_inside_a_profile():
+    @timed("db")
+    async def query() -> str:
+        return "result"
+
+    assert await query() == "result"
+
+    profile = RequestProfile()
+    token = current_profile.set(profile)
+    try:
+        await query()
+        await query()
+    finally:
+        current_profile.reset(token)
+    assert set(profile.phases) == {"db"}
+    assert profile.phases["db"] > 0
+
+
+def test_server_timing_lists_phases_and_total():
+    profile = RequestProfile()
+    profile.add("db", 0.002)
+    profile.add("db", 0.001)
+
+    assert profile.server_timing(0.01) == "db;dur=3.00, total;dur=10.00"
+
+
+def test_store_keeps_the_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    ids = []
+    for _ in range(3):
+        profile_id = RequestProfile().id
+        ids.append(profile_id)
+        store.save(profile_id, {"id": profile_id})
+
+    assert [summary["id"] for summary in store.list()] == ids[:0:-1]
+    assert store.path(ids[0], "json") is None
+    assert store.path(ids[2], "json") is not None
+    assert store.path("../secrets", "json") is None
+
+
+def _profiled_app(store: ProfileStore) -> FastAPI:
+    repository = InMemoryRepository("items")
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/items")
+    async def list_items() -> list[str]:
+        await repository.insert_one("test", {"name": "Milk"})
+        return [item["name"] for item in await repository.find("test", {})]
+
+    application = FastAPI()
+    application.include_router(router)
+    application.add_middleware(
+        ProfilingMiddleware, store=store, secret="s3cret", exempt_paths=("/internal",)
+    )
+    return application
+
+
+def test_profiled_request_reports_every_phase(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=10)
+    with TestClient(_profiled_app(store)) as client:
+        plain = client.get("/items")
+        wrong = client.get("/items", headers={"X-Profile": "guess"})
+        profiled = client.get("/items", headers={"X-Profile": "s3cret"})
+
+    assert "Server-Timing" not in plain.headers
+    assert "Server-Timing" not in wrong.headers
+    timing = profiled.headers["Server-Timing"]
+    phases = [part.split(";")[0] for part in timing.split(", ")]
+    assert set(phases) == {"validation", "db", "endpoint", "serialization", "total"}
+
+    profile_id = profiled.headers["X-Profile-Id"]
+    deadline = time.monotonic() + 5
+    while store.path(profile_id, "json") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    (summary,) = store.list()
+    assert summary["id"] == profile_id
+    assert summary["status"] == 200
+    assert summary["cprofile"] is True
+    assert store.path(profile_id, "prof") is not None
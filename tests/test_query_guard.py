@@ -0,0 +1,121 @@
+"""Tests for the query budget guard and the storage error mapping."""
+
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from app import query_guard
+from app.config import settings
+from app.repositories.base import QueryTimeoutError, StorageUnavailableError
+from app.services.item_service import ItemService
+
+
+class FakeDatabase(object):
+    """Answers `explain` commands with a canned explanation."""
+
+    def __init__(self, explanation: dict) -> None:
+        self.explanation = explanation
+
+    async def command(self, command: dict, **kwargs) -> dict:
+        return self.explanation
+
+
+def fake_collection(explanation: dict = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        name="items",
+        database=FakeDatabase(explanation or {}),
+        read_preference=None,
+    )
+
+
+def test_query_shape_replaces_values() -> None:
+    shape = query_guard.query_shape(
+        {"email": "a@b.com", "quantity": {"$gte": 3}, "$or": [{"a": 1}, {"b": 2}]}
+    )
+    assert shape == {"email": "?", "quantity": {"$gte": "?"}, "$or": [{"a": "?"}]}
+
+
+@pytest.mark.anyio
+async def test_slow_query_logs_returned_count(monkeypatch, caplog) -> None:
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr(settings, "QUERY_EXPLAIN_SAMPLE_RATE", 0.0)
+
+    async def run() -> list[dict]:
+        return [{}, {}, {}]
+
+    with caplog.at_level(logging.WARNING, logger="app.query_guard"):
+        result = await query_guard._run(
+            fake_collection(), "filter_items", {"maxTimeMS": 1}, {"email": "?"}, run
+        )
+
+    assert len(result) == 3
+    assert "docs_returned=3" in caplog.text
+    assert "explain_id=-" in caplog.text
+
+
+@pytest.mark.anyio
+async def test_sampled_slow_query_shares_its_id_with_the_explain(
+    monkeypatch, caplog
+) -> None:
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    monkeypatch.setattr(settings, "QUERY_EXPLAIN_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(query_guard, "_explained_at", {})
+    explanation = {"executionStats": {"totalDocsExamined": 7, "totalKeysExamined": 7}}
+
+    async def run() -> list[dict]:
+        return [{}]
+
+    with caplog.at_level(logging.INFO, logger="app.query_guard"):
+        await query_guard._run(
+            fake_collection(explanation), "filter_items", {}, {"email": "?"}, run
+        )
+        await asyncio.gather(*query_guard._explain_tasks)
+
+    slow, explained = caplog.messages
+    explain_id = slow.rsplit("explain_id=", 1)[1]
+    assert explain_id != "-"
+    assert f"explain_id={explain_id} " in explained
+    assert "docs_examined=7" in explained
+
+
+@pytest.mark.anyio
+async def test_explain_logs_docs_examined_and_collscan(caplog) -> None:
+    explanation = {
+        "queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+        "executionStats": {"totalDocsExamined": 42, "totalKeysExamined": 0},
+    }
+    with caplog.at_level(logging.INFO, logger="app.query_guard"):
+        await query_guard._explain(fake_collection(explanation), {}, "{}", "abc")
+
+    assert "COLLSCAN on items" in caplog.text
+    assert "docs_examined=42" in caplog.text
+    assert "keys_examined=0" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "error, status", [(QueryTimeoutError, 504), (StorageUnavailableError, 503)]
+)
+def test_storage_errors_map_to_responses(client, monkeypatch, error, status) -> None:
+    async def fail(**kwargs):
+        raise error("boom")
+
+    monkeypatch.setattr(ItemService, "filter_items", fail)
+    response = client.get("/items/")
+    assert response.status_code == status
+
+
+@pytest.mark.anyio
+async def test_mongo_repository_translates_driver_errors(monkeypatch) -> None:
+    from pymongo import errors
+
+    from app.repositories import mongo
+
+    async def time_out(*args, **kwargs):
+        raise errors.ExecutionTimeout("operation exceeded time limit")
+
+    monkeypatch.setattr(mongo, "get_collection", lambda name, operation: None)
+    monkeypatch.setattr(mongo.query_guard, "find_one", time_out)
+    with pytest.raises(QueryTimeoutError):
+        await mongo.MongoRepository("items").find_one("get_item", {})
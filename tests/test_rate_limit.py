@@ -0,0 +1,105 @@
+"""Tests for the per-client rate limiter."""
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from pydantic import ValidationError
+from starlette.requests import Request
+
+from app import rate_limit
+from app.config import Settings
+from app.rate_limit import TokenBucketLimiter
+
+
+def test_burst_is_allowed_then_limited():
+    limiter = TokenBucketLimiter.from_spec("5/minute")
+    assert [limiter.hit("ip:a", now=100.0) for _ in range(5)] == [0.0] * 5
+    assert limiter.hit("ip:a", now=100.0) == pytest.approx(12.0)
+
+
+def test_refill_allows_one_token_per_interval():
+    limiter = TokenBucketLimiter(rate=1.0, burst=2)
+    limiter.hit("ip:a", now=0.0)
+    limiter.hit("ip:a", now=0.0)
+    assert limiter.hit("ip:a", now=0.5) == pytest.approx(0.5)
+    assert limiter.hit("ip:a", now=1.0) == 0.0
+    assert limiter.hit("ip:a", now=1.0) == pytest.approx(1.0)
+    # An idle key refills up to the burst size and no further.
+    assert [limiter.hit("ip:a", now=100.0) for _ in range(3)][-1] > 0
+
+
+def test_rejected_hit_does_not_consume_a_token():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1)
+    limiter.hit("ip:a", now=0.0)
+    for _ in range(10):
+        assert limiter.hit("ip:a", now=0.0) == pytest.approx(1.0)
+    assert limiter.hit("ip:a", now=1.0) == 0.0
+
+
+def test_keys_are_independent():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1)
+    assert limiter.hit("ip:a", now=0.0) == 0.0
+    assert limiter.hit("ip:b", now=0.0) == 0.0
+    assert limiter.hit("ip:a", now=0.0) > 0
+
+
+def test_idle_keys_are_evicted():
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, max_keys=10)
+    for i in range(10):
+        limiter.hit(f"ip:{i}", now=0.0)
+    limiter.hit("ip:late", now=100.0)
+    assert len(limiter) == 1
+
+
+def _request(body: bytes, client: str, forwarded: str = "") -> Request:
+    headers = [(b"content-type", b"application/json")]
+    if forwarded:
+        headers.append((b"x-forwarded-for", forwarded.encode()))
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/clock-in/",
+        "headers": headers,
+        "client": (client, 1234),
+        "app": FastAPI(),
+    }
+    request = Request(scope)
+    request._body = body
+    return request
+
+
+def test_client_key_ignores_body_email():
+    first = _request(b'{"email": "a@example.com"}', "198.51.100.1")
+    second = _request(b'{"email": "b@example.com"}', "198.51.100.1")
+    assert rate_limit._client_key(first) == "ip:198.51.100.1"
+    assert rate_limit._client_key(second) == "ip:198.51.100.1"
+
+
+def test_client_key_trusts_forwarded_only_when_configured(monkeypatch):
+    # The client sent "1.2.3.4"; the edge proxy appended the client's real
+    # address and the load balancer appended the edge proxy's.
+    forwarded = "1.2.3.4, 203.0.113.9, 10.0.0.2"
+    request = _request(b"{}", "10.0.0.1", forwarded=forwarded)
+    assert rate_limit._client_key(request) == "ip:10.0.0.1"
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_TRUST_FORWARDED", True)
+    assert rate_limit._client_key(request) == "ip:10.0.0.2"
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_TRUSTED_PROXIES", 2)
+    assert rate_limit._client_key(request) == "ip:203.0.113.9"
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_TRUSTED_PROXIES", 5)
+    assert rate_limit._client_key(request) == "ip:1.2.3.4"
+
+
+@pytest.mark.anyio
+async def test_dependency_raises_429_with_rounded_up_retry_after(monkeypatch):
+    monkeypatch.setitem(rate_limit.settings.RATE_LIMITS, "create_clock_in", "2/minute")
+    dependency = rate_limit.rate_limit("create_clock_in")
+    for email in (b"a", b"b"):
+        await dependency(_request(b'{"email": "' + email + b'"}', "192.0.2.1"))
+    with pytest.raises(HTTPException) as excinfo:
+        await dependency(_request(b'{"email": "c"}', "192.0.2.1"))
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers == {"Retry-After": "30"}
+
+
+def test_trusted_proxies_must_be_positive():
+    with pytest.raises(ValidationError, match="at least 1"):
+        Settings(MONGODB_URI="mongodb://x", RATE_LIMIT_TRUSTED_PROXIES=0)
@@ -0,0 +1,52 @@
+"""Tests for per-operation read routing settings."""
+
+import pytest
+from pydantic import ValidationError
+
+from app import database
+from app.config import DEFAULT_READ_PREFERENCES, Settings
+
+
+def test_read_preferences_merge_over_defaults(monkeypatch) -> None:
+    monkeypatch.setenv(
+        "READ_PREFERENCES", '{"aggregate_items": "nearest", "filter_items": "primary"}'
+    )
+    preferences = Settings(MONGODB_URI="mongodb://x").READ_PREFERENCES
+    assert preferences["aggregate_items"] == "nearest"
+    assert preferences["filter_items"] == "primary"
+    assert preferences["filter_clock_in"] == DEFAULT_READ_PREFERENCES["filter_clock_in"]
+
+
+@pytest.mark.parametrize("staleness", [0, 89])
+def test_max_staleness_below_driver_minimum_is_rejected(staleness) -> None:
+    with pytest.raises(ValidationError, match="at least 90"):
+        Settings(MONGODB_URI="mongodb://x", READ_MAX_STALENESS_SECONDS=staleness)
+
+
+def test_max_staleness_may_be_unbounded() -> None:
+    settings = Settings(MONGODB_URI="mongodb://x", READ_MAX_STALENESS_SECONDS=None)
+    assert settings.READ_MAX_STALENESS_SECONDS is None
+
+
+class FakeDatabase(object):
+    """Records the options each collection handle is created with."""
+
+    def get_collection(self, name: str, **options) -> dict:
+        return options
+
+
+def test_collections_are_routed_per_operation(monkeypatch) -> None:
+    monkeypatch.setattr(database.db, "db", FakeDatabase())
+    monkeypatch.setattr(database.db, "collections", {})
+    monkeypatch.setattr(
+        database.settings, "READ_CONCERNS", {"aggregate_items": "majority"}
+    )
+
+    listing = database.get_collection("items", "filter_items")
+    assert listing["read_preference"].mode == 3  # secondaryPreferred
+    assert listing["read_preference"].max_staleness == 90
+
+    aggregate = database.get_collection("items", "aggregate_items")
+    assert aggregate["read_concern"].level == "majority"
+
+    assert database.get_collection("items", "get_item") == {}
@@ -0,0 +1,165 @@
+"""Tests for the item name prefix index and the search endpoint."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app import database
+from app.config import settings
+from app.database import get_repository
+from app.repositories.base import QueryTimeoutError
+from app.services import item_service
+from app.services.item_service import ItemService
+from app.services.search_index import ItemNameIndex, indexed_fields
+
+
+async def _items(*pairs):
+    for pair in pairs:
+        yield pair
+
+
+def _ids(hits: list[dict[str, str]]) -> list[str]:
+    return [hit["id"] for hit in hits]
+
+
+def test_search_matches_either_name_case_insensitively():
+    index = ItemNameIndex()
+    index.add("1", "ada@example.com", "Morning milk", "Dairy")
+    index.add("2", "bob@example.com", "Bread", "milk loaf")
+    index.add("3", "ada@example.com", "Apples", "Fruit")
+
+    assert _ids(index.search("MILK")) == ["2"]
+    assert _ids(index.search("morning MILK")) == ["1"]
+    assert _ids(index.search("mi", email="ada@example.com")) == []
+    assert _ids(index.search("mo", email="ada@example.com")) == ["1"]
+    assert _ids(index.search("d", email="nobody@example.com")) == []
+
+
+def test_item_matching_twice_is_returned_once_and_limit_applies():
+    index = ItemNameIndex()
+    index.add("1", "ada@example.com", "tea", "tea bags")
+    index.add("2", "ada@example.com", "teapot", "pot")
+
+    assert _ids(index.search("tea")) == ["1", "2"]
+    assert _ids(index.search("tea", limit=1)) == ["1"]
+
+
+def test_add_replaces_and_remove_forgets():
+    index = ItemNameIndex()
+    index.add("1", "ada@example.com", "Milk", "Dairy")
+    index.add("1", "bob@example.com", "Cheese", "Dairy")
+
+    assert index.search("milk") == []
+    assert index.search("ch", email="bob@example.com")[0]["email"] == (
+        "bob@example.com"
+    )
+    index.remove("1")
+    index.remove("unknown")
+    assert len(index) == 0
+    assert index.search("d") == []
+
+
+def test_indexed_fields_tolerates_malformed_documents():
+    assert indexed_fields({"email": "a", "name": "N", "item_name": "I"}) == (
+        "a",
+        "N",
+        "I",
+    )
+    assert indexed_fields({"name": "N"}) == ("", "N", "")
+    assert indexed_fields({"email": "a", "name": 3, "item_name": "I"}) == (
+        "a",
+        "",
+        "I",
+    )
+    assert indexed_fields({"email": "a"}) is None
+
+
+@pytest.mark.anyio
+async def test_writes_during_rebuild_are_kept():
+    index = ItemNameIndex()
+    index.add("old", "ada@example.com", "Stale", "Stale")
+
+    async def snapshot():
+        yield "1", ("ada@example.com", "Milk", "Dairy")
+        # Writes land while the scan is still running.
+        index.add("2", "ada@example.com", "Mint", "Herbs")
+        index.remove("1")
+        yield "3", ("ada@example.com", "Mango", "Fruit")
+
+    await index.rebuild(snapshot())
+
+    assert index.ready
+    assert _ids(index.search("m")) == ["3", "2"]
+    assert index.search("stale") == []
+
+
+@pytest.mark.anyio
+async def test_rebuild_skips_malformed_documents(client, caplog):
+    repository = get_repository(settings.ITEMS_COLLECTION)
+    good = await repository.insert_one(
+        "test",
+        {
+            "email": "ada@example.com",
+            "name": "Milk",
+            "item_name": "Dairy",
+            "quantity": 1,
+            "expiry_date": None,
+        },
+    )
+    partial = await repository.insert_one("test", {"name": "Mustard"})
+    await repository.insert_one("test", {"email": "ada@example.com"})
+
+    await ItemService.rebuild_search_index()
+
+    index = item_service.item_name_index
+    assert len(index) == 2
+    assert set(_ids(index.search("m"))) == {str(good), str(partial)}
+    assert "Skipped 1 items" in caplog.text
+
+
+@pytest.mark.anyio
+async def test_rebuild_is_retried_after_a_failed_scan(client, monkeypatch, caplog):
+    repository = get_repository(settings.ITEMS_COLLECTION)
+    await repository.insert_one(
+        "test", {"email": "ada@example.com", "name": "Milk", "item_name": "Dairy"}
+    )
+    scan = repository.scan
+    scans = 0
+
+    async def flaky_scan(*args, **kwargs):
+        nonlocal scans
+        scans += 1
+        if scans == 1:
+            raise QueryTimeoutError("scan timed out")
+        async for document in scan(*args, **kwargs):
+            yield document
+
+    monkeypatch.setattr(repository, "scan", flaky_scan)
+    monkeypatch.setattr(item_service, "item_name_index", ItemNameIndex())
+    monkeypatch.setattr(settings, "MONGO_CONNECT_RETRY_INITIAL_DELAY", 0.0)
+    monkeypatch.setattr(database, "_ready_hooks", [])
+    database.on_ready(ItemService.rebuild_search_index, retry=True)
+
+    await database._run_ready_hooks()
+
+    assert scans == 2
+    assert "scan timed out" in caplog.text
+    assert item_service.item_name_index.ready
+    assert len(item_service.item_name_index) == 1
+
+
+def test_search_endpoint(client):
+    body = {
+        "name": "Ada",
+        "email": "ada@example.com",
+        "item_name": "Oat milk",
+        "quantity": 1,
+        "expiry_date": (date.today() + timedelta(days=7)).isoformat(),
+    }
+    item_id = client.post("/items/", json=body).json()["_id"]
+
+    response = client.get("/items/search", params={"q": "OAT"})
+
+    assert response.status_code == 200
+    assert [hit["id"] for hit in response.json()] == [item_id]
+    assert client.get("/items/search", params={"q": ""}).status_code == 422